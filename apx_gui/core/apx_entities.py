@@ -22,14 +22,20 @@ import shutil
 import subprocess
 import shlex
 import json
+import re
+import threading
 import uuid
 from uuid import UUID
 
 from typing import Any
 from collections.abc import Callable
+from gettext import gettext as _
 from gi.repository import Vte, GLib  # type: ignore
 from time import sleep
 
+from apx_gui.core.run_async import Progress
+from apx_gui.core.watchdog import Watchdog
+
 
 class ApxEntityBase:
     def __init__(self) -> None:
@@ -73,18 +79,33 @@ class ApxEntityBase:
         return shutil.which("host-spawn") or "/usr/bin/host-spawn"
 
     def _run_command(
-        self, command: str, ignore_errors: bool = False
+        self,
+        command: str,
+        ignore_errors: bool = False,
+        progress: Progress | None = None,
+        timeout: float | None = None,
     ) -> tuple[bool, str]:
         try:
             if "APX_DEBUG" in os.environ:
                 print(f"Running command: {command}")
 
-            process: subprocess.Popen = subprocess.Popen(
-                shlex.split(command), stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
-            out, e = process.communicate()
-            output: str = out.decode("utf-8")
-            error: str = e.decode("utf-8")
+            with Watchdog.track(command):
+                process: subprocess.Popen = subprocess.Popen(
+                    shlex.split(command),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                )
+                if progress is None:
+                    try:
+                        out, e = process.communicate(timeout=timeout)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                        process.communicate()
+                        return False, _("Timed out after {} s").format(timeout)
+                    output: str = out.decode("utf-8")
+                    error: str = e.decode("utf-8")
+                else:
+                    output, error = self.__stream_process(process, progress)
             if error and not ignore_errors:
                 if "APX_DEBUG" in os.environ:
                     print(f"Error: {error}")
@@ -97,14 +118,46 @@ class ApxEntityBase:
                 print(f"Exception: {e}")
             return False, str(e)
 
+    def __stream_process(
+        self, process: subprocess.Popen, progress: Progress
+    ) -> tuple[str, str]:
+        """
+        Read the process output line by line, reporting every line to
+        `progress` as it arrives.
+        """
+        error_lines: list[str] = []
+
+        def read_stderr() -> None:
+            for raw in process.stderr:  # type: ignore
+                line: str = raw.decode("utf-8", errors="replace")
+                error_lines.append(line)
+                progress.update(line=line.rstrip("\n"))
+
+        stderr_reader = threading.Thread(target=read_stderr, daemon=True)
+        stderr_reader.start()
+
+        output_lines: list[str] = []
+        for raw in process.stdout:  # type: ignore
+            line: str = raw.decode("utf-8", errors="replace")
+            output_lines.append(line)
+            progress.update(line=line.rstrip("\n"))
+
+        stderr_reader.join()
+        process.wait()
+        return "".join(output_lines), "".join(error_lines)
+
     def _run_apx_command(
-        self, args: str, ignore_errors: bool = False
+        self,
+        args: str,
+        ignore_errors: bool = False,
+        progress: Progress | None = None,
+        timeout: float | None = None,
     ) -> tuple[bool, str]:
         """
         Run the 'apx' command with the specified arguments.
         """
         command = f"{self._get_apx_command()} {args}"
-        return self._run_command(command, ignore_errors)
+        return self._run_command(command, ignore_errors, progress, timeout)
 
     def to_dict(self) -> dict[str, str | UUID]:
         return self.__dict__
@@ -131,7 +184,7 @@ class Stack(ApxEntityBase):
         self.pkg_manager: str = pkg_manager
         self.built_in: bool = built_in
 
-    def create(self) -> tuple[bool, "Stack"]:
+    def create(self, progress: Progress | None = None) -> tuple[bool, "Stack"]:
         packages: str = (
             " ".join(self.packages)
             if isinstance(self.packages, list)
@@ -141,8 +194,14 @@ class Stack(ApxEntityBase):
             f"apx stacks new --name '{self.name}' --base '{self.base}' --packages '{packages}' "
             f"--pkg-manager {self.pkg_manager} -y"
         )
-        new_res: tuple[bool, str] = self._run_command(new_command)
+        if progress is not None:
+            progress.update(fraction=0.0, phase=_("Creating stack"))
+        new_res: tuple[bool, str] = self._run_command(
+            new_command, progress=progress
+        )
 
+        if progress is not None:
+            progress.update(fraction=0.9, phase=_("Reading stacks"))
         list_command: str = f"apx stacks list --json"
         list_res: tuple[bool, str] = self._run_command(list_command)
         if not list_res[0]:
@@ -158,6 +217,8 @@ class Stack(ApxEntityBase):
                 self.packages = stack["Packages"]
                 self.pkg_manager = stack["PkgManager"]
                 self.built_in = stack["BuiltIn"]
+                if progress is not None:
+                    progress.update(fraction=1.0)
                 return True, self
 
         return False, self
@@ -173,6 +234,23 @@ class Stack(ApxEntityBase):
         command: str = f"apx stacks rm {force_flag} --name '{self.name}'"
         return self._run_command(command)
 
+    @property
+    def package_names(self) -> list[str]:
+        if isinstance(self.packages, str):
+            return self.packages.split()
+        return list(self.packages)
+
+    def to_definition(self) -> dict[str, str | list[str]]:
+        """
+        The stack as an apx YAML definition, as read by the importer.
+        """
+        return {
+            "name": self.name,
+            "base": self.base,
+            "packages": self.package_names,
+            "pkgmanager": self.pkg_manager,
+        }
+
 
 class Subsystem(ApxEntityBase):
     def __init__(
@@ -254,16 +332,17 @@ class Subsystem(ApxEntityBase):
         res: bool = False
         try:
             print(f"Running command: {args}")
-            res = terminal.spawn_sync(
-                Vte.PtyFlags.DEFAULT,
-                ".",
-                args,
-                [],
-                GLib.SpawnFlags.DO_NOT_REAP_CHILD | GLib.SpawnFlags.SEARCH_PATH,
-                None,
-                None,
-                None,
-            )
+            with Watchdog.track(shlex.join(args)):
+                res = terminal.spawn_sync(
+                    Vte.PtyFlags.DEFAULT,
+                    ".",
+                    args,
+                    [],
+                    GLib.SpawnFlags.DO_NOT_REAP_CHILD | GLib.SpawnFlags.SEARCH_PATH,
+                    None,
+                    None,
+                    None,
+                )
             print(f"Spawn result: {res}")
         except Exception as e:
             print(f"Exception: {e}")
@@ -287,23 +366,77 @@ class Subsystem(ApxEntityBase):
         command: str = f"subsystems update --name '{self.name}' --stack '{stack}' -y"
         return self._run_apx_command(command)
 
-    def remove(self, force: bool = False) -> tuple[bool, str]:
+    def remove(
+        self, force: bool = False, progress: Progress | None = None
+    ) -> tuple[bool, str]:
         force_flag: str = "--force" if force else ""
         command: str = f"subsystems rm {force_flag} --name '{self.name}'"
-        return self._run_apx_command(command)
+        if progress is not None:
+            progress.update(phase=_("Removing subsystem"))
+        return self._run_apx_command(command, progress=progress)
 
-    def reset(self, force: bool = False) -> tuple[bool, str]:
+    def reset(
+        self, force: bool = False, progress: Progress | None = None
+    ) -> tuple[bool, str]:
         force_flag: str = "--force" if force else ""
         command: str = f"subsystems reset {force_flag} --name '{self.name}'"
-        return self._run_apx_command(command)
+        if progress is not None:
+            progress.update(phase=_("Resetting subsystem"))
+        return self._run_apx_command(command, progress=progress)
+
+    def update_packages(self, progress: Progress | None = None) -> tuple[bool, str]:
+        command: str = f"{self.name} update"
+        if progress is not None:
+            progress.update(phase=_("Updating package lists"))
+        return self._run_apx_command(command, progress=progress)
+
+    def upgrade_packages(self, progress: Progress | None = None) -> tuple[bool, str]:
+        command: str = f"{self.name} upgrade -y"
+        if progress is not None:
+            progress.update(phase=_("Upgrading packages"))
+        return self._run_apx_command(command, progress=progress)
+
+    def install_packages(
+        self, packages: list[str], progress: Progress | None = None
+    ) -> tuple[bool, str]:
+        command: str = f"{self.name} install -y {shlex.join(packages)}"
+        if progress is not None:
+            progress.update(phase=_("Installing {}").format(", ".join(packages)))
+        return self._run_apx_command(command, progress=progress)
 
-    def autoremove(self) -> tuple[bool, str]:
+    def remove_packages(
+        self, packages: list[str], progress: Progress | None = None
+    ) -> tuple[bool, str]:
+        command: str = f"{self.name} remove -y {shlex.join(packages)}"
+        if progress is not None:
+            progress.update(phase=_("Removing {}").format(", ".join(packages)))
+        return self._run_apx_command(command, progress=progress)
+
+    def list_packages(self) -> tuple[bool, str]:
+        command: str = f"{self.name} list"
+        return self._run_apx_command(command, ignore_errors=True)
+
+    def search(self, query: str, timeout: float | None = None) -> tuple[bool, str]:
+        command: str = f"{self.name} search {shlex.quote(query)}"
+        return self._run_apx_command(command, ignore_errors=True, timeout=timeout)
+
+    def show_package(
+        self, package: str, timeout: float | None = None
+    ) -> tuple[bool, str]:
+        command: str = f"{self.name} show {shlex.quote(package)}"
+        return self._run_apx_command(command, ignore_errors=True, timeout=timeout)
+
+    def autoremove(self, progress: Progress | None = None) -> tuple[bool, str]:
         command: str = f"{self.name} autoremove"
-        return self._run_apx_command(command)
+        if progress is not None:
+            progress.update(phase=_("Removing unused packages"))
+        return self._run_apx_command(command, progress=progress)
 
-    def clean(self) -> tuple[bool, str]:
+    def clean(self, progress: Progress | None = None) -> tuple[bool, str]:
         command: str = f"{self.name} clean"
-        return self._run_apx_command(command)
+        if progress is not None:
+            progress.update(phase=_("Cleaning package cache"))
+        return self._run_apx_command(command, progress=progress)
 
 
 class PkgManager(ApxEntityBase):
@@ -380,6 +513,158 @@ class PkgManager(ApxEntityBase):
         command: str = f"pkgmanagers rm {force_flag} --name '{self.name}'"
         return self._run_apx_command(command)
 
+    search_arches: tuple[str, ...] = ("x86_64", "aarch64", "i686", "noarch", "src")
+
+    def parse_search_output(self, output: str) -> list[tuple[str, str]]:
+        """
+        Extract `(package, summary)` pairs from the output of `cmd_search`.
+        Package managers print results in different layouts, the common
+        ones are recognised: `name/suite version` (apt), `repo/name
+        version` followed by an indented summary (pacman and its helpers),
+        `name.arch : summary` (dnf) and `name - summary` (apk, zypper).
+        """
+        repo_prefixed: bool = any(
+            tool in self.cmd_search for tool in ("pacman", "yay", "paru")
+        )
+        results: list[tuple[str, str]] = []
+
+        for line in output.splitlines():
+            if not line.strip() or "..." in line or line.startswith("Last metadata"):
+                # blank lines and progress or cache notices
+                continue
+
+            if line[0].isspace():
+                # indented lines describe the previous package
+                if results and not results[-1][1]:
+                    results[-1] = (results[-1][0], line.strip())
+                continue
+
+            for separator in (" : ", " - "):
+                if separator in line:
+                    name, summary = line.split(separator, 1)
+                    break
+            else:
+                name, summary = line, ""
+
+            tokens: list[str] = name.split()
+            if not tokens:
+                continue
+            name = tokens[0]
+            if "/" in name:
+                name = name.split("/", 1)[1 if repo_prefixed else 0]
+            if "." in name and name.rsplit(".", 1)[1] in self.search_arches:
+                name = name.rsplit(".", 1)[0]
+
+            if not name or not (name[0].isalnum() or name[0] in "_@"):
+                continue
+            results.append((name, summary.strip()))
+
+        return results
+
+    def parse_list_output(self, output: str) -> dict[str, str]:
+        """
+        Extract the installed packages and their version from the output
+        of `cmd_list`, in the layouts of apt (`name/suite,now version
+        arch [installed]`), dnf (`name.arch version repo` under an
+        `Installed Packages` header), pacman (`name version`), apk
+        (`name-version arch {origin} (license) [installed]`) and zypper
+        (`S | Name | ...` tables).
+        """
+        packages: dict[str, str] = {}
+        lines: list[str] = output.splitlines()
+        marked: bool = "[installed" in output
+        sectioned: bool = any(
+            line.strip().lower() == "installed packages" for line in lines
+        )
+        in_section: bool = not sectioned
+        columns: list[str] | None = None
+        wrapped: str | None = None
+
+        for line in lines:
+            tokens: list[str] = line.split()
+            if not tokens:
+                continue
+
+            if "|" in line:
+                cells: list[str] = [cell.strip() for cell in line.split("|")]
+                if columns is None:
+                    if "Name" in cells:
+                        columns = cells
+                    continue
+                self.__parse_table_row(packages, columns, cells)
+                continue
+
+            if len(tokens) == 2 and tokens[1].lower() == "packages":
+                in_section = tokens[0].lower() == "installed"
+                continue
+            if not in_section:
+                continue
+
+            if line[0].isspace():
+                # dnf wraps long names, the version goes on the next line
+                if wrapped is not None:
+                    packages[wrapped] = tokens[0]
+                    wrapped = None
+                continue
+
+            if (
+                "..." in line
+                or tokens[-1].endswith(":")
+                or set(line.strip()) <= set("-+")
+                or ((marked or "/" in tokens[0]) and "[installed" not in line)
+            ):
+                continue
+
+            name: str = tokens[0].split("/", 1)[0]
+            version: str = tokens[1] if len(tokens) > 1 else ""
+            apk_match = re.fullmatch(r"(.+?)-(\d[^-]*-r\d+)", name)
+            if apk_match:
+                name, version = apk_match.groups()
+            if "." in name and name.rsplit(".", 1)[1] in self.search_arches:
+                name = name.rsplit(".", 1)[0]
+            if not name or not (name[0].isalnum() or name[0] in "_@"):
+                continue
+
+            if sectioned and len(tokens) == 1:
+                wrapped = name
+                continue
+            packages[name] = version
+
+        return packages
+
+    @staticmethod
+    def __parse_table_row(
+        packages: dict[str, str], columns: list[str], cells: list[str]
+    ) -> None:
+        if len(cells) != len(columns):
+            return
+
+        row: dict[str, str] = dict(zip(columns, cells))
+        if "S" in row and not row["S"].startswith("i"):
+            return
+        if row["Name"]:
+            packages[row["Name"]] = row.get("Version", "")
+
+    def to_definition(self) -> dict[str, str | bool]:
+        """
+        The package manager as an apx YAML definition, as read by the
+        importer.
+        """
+        return {
+            "name": self.name,
+            "needsudo": self.need_sudo,
+            "cmdautoremove": self.cmd_auto_remove,
+            "cmdclean": self.cmd_clean,
+            "cmdinstall": self.cmd_install,
+            "cmdlist": self.cmd_list,
+            "cmdpurge": self.cmd_purge,
+            "cmdremove": self.cmd_remove,
+            "cmdsearch": self.cmd_search,
+            "cmdshow": self.cmd_show,
+            "cmdupdate": self.cmd_update,
+            "cmdupgrade": self.cmd_upgrade,
+        }
+
     def update(
         self,
         need_sudo: bool,
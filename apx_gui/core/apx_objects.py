@@ -0,0 +1,133 @@
+# apx_objects.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from uuid import UUID
+
+from gi.repository import GObject  # type: ignore
+
+from apx_gui.core.apx_entities import Subsystem, Stack, PkgManager
+
+
+class SubsystemObject(GObject.Object):
+    """
+    List model item wrapping a Subsystem. The properties mirror the
+    subsystem fields shown in the sidebar, call `refresh` after changing
+    the subsystem to notify the bound rows.
+    """
+
+    __gtype_name__: str = "SubsystemObject"
+
+    name = GObject.Property(type=str, default="")
+    status = GObject.Property(type=str, default="")
+    running = GObject.Property(type=bool, default=False)
+    stack_name = GObject.Property(type=str, default="")
+    last_used = GObject.Property(type=GObject.TYPE_INT64, default=0)
+
+    def __init__(self, subsystem: Subsystem) -> None:
+        super().__init__()
+        self.subsystem: Subsystem = subsystem
+        self.refresh()
+
+    @property
+    def aid(self) -> UUID:
+        return self.subsystem.aid
+
+    def refresh(self) -> None:
+        """
+        Copy the subsystem fields into the properties, only the changed
+        ones emit a notification.
+        """
+        values: dict[str, str | bool] = {
+            "name": self.subsystem.name,
+            "status": self.subsystem.status,
+            "running": self.subsystem.running,
+            "stack-name": self.subsystem.stack.name,
+        }
+        for prop, value in values.items():
+            if self.get_property(prop) != value:
+                self.set_property(prop, value)
+
+
+class StackObject(GObject.Object):
+    """
+    List model item wrapping a Stack.
+    """
+
+    __gtype_name__: str = "StackObject"
+
+    def __init__(self, stack: Stack) -> None:
+        super().__init__()
+        self.stack: Stack = stack
+
+    @property
+    def aid(self) -> UUID:
+        return self.stack.aid
+
+
+class PkgManagerObject(GObject.Object):
+    """
+    List model item wrapping a PkgManager.
+    """
+
+    __gtype_name__: str = "PkgManagerObject"
+
+    def __init__(self, pkgmanager: PkgManager) -> None:
+        super().__init__()
+        self.pkgmanager: PkgManager = pkgmanager
+
+    @property
+    def aid(self) -> UUID:
+        return self.pkgmanager.aid
+
+
+class PackageObject(GObject.Object):
+    """
+    List model item for a package found in one or more subsystems.
+    """
+
+    __gtype_name__: str = "PackageObject"
+
+    name = GObject.Property(type=str, default="")
+    summary = GObject.Property(type=str, default="")
+    subsystems = GObject.Property(type=str, default="")
+    installed = GObject.Property(type=str, default="")
+
+    def __init__(
+        self, name: str, summary: str, subsystem: str | None = None
+    ) -> None:
+        super().__init__()
+        self.__subsystems: list[str] = []
+        self.name = name
+        self.summary = summary
+        if subsystem is not None:
+            self.add_subsystem(subsystem)
+
+    def set_installed(self, subsystems: set[str]) -> None:
+        value: str = ", ".join(sorted(subsystems))
+        if self.installed != value:
+            self.installed = value
+
+    def add_subsystem(self, subsystem: str, summary: str = "") -> None:
+        if subsystem in self.__subsystems:
+            return
+
+        self.__subsystems.append(subsystem)
+        self.subsystems = ", ".join(self.__subsystems)
+        if summary and not self.summary:
+            self.summary = summary
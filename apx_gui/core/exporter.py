@@ -0,0 +1,94 @@
+# exporter.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import yaml
+import tempfile
+from gettext import gettext as _
+
+from apx_gui.core.apx_entities import PkgManager, Stack
+from apx_gui.core.run_async import Progress
+
+
+class Exporter:
+    """
+    This class is used to export stacks and package managers to a single
+    multi-document YAML file, one document per entity, which can be
+    imported back. Documents are written one at a time to a temporary file
+    next to the destination, which replaces it once complete with the
+    permissions of the replaced file, or the default ones for a new file.
+    """
+
+    @staticmethod
+    def __umask() -> int:
+        """
+        The umask of the process, read without changing it where the
+        kernel reports it, as other threads may be creating files.
+        """
+        try:
+            with open("/proc/self/status") as status:
+                for line in status:
+                    if line.startswith("Umask:"):
+                        return int(line.split()[1], 8)
+        except (OSError, ValueError):
+            pass
+
+        umask: int = os.umask(0o022)
+        os.umask(umask)
+        return umask
+
+    @staticmethod
+    def write(
+        path: str,
+        entities: list[PkgManager | Stack],
+        progress: Progress | None = None,
+    ) -> int:
+        """
+        Write the custom entities among `entities` to `path`, package
+        managers first, and return how many were written.
+        """
+        exported: list[PkgManager | Stack] = sorted(
+            (entity for entity in entities if not entity.built_in),
+            key=lambda entity: not isinstance(entity, PkgManager),
+        )
+
+        descriptor, temp_path = tempfile.mkstemp(
+            prefix=".apx-export-", suffix=".yml", dir=os.path.dirname(path) or "."
+        )
+        try:
+            with os.fdopen(descriptor, "w") as file:
+                for index, entity in enumerate(exported):
+                    file.write("---\n")
+                    yaml.safe_dump(entity.to_definition(), file, sort_keys=False)
+                    if progress is not None:
+                        progress.update(
+                            fraction=(index + 1) / len(exported),
+                            phase=_("Exporting {}").format(entity.name),
+                        )
+            # mkstemp creates the file readable by the owner only
+            if os.path.exists(path):
+                os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+            else:
+                os.chmod(temp_path, 0o666 & ~Exporter.__umask())
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        return len(exported)
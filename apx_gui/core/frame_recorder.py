@@ -0,0 +1,261 @@
+# frame_recorder.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import math
+import heapq
+import time
+from collections import deque
+from typing import Any
+
+from gi.repository import Gdk, GLib
+
+from apx_gui.core.watchdog import Watchdog
+
+
+class FrameRecorder:
+    """
+    This class is used to record the frames painted by a GdkFrameClock.
+    For each frame it keeps when it started, how long the frame clock
+    took to update, lay it out and paint it, the time since the previous
+    frame, how many vblanks were missed before it and which apx commands
+    were in flight meanwhile.
+    A timeout on the main loop also records the callbacks that blocked
+    it for longer than `long_callback_ms`, so stalls are visible even
+    when the watchdog is not running.
+    """
+
+    max_frames: int = 3600
+    max_long_callbacks: int = 200
+    default_refresh_interval_ms: float = 1000 / 60
+    tick_interval_ms: int = 10
+    long_callback_ms: float = 50
+    idle_gap_ms: float = 250
+
+    def __init__(self, frame_clock: Gdk.FrameClock) -> None:
+        self.frames: deque[dict[str, Any]] = deque(maxlen=self.max_frames)
+        self.long_callbacks: deque[dict[str, Any]] = deque(
+            maxlen=self.max_long_callbacks
+        )
+        self.dropped: int = 0
+
+        self.__frame_clock: Gdk.FrameClock = frame_clock
+        self.__frame_started: float | None = None
+        self.__last_frame_time: int | None = None
+        self.__last_stall_end: int = 0
+        self.__last_tick: int = GLib.get_monotonic_time()
+        self.__handlers: list[int] = [
+            frame_clock.connect("before-paint", self.__on_before_paint),
+            frame_clock.connect("after-paint", self.__on_after_paint),
+        ]
+        self.__tick_source: int | None = GLib.timeout_add(
+            self.tick_interval_ms, self.__on_tick
+        )
+
+    def stop(self) -> None:
+        for handler in self.__handlers:
+            self.__frame_clock.disconnect(handler)
+        self.__handlers = []
+        if self.__tick_source is not None:
+            GLib.source_remove(self.__tick_source)
+            self.__tick_source = None
+
+    @property
+    def refresh_interval_ms(self) -> float:
+        timings: Gdk.FrameTimings | None = self.__frame_clock.get_current_timings()
+        if timings is None or not timings.get_refresh_interval():
+            return self.default_refresh_interval_ms
+        return timings.get_refresh_interval() / 1000
+
+    def __on_tick(self) -> bool:
+        now: int = GLib.get_monotonic_time()
+        late_ms: float = (now - self.__last_tick) / 1000 - self.tick_interval_ms
+        self.__last_tick = now
+
+        if late_ms > self.long_callback_ms:
+            self.__last_stall_end = now
+            self.long_callbacks.append(
+                {
+                    "started": time.time() - late_ms / 1000,
+                    "duration_ms": late_ms,
+                    "commands": list(Watchdog.commands_in_flight().values()),
+                }
+            )
+
+        return True
+
+    def __on_before_paint(self, frame_clock: Gdk.FrameClock) -> None:
+        self.__frame_started = time.time()
+
+    def __on_after_paint(self, frame_clock: Gdk.FrameClock) -> None:
+        if self.__frame_started is None:
+            return
+
+        started: float = self.__frame_started
+        duration_ms: float = (time.time() - started) * 1000
+        self.__frame_started = None
+
+        # the frame clock stops ticking when nothing changes, a long gap
+        # only means missed vblanks if the main loop was blocked during it
+        frame_time: int = frame_clock.get_frame_time()
+        interval_ms: float = 0.0
+        dropped: int = 0
+        if self.__last_frame_time is not None:
+            interval_ms = (frame_time - self.__last_frame_time) / 1000
+            if (
+                interval_ms <= self.idle_gap_ms
+                or self.__last_stall_end > self.__last_frame_time
+            ):
+                dropped = max(round(interval_ms / self.refresh_interval_ms) - 1, 0)
+        self.__last_frame_time = frame_time
+        self.dropped += dropped
+
+        self.frames.append(
+            {
+                "time": started,
+                "duration_ms": duration_ms,
+                "interval_ms": interval_ms,
+                "dropped": dropped,
+                "commands": list(Watchdog.commands_in_flight().values()),
+            }
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Summary of the recorded frames, the frame rate only counts the
+        last second.
+        """
+        durations: list[float] = sorted(frame["duration_ms"] for frame in self.frames)
+        now: float = time.time()
+
+        return {
+            "frames": len(self.frames),
+            "fps": sum(1 for frame in self.frames if now - frame["time"] <= 1),
+            "avg_ms": sum(durations) / len(durations) if durations else 0.0,
+            "p95_ms": (
+                durations[math.ceil(len(durations) * 0.95) - 1] if durations else 0.0
+            ),
+            "max_ms": durations[-1] if durations else 0.0,
+            "dropped": self.dropped,
+            "busy_frames": sum(1 for frame in self.frames if frame["commands"]),
+            "long_callbacks": len(self.long_callbacks),
+            "longest_callback_ms": max(
+                (callback["duration_ms"] for callback in self.long_callbacks),
+                default=0.0,
+            ),
+        }
+
+    def longest_frames(self, count: int = 10) -> list[dict[str, Any]]:
+        return heapq.nlargest(count, self.frames, key=lambda frame: frame["duration_ms"])
+
+    def trace(
+        self,
+        stalls: list[dict[str, Any]] | None = None,
+        tab_builds: list[tuple[str, float, float]] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Build a trace in the Trace Event Format, it can be opened with
+        about:tracing or ui.perfetto.dev. Main loop stalls reported by the
+        watchdog, long main loop callbacks and tab build times are added
+        as separate tracks.
+        """
+        pid: int = os.getpid()
+        events: list[dict[str, Any]] = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in [
+                (1, "Frames"),
+                (2, "Main loop stalls"),
+                (3, "Tabs"),
+                (4, "Long callbacks"),
+            ]
+        ]
+
+        for frame in self.frames:
+            events.append(
+                {
+                    "name": "apx frame" if frame["commands"] else "frame",
+                    "cat": "frame",
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": 1,
+                    "ts": frame["time"] * 1e6,
+                    "dur": frame["duration_ms"] * 1e3,
+                    "args": {
+                        "interval_ms": frame["interval_ms"],
+                        "dropped": frame["dropped"],
+                        "commands": frame["commands"],
+                    },
+                }
+            )
+
+        for stall in stalls or []:
+            events.append(
+                {
+                    "name": stall["command"] or "stall",
+                    "cat": "stall",
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": 2,
+                    "ts": stall["started"] * 1e6,
+                    "dur": stall["duration_ms"] * 1e3,
+                    "args": {"commands": stall["commands"], "stack": stall["stack"]},
+                }
+            )
+
+        for callback in self.long_callbacks:
+            events.append(
+                {
+                    "name": "long callback",
+                    "cat": "stall",
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": 4,
+                    "ts": callback["started"] * 1e6,
+                    "dur": callback["duration_ms"] * 1e3,
+                    "args": {"commands": callback["commands"]},
+                }
+            )
+
+        for name, started, duration_ms in tab_builds or []:
+            events.append(
+                {
+                    "name": name,
+                    "cat": "tab",
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": 3,
+                    "ts": started * 1e6,
+                    "dur": duration_ms * 1e3,
+                }
+            )
+
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "metadata": {
+                "refresh_interval_ms": self.refresh_interval_ms,
+                **self.stats(),
+            },
+        }
@@ -0,0 +1,237 @@
+# importer.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import yaml
+from gettext import gettext as _
+from typing import Any
+
+from apx_gui.core.apx_entities import PkgManager, Stack
+from apx_gui.core.run_async import Progress
+from apx_gui.core.task_pool import TaskPool
+
+
+class ImportResult:
+    """
+    The outcome of importing a single YAML document.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        name: str,
+        entity: PkgManager | Stack | None = None,
+        ok: bool = False,
+        message: str = "",
+    ) -> None:
+        self.source: str = source
+        self.name: str = name
+        self.entity: PkgManager | Stack | None = entity
+        self.ok: bool = ok
+        self.message: str = message
+
+
+class Importer:
+    """
+    This class is used to import stacks and package managers from YAML
+    files, directories of YAML files and multi-document YAML files.
+    Files are parsed and validated in parallel, package managers are
+    created before the stacks which may depend on them and every creation
+    runs on a bounded pool. It blocks until done, so it is meant to be run
+    through `RunAsync`.
+    """
+
+    extensions: tuple[str, ...] = (".yml", ".yaml")
+    pkgmanager_keys: list[str] = [
+        "name",
+        "needsudo",
+        "cmdautoremove",
+        "cmdclean",
+        "cmdinstall",
+        "cmdlist",
+        "cmdpurge",
+        "cmdremove",
+        "cmdsearch",
+        "cmdshow",
+        "cmdupdate",
+        "cmdupgrade",
+    ]
+    stack_keys: list[str] = ["name", "base", "packages", "pkgmanager"]
+
+    def __init__(
+        self, pkgmanagers: set[str], stacks: set[str], max_workers: int = 4
+    ) -> None:
+        self.__pkgmanagers: set[str] = set(pkgmanagers)
+        self.__stacks: set[str] = set(stacks)
+        self.__pool: TaskPool = TaskPool(max_workers)
+
+    @classmethod
+    def collect(cls, paths: list[str]) -> list[str]:
+        """
+        Expand directories in `paths` to the YAML files they contain.
+        """
+        files: list[str] = []
+        for path in paths:
+            if not os.path.isdir(path):
+                files.append(path)
+                continue
+
+            for root, _dirs, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name)
+                    for name in sorted(names)
+                    if name.endswith(cls.extensions)
+                )
+        return files
+
+    def __parse(self, path: str) -> list[ImportResult]:
+        """
+        Read every document of `path` and build the entity it describes,
+        without creating it.
+        """
+        with open(path) as file:
+            documents: list[Any] = [
+                document
+                for document in yaml.load_all(file, Loader=yaml.SafeLoader)
+                if document is not None
+            ]
+
+        results: list[ImportResult] = []
+        for index, document in enumerate(documents):
+            source: str = os.path.basename(path)
+            if len(documents) > 1:
+                source = f"{source}#{index + 1}"
+            results.append(self.__validate(source, document))
+        return results
+
+    def __validate(self, source: str, document: Any) -> ImportResult:
+        if not isinstance(document, dict):
+            return ImportResult(source, "", message=_("Not a YAML mapping"))
+
+        name: str = str(document.get("name", ""))
+        if all(key in document for key in self.pkgmanager_keys):
+            return ImportResult(
+                source,
+                name,
+                PkgManager(
+                    name,
+                    str(document["needsudo"]).lower() in ("true", "yes", "1"),
+                    *[str(document[key]) for key in self.pkgmanager_keys[2:]],
+                    False,
+                ),
+                ok=True,
+            )
+
+        if all(key in document for key in self.stack_keys):
+            return ImportResult(
+                source,
+                name,
+                Stack(
+                    name,
+                    str(document["base"]),
+                    document["packages"] or [],
+                    str(document["pkgmanager"]),
+                    False,
+                ),
+                ok=True,
+            )
+
+        missing: list[str] = [
+            key
+            for key in min(
+                [self.pkgmanager_keys, self.stack_keys],
+                key=lambda keys: sum(key not in document for key in keys),
+            )
+            if key not in document
+        ]
+        return ImportResult(
+            source,
+            name,
+            message=_("Missing keys: {}").format(", ".join(missing)),
+        )
+
+    def __create(
+        self, results: list[ImportResult], progress: Progress | None
+    ) -> None:
+        outcomes: list[tuple[str, Any, Exception | None, float]] = self.__pool.run(
+            [
+                (result.name, result.entity.create)  # pyright: ignore
+                for result in results
+            ],
+            progress,
+        )
+        for result, (_name, outcome, error, _duration) in zip(results, outcomes):
+            if error is not None:
+                result.ok, result.message = False, str(error)
+            elif not outcome[0]:
+                result.ok, result.message = False, _("apx could not create it")
+            else:
+                result.entity = outcome[1]
+
+    def __claim(self, result: ImportResult, names: set[str]) -> None:
+        if result.name in names:
+            result.ok, result.message = False, _("{} already exists").format(
+                result.name
+            )
+        else:
+            names.add(result.name)
+
+    def run(
+        self, paths: list[str], progress: Progress | None = None
+    ) -> list[ImportResult]:
+        files: list[str] = self.collect(paths)
+
+        if progress is not None:
+            progress.update(phase=_("Reading {} files").format(len(files)))
+        results: list[ImportResult] = []
+        for path, parsed, error, _duration in self.__pool.run(
+            [(path, lambda path=path: self.__parse(path)) for path in files]
+        ):
+            if error is not None:
+                results.append(
+                    ImportResult(os.path.basename(path), "", message=str(error))
+                )
+            else:
+                results.extend(parsed)
+
+        pkgmanagers: list[ImportResult] = []
+        stacks: list[ImportResult] = []
+        for result in results:
+            if isinstance(result.entity, PkgManager):
+                self.__claim(result, self.__pkgmanagers)
+                if result.ok:
+                    pkgmanagers.append(result)
+            elif isinstance(result.entity, Stack):
+                self.__claim(result, self.__stacks)
+                if result.ok:
+                    stacks.append(result)
+
+        self.__create(pkgmanagers, progress)
+        available: set[str] = self.__pkgmanagers - {
+            result.name for result in pkgmanagers if not result.ok
+        }
+
+        for result in stacks:
+            if result.entity.pkg_manager not in available:  # pyright: ignore
+                result.ok, result.message = False, _(
+                    "Unknown package manager {}"
+                ).format(result.entity.pkg_manager)  # pyright: ignore
+        self.__create([result for result in stacks if result.ok], progress)
+
+        return results
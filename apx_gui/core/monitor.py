@@ -18,7 +18,6 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import json
-import os
 import podman
 import logging
 
@@ -27,14 +26,12 @@ from typing import Any
 from datetime import datetime, UTC
 from podman import PodmanClient
 
+from apx_gui.core.podman import Podman
+
 logger = logging.getLogger(__name__)
 
 class Monitor:
     __last_read = datetime.now(UTC)
-    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
-    if not runtime_dir:
-        runtime_dir = f"/run/user/{os.getuid()}"
-    __socket_path = f"{runtime_dir}/podman/podman.sock"
 
     watch_events = ["event=start", "event=died"]
 
@@ -51,10 +48,7 @@ class Monitor:
         list[dict[str, Any]]
             filtered events received from Podman
         """
-        if custom_socket:
-            podman_uri = f"unix://{custom_socket}"
-        else:
-            podman_uri = f"unix://{Monitor.__socket_path}"
+        podman_uri = Podman.socket_uri(custom_socket)
 
         now = datetime.now(UTC)
 
@@ -0,0 +1,268 @@
+# package_index.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import json
+import logging
+import tempfile
+import threading
+from typing import Any
+
+from gi.repository import GLib
+
+from apx_gui.core.apx_entities import Subsystem, PkgManager
+from apx_gui.core.podman import Podman
+from apx_gui.core.run_async import Progress
+from apx_gui.core.task_pool import TaskPool
+
+logger = logging.getLogger("Vanilla::PackageIndex")
+
+
+class PackageIndex:
+    """
+    This class is used to keep the installed packages of every subsystem,
+    as listed by the `cmd_list` of its package manager, in memory and on
+    disk. Each entry is stored under the ID of the container it was read
+    from, together with the modification time of the package database in
+    the container upper layer, so that a subsystem is listed again only
+    when it was recreated, its package database changed or it was
+    invalidated after an install or remove.
+    """
+
+    db_paths: list[str] = [
+        "var/lib/dpkg/status",
+        "var/lib/rpm/rpmdb.sqlite",
+        "var/lib/rpm/Packages",
+        "usr/lib/sysimage/rpm/rpmdb.sqlite",
+        "usr/lib/sysimage/rpm/Packages",
+        "var/lib/pacman/local",
+        "lib/apk/db/installed",
+        "var/lib/xbps",
+    ]
+
+    def __init__(self, cache_dir: str | None = None) -> None:
+        self.cache_dir: str = cache_dir or os.path.join(
+            GLib.get_user_cache_dir(), "apx-gui", "packages"
+        )
+
+        self.__lock: threading.Lock = threading.Lock()
+        self.__entries: dict[str, dict[str, Any]] = {}
+        self.__owners: dict[str, set[str]] = {}
+        self.__stale: set[str] = set()
+
+    def load(self) -> None:
+        """
+        Read the entries cached on disk.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(".json"):
+                continue
+
+            try:
+                with open(os.path.join(self.cache_dir, filename)) as file:
+                    entry: dict[str, Any] = json.load(file)
+                self.__set(entry["subsystem"], entry)
+            except (OSError, ValueError, KeyError) as err:
+                logger.warning(f"Ignoring the package cache {filename}: {err}")
+
+    def find(self, package: str) -> set[str]:
+        """
+        Names of the subsystems where `package` is installed.
+        """
+        with self.__lock:
+            return set(self.__owners.get(package, ()))
+
+    def match(self, query: str) -> dict[str, set[str]]:
+        """
+        Installed packages whose name contains `query`, with the
+        subsystems they are installed in.
+        """
+        query = query.lower()
+        with self.__lock:
+            return {
+                package: set(owners)
+                for package, owners in self.__owners.items()
+                if query in package.lower()
+            }
+
+    def packages(self, subsystem: str) -> dict[str, str]:
+        with self.__lock:
+            entry: dict[str, Any] | None = self.__entries.get(subsystem)
+            return dict(entry["packages"]) if entry is not None else {}
+
+    def drift(self, subsystem: Subsystem) -> set[str] | None:
+        """
+        The packages declared by the stack of `subsystem` which are not
+        installed in it, None if the subsystem was never listed.
+        """
+        with self.__lock:
+            entry: dict[str, Any] | None = self.__entries.get(subsystem.name)
+            if entry is None:
+                return None
+            return set(subsystem.stack.package_names).difference(entry["packages"])
+
+    def invalidate(self, subsystem: str) -> None:
+        """
+        Force the next refresh of `subsystem` to list its packages again,
+        to be called after installing or removing packages.
+        """
+        with self.__lock:
+            self.__stale.add(subsystem)
+
+    def __set(self, subsystem: str, entry: dict[str, Any] | None) -> None:
+        with self.__lock:
+            previous: dict[str, Any] | None = self.__entries.pop(subsystem, None)
+            if previous is not None:
+                for package in previous["packages"]:
+                    owners: set[str] = self.__owners[package]
+                    owners.discard(subsystem)
+                    if not owners:
+                        del self.__owners[package]
+
+            if entry is None:
+                return
+
+            self.__entries[subsystem] = entry
+            for package in entry["packages"]:
+                self.__owners.setdefault(package, set()).add(subsystem)
+
+    def __stamp(self, subsystem: Subsystem) -> tuple[str, float | None] | None:
+        """
+        The container ID of `subsystem` and the last modification time of
+        its package database, None if the container cannot be inspected.
+        """
+        data: dict[str, Any] | None = Podman.inspect(subsystem.internal_name)
+        if data is None:
+            return None
+
+        upper: str = (
+            data.get("GraphDriver", {}).get("Data", {}).get("UpperDir") or ""
+        )
+        mtimes: list[float] = [
+            os.stat(os.path.join(upper, path)).st_mtime
+            for path in self.db_paths
+            if upper and os.path.exists(os.path.join(upper, path))
+        ]
+        return data["Id"], max(mtimes) if mtimes else None
+
+    def __needs_refresh(
+        self, subsystem: Subsystem, container: str, stamp: float | None
+    ) -> bool:
+        with self.__lock:
+            entry: dict[str, Any] | None = self.__entries.get(subsystem.name)
+            stale: bool = subsystem.name in self.__stale
+
+        if entry is None or stale or entry["container"] != container:
+            return True
+        # without a readable package database only invalidations count
+        return stamp is not None and stamp != entry["stamp"]
+
+    def refresh(
+        self, subsystem: Subsystem, pkgmanager: PkgManager, force: bool = False
+    ) -> bool:
+        """
+        List the packages of `subsystem` again if needed, return whether
+        the entry changed. Stopped subsystems are only listed when forced,
+        as listing starts them.
+        """
+        stamp: tuple[str, float | None] | None = self.__stamp(subsystem)
+        if stamp is None:
+            return False
+
+        container, mtime = stamp
+        if not force and (
+            not subsystem.running
+            or not self.__needs_refresh(subsystem, container, mtime)
+        ):
+            return False
+
+        ok, output = subsystem.list_packages()
+        if not ok:
+            return False
+
+        entry: dict[str, Any] = {
+            "subsystem": subsystem.name,
+            "container": container,
+            "stamp": mtime,
+            "packages": pkgmanager.parse_list_output(output),
+        }
+        with self.__lock:
+            self.__stale.discard(subsystem.name)
+            previous: dict[str, Any] | None = self.__entries.get(subsystem.name)
+        if previous is not None and previous["container"] != container:
+            # the subsystem was recreated, forget the old container
+            self.__remove(subsystem.name)
+        self.__set(subsystem.name, entry)
+        self.__save(entry)
+        return True
+
+    def refresh_all(
+        self,
+        subsystems: list[Subsystem],
+        pkgmanagers: list[PkgManager],
+        max_workers: int = 4,
+        progress: Progress | None = None,
+    ) -> list[str]:
+        """
+        Refresh every subsystem on a bounded pool and drop the entries of
+        subsystems which no longer exist. Return the refreshed names.
+        """
+        by_name: dict[str, PkgManager] = {
+            pkgmanager.name: pkgmanager for pkgmanager in pkgmanagers
+        }
+        known: set[str] = {subsystem.name for subsystem in subsystems}
+        with self.__lock:
+            gone: list[str] = [name for name in self.__entries if name not in known]
+        for name in gone:
+            self.__remove(name)
+
+        results: list[tuple[str, Any, Exception | None, float]] = TaskPool(
+            max_workers
+        ).run(
+            [
+                (
+                    subsystem.name,
+                    lambda s=subsystem: self.refresh(s, by_name[s.stack.pkg_manager]),
+                )
+                for subsystem in subsystems
+                if subsystem.stack.pkg_manager in by_name
+            ],
+            progress,
+        )
+        return [name for name, refreshed, _error, _duration in results if refreshed]
+
+    def __path(self, container: str) -> str:
+        return os.path.join(self.cache_dir, f"{container}.json")
+
+    def __save(self, entry: dict[str, Any]) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(entry, file, separators=(",", ":"))
+        os.replace(temp_path, self.__path(entry["container"]))
+
+    def __remove(self, subsystem: str) -> None:
+        with self.__lock:
+            entry: dict[str, Any] | None = self.__entries.get(subsystem)
+        self.__set(subsystem, None)
+        if entry is not None and os.path.exists(self.__path(entry["container"])):
+            os.remove(self.__path(entry["container"]))
@@ -0,0 +1,172 @@
+# package_info.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+
+import os
+import json
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+from gi.repository import GLib
+
+from apx_gui.core.apx_entities import Subsystem
+from apx_gui.core.run_async import RunAsync
+
+logger = logging.getLogger("Vanilla::PackageInfo")
+
+
+class PackageInfoCache:
+    """
+    This class is used to keep the output of the `cmd_show` of package
+    managers in a size-bounded LRU cache, keyed by package manager, base
+    image and package name, so that browsing a package list does not exec
+    into a container for every lookup. The cache is saved on disk and the
+    entries of a package manager and base are dropped after `cmd_update`.
+    New entries are saved `save_delay` ms after the last lookup, or when
+    `flush` is called.
+    """
+
+    save_delay: int = 2000
+    show_timeout: float = 30
+
+    def __init__(self, capacity: int = 512, path: str | None = None) -> None:
+        self.capacity: int = capacity
+        self.path: str = path or os.path.join(
+            GLib.get_user_cache_dir(), "apx-gui", "package-info.json"
+        )
+
+        self.__lock: threading.Lock = threading.Lock()
+        self.__entries: OrderedDict[tuple[str, str, str], str] = OrderedDict()
+        self.__save_source: int | None = None
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def load(self) -> None:
+        """
+        Read the entries saved on disk, oldest first.
+        """
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path) as file:
+                entries: list[list[str]] = json.load(file)
+        except (OSError, ValueError) as err:
+            logger.warning(f"Ignoring the package info cache: {err}")
+            return
+
+        with self.__lock:
+            for pkgmanager, base, package, info in entries[-self.capacity :]:
+                self.__entries[(pkgmanager, base, package)] = info
+                self.__entries.move_to_end((pkgmanager, base, package))
+            self.__evict()
+
+    def save(self) -> None:
+        with self.__lock:
+            entries: list[list[str]] = [
+                [*key, info] for key, info in self.__entries.items()
+            ]
+
+        directory: str = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(entries, file, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    def schedule_save(self) -> None:
+        """
+        Save the cache once no new entry was added for `save_delay` ms.
+        """
+        with self.__lock:
+            if self.__save_source is not None:
+                GLib.source_remove(self.__save_source)
+            self.__save_source = GLib.timeout_add(self.save_delay, self.__on_save)
+
+    def __on_save(self) -> bool:
+        with self.__lock:
+            self.__save_source = None
+        RunAsync(self.save)
+        return False
+
+    def flush(self) -> None:
+        """
+        Save a pending change right away, to be called on shutdown.
+        """
+        with self.__lock:
+            if self.__save_source is None:
+                return
+            GLib.source_remove(self.__save_source)
+            self.__save_source = None
+        self.save()
+
+    def get(self, pkgmanager: str, base: str, package: str) -> str | None:
+        with self.__lock:
+            info: str | None = self.__entries.get((pkgmanager, base, package))
+            if info is not None:
+                self.__entries.move_to_end((pkgmanager, base, package))
+            return info
+
+    def put(self, pkgmanager: str, base: str, package: str, info: str) -> None:
+        with self.__lock:
+            self.__entries[(pkgmanager, base, package)] = info
+            self.__entries.move_to_end((pkgmanager, base, package))
+            self.__evict()
+
+    def __evict(self) -> None:
+        while len(self.__entries) > self.capacity:
+            self.__entries.popitem(last=False)
+
+    def invalidate(self, pkgmanager: str, base: str) -> None:
+        """
+        Drop the entries of `pkgmanager` on `base`, to be called after the
+        package lists were updated with `cmd_update`.
+        """
+        with self.__lock:
+            stale: list[tuple[str, str, str]] = [
+                key for key in self.__entries if key[:2] == (pkgmanager, base)
+            ]
+            for key in stale:
+                del self.__entries[key]
+
+        if stale:
+            self.save()
+
+    def lookup(self, subsystem: Subsystem, package: str) -> tuple[bool, str]:
+        """
+        The details of `package` as shown by the package manager of
+        `subsystem`, asking the subsystem only on a cache miss.
+        """
+        pkgmanager: str = subsystem.stack.pkg_manager
+        base: str = subsystem.stack.base
+
+        info: str | None = self.get(pkgmanager, base, package)
+        if info is not None:
+            return True, info
+
+        ok, output = subsystem.show_package(package, self.show_timeout)
+        if not ok:
+            return ok, output
+
+        self.put(pkgmanager, base, package, output)
+        self.schedule_save()
+        return ok, output
@@ -0,0 +1,171 @@
+# podman.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import logging
+from typing import Any, Callable
+
+from podman import PodmanClient
+
+logger = logging.getLogger("Vanilla::Podman")
+
+
+class Podman:
+    """
+    This class is used to reach the rootless Podman service of the user
+    through its socket, without spawning podman processes.
+    """
+
+    runtime_dir: str = os.environ.get("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+    socket_path: str = f"{runtime_dir}/podman/podman.sock"
+
+    @staticmethod
+    def socket_uri(custom_socket: str | None = None) -> str:
+        return f"unix://{custom_socket or Podman.socket_path}"
+
+    @staticmethod
+    def inspect(container: str) -> dict[str, Any] | None:
+        """
+        Return the inspect data of `container`, or None if it does not
+        exist or the service is not reachable.
+        """
+        try:
+            with PodmanClient(base_url=Podman.socket_uri()) as client:
+                return client.containers.get(container).inspect()
+        except Exception as err:
+            logger.debug(f"Could not inspect {container}: {err}")
+            return None
+
+    @staticmethod
+    def commit(container: str, repository: str, tag: str) -> bool:
+        """
+        Save the current state of `container` as the image
+        `repository:tag`.
+        """
+        try:
+            with PodmanClient(base_url=Podman.socket_uri()) as client:
+                client.containers.get(container).commit(repository=repository, tag=tag)
+                return True
+        except Exception as err:
+            logger.error(f"Could not commit {container}: {err}")
+            return False
+
+    @staticmethod
+    def image_tags(repository: str) -> list[str]:
+        """
+        The tags of the local images of `repository`, as `repository:tag`.
+        """
+        try:
+            with PodmanClient(base_url=Podman.socket_uri()) as client:
+                return [
+                    tag
+                    for image in client.images.list(filters={"reference": repository})
+                    for tag in image.tags
+                    if tag.rsplit(":", 1)[0] == repository
+                ]
+        except Exception as err:
+            logger.debug(f"Could not list the images of {repository}: {err}")
+            return []
+
+    @staticmethod
+    def images(repository: str) -> list[dict[str, Any]]:
+        """
+        The local images of `repository`, newest first, each with its
+        `repository:tag` name, creation time and size in bytes.
+        """
+        try:
+            with PodmanClient(base_url=Podman.socket_uri()) as client:
+                images: list[dict[str, Any]] = [
+                    {
+                        "name": tag,
+                        "created": image.attrs.get("Created", 0),
+                        "size": image.attrs.get("Size", 0),
+                    }
+                    for image in client.images.list(filters={"reference": repository})
+                    for tag in image.tags
+                    if tag.rsplit(":", 1)[0] == repository
+                ]
+        except Exception as err:
+            logger.debug(f"Could not list the images of {repository}: {err}")
+            return []
+
+        return sorted(images, key=lambda image: image["created"], reverse=True)
+
+    @staticmethod
+    def remove_image(image: str) -> bool:
+        try:
+            with PodmanClient(base_url=Podman.socket_uri()) as client:
+                client.images.remove(image)
+                return True
+        except Exception as err:
+            logger.warning(f"Could not remove the image {image}: {err}")
+            return False
+
+    @staticmethod
+    def image_exists(image: str) -> bool:
+        try:
+            with PodmanClient(base_url=Podman.socket_uri()) as client:
+                return client.images.exists(image)
+        except Exception as err:
+            logger.debug(f"Could not look for the image {image}: {err}")
+            return False
+
+    @staticmethod
+    def image_size(image: str) -> int:
+        try:
+            with PodmanClient(base_url=Podman.socket_uri()) as client:
+                return client.images.get(image).attrs.get("Size", 0)
+        except Exception as err:
+            logger.debug(f"Could not read the size of {image}: {err}")
+            return 0
+
+    @staticmethod
+    def graph_root() -> str | None:
+        """
+        The directory where the service stores images, None if the
+        service is not reachable.
+        """
+        try:
+            with PodmanClient(base_url=Podman.socket_uri()) as client:
+                return client.info()["store"]["graphRoot"]
+        except Exception as err:
+            logger.debug(f"Could not read the storage root: {err}")
+            return None
+
+    @staticmethod
+    def pull(image: str, on_line: Callable[[str], None] | None = None) -> bool:
+        """
+        Pull `image`, passing each progress line of the service to
+        `on_line`.
+        """
+        try:
+            with PodmanClient(base_url=Podman.socket_uri()) as client:
+                for report in client.images.pull(image, stream=True, decode=True):
+                    if not isinstance(report, dict):
+                        report = {"stream": str(report)}
+                    if report.get("error"):
+                        logger.error(f"Could not pull {image}: {report['error']}")
+                        return False
+                    line: str = str(report.get("stream", "")).strip()
+                    if line and on_line is not None:
+                        on_line(line)
+            return True
+        except Exception as err:
+            logger.error(f"Could not pull {image}: {err}")
+            return False
@@ -0,0 +1,252 @@
+# prefetcher.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from typing import Any
+from gettext import gettext as _
+
+from gi.repository import GLib
+
+from apx_gui.core.apx_entities import Stack, Subsystem
+from apx_gui.core.podman import Podman
+
+logger = logging.getLogger("Vanilla::Prefetcher")
+
+
+class ImagePrefetcher:
+    """
+    This class is used to pull the base images of the stacks likely to
+    be used next in the background, one at a time on a single thread so
+    that it never competes with itself for bandwidth.
+    The images it pulled are recorded on disk with their size and when
+    they were last wanted. Before each pull the prefetched images still
+    on disk, plus the size of the next one when it was pulled before,
+    are compared with `budget` bytes, evicting the least recently wanted
+    ones to make room. Images used by a container cannot be removed and
+    are no longer tracked. Pulls also stop when the storage has less than
+    `min_free` bytes left.
+    """
+
+    min_free: int = 1 << 30
+
+    def __init__(self, budget: int, path: str | None = None) -> None:
+        self.budget: int = budget
+        self.path: str = path or os.path.join(
+            GLib.get_user_cache_dir(), "apx-gui", "prefetched.json"
+        )
+
+        self.__lock: threading.Lock = threading.Lock()
+        self.__queue: list[str] = []
+        self.__states: dict[str, str] = {}
+        self.__details: dict[str, str] = {}
+        self.__records: dict[str, dict[str, Any]] | None = None
+        self.__thread: threading.Thread | None = None
+
+    @staticmethod
+    def recent_bases(
+        stacks: list[Stack],
+        subsystems: list[Subsystem],
+        last_used: dict[str, int],
+        count: int = 3,
+    ) -> list[str]:
+        """
+        The base images of the stacks of the `count` most recently used
+        subsystems.
+        """
+        by_name: dict[str, Stack] = {stack.name: stack for stack in stacks}
+        bases: list[str] = []
+        for subsystem in sorted(
+            subsystems, key=lambda s: last_used.get(s.name, 0), reverse=True
+        ):
+            stack: Stack | None = by_name.get(subsystem.stack.name)
+            if stack is not None and stack.base not in bases:
+                bases.append(stack.base)
+            if len(bases) == count:
+                break
+        return bases
+
+    def queue(self, images: list[str], urgent: bool = False) -> None:
+        """
+        Pull `images` in the background, before the already queued ones
+        when `urgent`.
+        """
+        if self.budget <= 0:
+            return
+
+        with self.__lock:
+            for image in reversed(images) if urgent else images:
+                if self.__states.get(image) in ("local", "pulling"):
+                    continue
+                if image in self.__queue:
+                    self.__queue.remove(image)
+                if urgent:
+                    self.__queue.insert(0, image)
+                else:
+                    self.__queue.append(image)
+                self.__states[image] = "queued"
+
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+
+    def state(self, image: str) -> tuple[str, str]:
+        """
+        Whether `image` is "local", "pulling", "queued", "skipped",
+        "failed" or "missing", with the last progress line or reason.
+        Checks the storage for unknown images, so do not call it from
+        the main thread.
+        """
+        with self.__lock:
+            state: str | None = self.__states.get(image)
+            detail: str = self.__details.get(image, "")
+
+        if state in (None, "missing", "skipped", "failed") and Podman.image_exists(
+            image
+        ):
+            state = "local"
+            with self.__lock:
+                self.__states[image] = state
+        return state or "missing", detail
+
+    def __set(self, image: str, state: str, detail: str = "") -> None:
+        with self.__lock:
+            self.__states[image] = state
+            self.__details[image] = detail
+
+    def __load(self) -> dict[str, dict[str, Any]]:
+        """
+        The prefetched images as `{image: {"size", "wanted", "local"}}`,
+        read from disk on first use. Only called from the pull thread.
+        """
+        if self.__records is not None:
+            return self.__records
+
+        self.__records = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as file:
+                    self.__records = json.load(file)
+            except (OSError, ValueError) as err:
+                logger.warning(f"Ignoring the prefetched images record: {err}")
+        return self.__records
+
+    def __save(self) -> None:
+        directory: str = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(self.__records, file, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    def __on_disk(self, keep: str) -> int:
+        """
+        Bytes taken by the prefetched images still on disk, apart from
+        `keep`, forgetting the ones removed meanwhile.
+        """
+        total: int = 0
+        for image, record in self.__load().items():
+            if image == keep or not record["local"]:
+                continue
+            if not Podman.image_exists(image):
+                record["local"] = False
+                continue
+            total += record["size"]
+        return total
+
+    def __evict(self, keep: str, needed: int) -> int:
+        """
+        Remove the least recently wanted prefetched images, other than
+        `keep`, until the ones left and `needed` more bytes fit in the
+        budget. Return the bytes still on disk.
+        """
+        records: dict[str, dict[str, Any]] = self.__load()
+        total: int = self.__on_disk(keep)
+
+        for image in sorted(records, key=lambda image: records[image]["wanted"]):
+            if total + needed <= self.budget:
+                break
+            record: dict[str, Any] = records[image]
+            if image == keep or not record["local"]:
+                continue
+
+            if Podman.remove_image(image):
+                logger.info(f"Evicted the prefetched image {image}")
+                record["local"] = False
+                self.__set(image, "missing")
+            elif Podman.image_exists(image):
+                # used by a container, it is not ours to evict anymore
+                del records[image]
+            else:
+                record["local"] = False
+            total -= record["size"]
+
+        self.__save()
+        return total
+
+    def __run(self) -> None:
+        while True:
+            with self.__lock:
+                if not self.__queue:
+                    self.__thread = None
+                    return
+                image: str = self.__queue.pop(0)
+                self.__states[image] = "pulling"
+
+            records: dict[str, dict[str, Any]] = self.__load()
+            record: dict[str, Any] | None = records.get(image)
+
+            if Podman.image_exists(image):
+                if record is not None:
+                    record["wanted"] = time.time()
+                    record["local"] = True
+                    self.__save()
+                self.__set(image, "local")
+                continue
+
+            root: str | None = Podman.graph_root()
+            needed: int = max(record["size"] if record is not None else 0, 1)
+            if self.__evict(image, needed) + needed > self.budget:
+                self.__set(image, "skipped", _("The download budget is used up"))
+                continue
+            if root is not None and shutil.disk_usage(root).free < self.min_free:
+                self.__set(image, "skipped", _("Not enough free disk space"))
+                continue
+
+            logger.info(f"Pulling {image} in the background")
+            if not Podman.pull(
+                image, lambda line, image=image: self.__set(image, "pulling", line)
+            ):
+                self.__set(image, "failed", _("The download failed"))
+                continue
+
+            records[image] = {
+                "size": Podman.image_size(image),
+                "wanted": time.time(),
+                "local": True,
+            }
+            # the size is only known now, make room for it if needed
+            self.__evict(image, records[image]["size"])
+            self.__set(image, "local")
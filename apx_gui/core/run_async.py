@@ -31,10 +31,100 @@ from gi.repository import GLib
 logger = logging.getLogger("Vanilla::Async")
 
 
+class Progress:
+    """
+    This class is used to report the progress of an asynchronous task.
+    Workers call `update` as often as they like, the updates are merged
+    and delivered to the callback on the main loop at most once every
+    `interval` milliseconds.
+    """
+
+    max_pending_lines: int = 500
+
+    def __init__(
+        self,
+        callback: Callable[[float | None, str, list[str]], None],
+        interval: int = 100,
+    ):
+        self.callback: Callable[[float | None, str, list[str]], None] = callback
+        self.interval: int = interval
+
+        self.__lock: threading.Lock = threading.Lock()
+        self.__fraction: float | None = None
+        self.__phase: str = ""
+        self.__lines: list[str] = []
+        self.__dirty: bool = False
+        self.__scheduled: bool = False
+        self.__closed: bool = False
+
+    def update(
+        self,
+        fraction: float | None = None,
+        phase: str | None = None,
+        line: str | None = None,
+    ) -> None:
+        """
+        Report a new fraction (0.0 to 1.0), phase label and/or log line.
+        Safe to call from any thread.
+        """
+        with self.__lock:
+            if self.__closed:
+                return
+
+            if fraction is not None:
+                self.__fraction = min(max(fraction, 0.0), 1.0)
+            if phase is not None:
+                self.__phase = phase
+            if line is not None:
+                self.__lines.append(line)
+                if len(self.__lines) > self.max_pending_lines:
+                    del self.__lines[: -self.max_pending_lines]
+
+            self.__dirty = True
+            if self.__scheduled:
+                return
+            self.__scheduled = True
+
+        GLib.timeout_add(self.interval, self.__dispatch)
+
+    def flush(self) -> None:
+        """
+        Deliver any pending update right away. Must be called from the
+        main thread.
+        """
+        with self.__lock:
+            if not self.__dirty:
+                return
+
+            fraction, phase, lines = self.__fraction, self.__phase, self.__lines
+            self.__lines = []
+            self.__dirty = False
+
+        self.callback(fraction, phase, lines)
+
+    def close(self) -> None:
+        """
+        Deliver pending updates and ignore any further one. Must be called
+        from the main thread.
+        """
+        self.flush()
+        with self.__lock:
+            self.__closed = True
+
+    def __dispatch(self) -> bool:
+        with self.__lock:
+            self.__scheduled = False
+
+        self.flush()
+        return False
+
+
 class RunAsync(threading.Thread):
     """
     This class is used to execute a function asynchronously.
     It takes a function, a callback, and a list of arguments as input.
+    If a `Progress` is passed as the `progress` keyword argument, it is
+    forwarded to the function and flushed before the callback runs.
     """
 
     def __init__(
@@ -60,6 +150,7 @@ class RunAsync(threading.Thread):
             callback if callback else lambda r, e: None
         )
         self.daemon: bool = kwargs.pop("daemon", True)
+        self.progress: Progress | None = kwargs.get("progress")
 
         self.start()
 
@@ -82,5 +173,12 @@ class RunAsync(threading.Thread):
             traceback.print_tb(trace)
             traceback_info = "\n".join(traceback.format_tb(trace))
 
-        self.source_id = GLib.idle_add(self.callback, result, error)
+        self.source_id = GLib.idle_add(self.__complete, result, error)
         return self.source_id
+
+    def __complete(self, result: Any, error: Exception | None) -> bool:
+        if self.progress is not None:
+            self.progress.close()
+
+        self.callback(result, error)
+        return False
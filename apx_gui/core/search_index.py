@@ -0,0 +1,161 @@
+# search_index.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import re
+from bisect import bisect_left, insort
+from uuid import UUID
+
+from apx_gui.core.apx_entities import Subsystem, Stack, PkgManager
+
+
+class SearchIndex:
+    """
+    Inverted index over the searchable fields of subsystems, stacks and
+    package managers. Entities are added, updated and removed one at a
+    time, queries match every term by prefix and fall back to trigram
+    similarity for terms with no prefix match.
+    """
+
+    fuzzy_threshold: float = 0.4
+
+    def __init__(self) -> None:
+        self.__documents: dict[UUID, set[str]] = {}
+        self.__postings: dict[str, set[UUID]] = {}
+        self.__tokens: list[str] = []
+        self.__trigrams: dict[str, set[str]] = {}
+
+    @staticmethod
+    def __fields(entity: Subsystem | Stack | PkgManager) -> list[str]:
+        if isinstance(entity, Subsystem):
+            return [
+                entity.name,
+                entity.stack.name,
+                entity.stack.base,
+                entity.stack.pkg_manager,
+                *entity.exported_programs.keys(),
+            ]
+        if isinstance(entity, Stack):
+            return [entity.name, entity.base, entity.pkg_manager]
+        return [entity.name]
+
+    @staticmethod
+    def __tokenize(text: str) -> set[str]:
+        """
+        Split `text` into lowercase words, keeping the whole text as a token
+        too so that queries like "fedora-ru" still match by prefix.
+        """
+        text = text.lower().strip()
+        if not text:
+            return set()
+
+        tokens: set[str] = {word for word in re.split(r"[^a-z0-9]+", text) if word}
+        tokens.add(text)
+        return tokens
+
+    @staticmethod
+    def __trigrams_of(token: str) -> set[str]:
+        padded: str = f"  {token} "
+        return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+    def __len__(self) -> int:
+        return len(self.__documents)
+
+    def add(self, entity: Subsystem | Stack | PkgManager) -> None:
+        """
+        Index `entity`, replacing any previous entry for the same aid.
+        """
+        if entity.aid in self.__documents:
+            self.remove(entity.aid)
+
+        tokens: set[str] = set()
+        for field in self.__fields(entity):
+            tokens |= self.__tokenize(field)
+
+        self.__documents[entity.aid] = tokens
+        for token in tokens:
+            postings: set[UUID] | None = self.__postings.get(token)
+            if postings is None:
+                postings = self.__postings[token] = set()
+                insort(self.__tokens, token)
+                for trigram in self.__trigrams_of(token):
+                    self.__trigrams.setdefault(trigram, set()).add(token)
+            postings.add(entity.aid)
+
+    def update(self, entity: Subsystem | Stack | PkgManager) -> None:
+        self.add(entity)
+
+    def remove(self, aid: UUID) -> None:
+        tokens: set[str] = self.__documents.pop(aid, set())
+        for token in tokens:
+            postings: set[UUID] = self.__postings[token]
+            postings.discard(aid)
+            if postings:
+                continue
+
+            del self.__postings[token]
+            del self.__tokens[bisect_left(self.__tokens, token)]
+            for trigram in self.__trigrams_of(token):
+                bucket: set[str] = self.__trigrams[trigram]
+                bucket.discard(token)
+                if not bucket:
+                    del self.__trigrams[trigram]
+
+    def __match_prefix(self, term: str) -> set[UUID]:
+        matches: set[UUID] = set()
+        position: int = bisect_left(self.__tokens, term)
+        while position < len(self.__tokens) and self.__tokens[position].startswith(
+            term
+        ):
+            matches |= self.__postings[self.__tokens[position]]
+            position += 1
+        return matches
+
+    def __match_fuzzy(self, term: str) -> set[UUID]:
+        term_trigrams: set[str] = self.__trigrams_of(term)
+        shared: dict[str, int] = {}
+        for trigram in term_trigrams:
+            for token in self.__trigrams.get(trigram, ()):
+                shared[token] = shared.get(token, 0) + 1
+
+        matches: set[UUID] = set()
+        for token, count in shared.items():
+            if count / len(term_trigrams) >= self.fuzzy_threshold:
+                matches |= self.__postings[token]
+        return matches
+
+    def search(self, query: str) -> set[UUID] | None:
+        """
+        Return the aids matching every term of `query`, or None when the
+        query is empty and everything matches.
+        """
+        terms: list[str] = query.lower().split()
+        if not terms:
+            return None
+
+        result: set[UUID] | None = None
+        for term in terms:
+            matches: set[UUID] = self.__match_prefix(term)
+            if not matches and len(term) >= 3:
+                matches = self.__match_fuzzy(term)
+
+            result = matches if result is None else result & matches
+            if not result:
+                return set()
+
+        return result
@@ -0,0 +1,209 @@
+# snapshots.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+
+import re
+import time
+import uuid
+import logging
+from typing import Any
+from gettext import gettext as _
+
+from apx_gui.core.apx_entities import Stack, Subsystem
+from apx_gui.core.podman import Podman
+from apx_gui.core.run_async import Progress
+from apx_gui.core.subsystem_cloner import SubsystemCloner
+
+logger = logging.getLogger("Vanilla::Snapshots")
+
+
+class Snapshots:
+    """
+    This class is used to checkpoint the container of a subsystem to
+    local images and to roll the subsystem back to one of them. Rolling
+    back recreates the subsystem with the same name and home on a
+    `<name>-snapshot` stack based on the snapshot image, which takes
+    seconds instead of rebuilding it from its stack.
+    """
+
+    repository_prefix: str = "localhost/apx-gui-snapshots"
+    suffix: str = "-snapshot"
+
+    @staticmethod
+    def repository(subsystem: Subsystem) -> str:
+        name: str = re.sub(r"[^a-z0-9._-]+", "-", subsystem.name.lower()).strip("-.")
+        return f"{Snapshots.repository_prefix}/{name or 'subsystem'}"
+
+    @staticmethod
+    def entries(subsystem: Subsystem) -> list[dict[str, Any]]:
+        """
+        The snapshots of `subsystem`, newest first.
+        """
+        return Podman.images(Snapshots.repository(subsystem))
+
+    @staticmethod
+    def take(subsystem: Subsystem, progress: Progress | None = None) -> str | None:
+        """
+        Save the current state of `subsystem`, return the snapshot image.
+        """
+        if progress is not None:
+            progress.update(phase=_("Saving a snapshot of {}").format(subsystem.name))
+        repository: str = Snapshots.repository(subsystem)
+        tag: str = time.strftime("%Y%m%d-%H%M%S")
+        if not Podman.commit(subsystem.internal_name, repository, tag):
+            return None
+        return f"{repository}:{tag}"
+
+    @staticmethod
+    def __recreate(
+        subsystem: Subsystem, image: str, progress: Progress | None = None
+    ) -> tuple[bool, Stack | None, bool]:
+        """
+        Create `subsystem` again from `image`, updating it in place.
+        """
+        ok, restored, stack, created = SubsystemCloner.create_from_image(
+            subsystem.name,
+            image,
+            f"{subsystem.name}{Snapshots.suffix}",
+            subsystem.stack.pkg_manager,
+            Snapshots.repository_prefix,
+            subsystem.home or "",
+            progress,
+        )
+        if not ok or restored is None:
+            return False, None, False
+
+        subsystem.internal_name = restored.internal_name
+        subsystem.status = restored.status
+        subsystem.exported_programs = restored.exported_programs
+        subsystem.stack = restored.stack
+        return True, stack, created
+
+    @staticmethod
+    def restore(
+        subsystem: Subsystem, image: str, progress: Progress | None = None
+    ) -> tuple[str, Stack | None, bool]:
+        """
+        Replace the container of `subsystem` with one started from the
+        snapshot `image`, updating `subsystem` in place.
+
+        The snapshot is first started as a temporary subsystem, the
+        original container is only removed once that worked. Its current
+        state is saved as a snapshot beforehand, to roll back to if
+        creating the subsystem again fails anyway.
+
+        Return "restored", "unchanged" when nothing was removed,
+        "rolled-back" when the subsystem was recreated from its previous
+        state or "removed" when even that failed, together with the
+        snapshot stack and whether it was newly created.
+        """
+        stack_name: str = f"{subsystem.name}{Snapshots.suffix}"
+        previous_base: str | None = (
+            subsystem.stack.base if subsystem.stack.name == stack_name else None
+        )
+
+        if progress is not None:
+            progress.update(phase=_("Checking the snapshot"))
+        trial_name: str = f"apx-gui-restore-{uuid.uuid4().hex[:8]}"
+        ok, trial, stack, created = SubsystemCloner.create_from_image(
+            trial_name,
+            image,
+            stack_name,
+            subsystem.stack.pkg_manager,
+            Snapshots.repository_prefix,
+            progress=progress,
+        )
+        if trial is not None:
+            trial.remove(force=True)
+
+        def unchanged() -> tuple[str, Stack | None, bool]:
+            # the container is untouched, put its stack back as it was
+            if created and stack is not None:
+                stack.remove(force=True)
+            elif previous_base is not None:
+                subsystem.stack.update(previous_base, "", subsystem.stack.pkg_manager)
+            return "unchanged", None, False
+
+        if not ok:
+            return unchanged()
+
+        backup: str | None = Snapshots.take(subsystem, progress)
+        if backup is None:
+            logger.error(f"Not restoring {subsystem.name}, it could not be saved")
+            return unchanged()
+
+        if progress is not None:
+            progress.update(phase=_("Removing the current container"))
+        ok, output = subsystem.remove(force=True)
+        probe: Subsystem = Subsystem(
+            "", subsystem.name, subsystem.stack, "", "", [], {}
+        )
+        if probe._create_callback()[0]:
+            logger.error(f"Could not remove {subsystem.name}: {output}")
+            return unchanged()
+
+        if Snapshots.__recreate(subsystem, image, progress)[0]:
+            return "restored", stack, created
+
+        logger.error(f"Could not restore {subsystem.name}, rolling back to {backup}")
+        if Snapshots.__recreate(subsystem, backup, progress)[0]:
+            return "rolled-back", stack, created
+        return "removed", stack, created
+
+    @staticmethod
+    def remove(image: str) -> bool:
+        return Podman.remove_image(image)
+
+    @staticmethod
+    def prune(
+        subsystem: Subsystem, keep: int, pinned: set[str] | None = None
+    ) -> list[str]:
+        """
+        Remove all but the newest `keep` snapshots of `subsystem` which are
+        not `pinned`, the ones the container was started from are kept by
+        Podman. Return the removed images.
+        """
+        unpinned: list[dict[str, Any]] = [
+            snapshot
+            for snapshot in Snapshots.entries(subsystem)
+            if snapshot["name"] not in (pinned or set())
+        ]
+        return [
+            snapshot["name"]
+            for snapshot in unpinned[keep:]
+            if Podman.remove_image(snapshot["name"])
+        ]
+
+    @staticmethod
+    def collect(subsystem: Subsystem) -> Stack | None:
+        """
+        Remove the snapshots of a removed subsystem, and its snapshot stack
+        which is returned.
+        """
+        Snapshots.prune(subsystem, 0)
+
+        stack: Stack = subsystem.stack
+        if stack.name != f"{subsystem.name}{Snapshots.suffix}":
+            return None
+
+        ok, output = stack.remove(force=True)
+        if not ok:
+            logger.warning(f"Could not remove the stack {stack.name}: {output}")
+            return None
+        return stack
@@ -0,0 +1,179 @@
+# stack_baker.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+
+import re
+import json
+import uuid
+import hashlib
+import logging
+from gettext import gettext as _
+
+from apx_gui.core.apx_entities import Stack, Subsystem
+from apx_gui.core.podman import Podman
+from apx_gui.core.run_async import Progress
+
+logger = logging.getLogger("Vanilla::StackBaker")
+
+
+class StackBaker:
+    """
+    This class is used to build a stack once into a local image with its
+    packages already installed, registered as a `<stack>-baked` stack with
+    no packages, so that new subsystems on it skip package installation.
+    The image tag is a fingerprint of the stack definition, a baked stack
+    whose tag does not match is rebuilt on the next use.
+    """
+
+    repository_prefix: str = "localhost/apx-gui-baked"
+    suffix: str = "-baked"
+
+    @staticmethod
+    def repository(stack: Stack) -> str:
+        name: str = re.sub(r"[^a-z0-9._-]+", "-", stack.name.lower()).strip("-.")
+        return f"{StackBaker.repository_prefix}/{name or 'stack'}"
+
+    @staticmethod
+    def fingerprint(stack: Stack) -> str:
+        definition: str = json.dumps(
+            [stack.base, sorted(stack.package_names), stack.pkg_manager]
+        )
+        return hashlib.sha256(definition.encode()).hexdigest()[:12]
+
+    @staticmethod
+    def image(stack: Stack) -> str:
+        return f"{StackBaker.repository(stack)}:{StackBaker.fingerprint(stack)}"
+
+    @staticmethod
+    def is_baked(stack: Stack) -> bool:
+        return stack.base.startswith(f"{StackBaker.repository_prefix}/")
+
+    @staticmethod
+    def find(stack: Stack, stacks: list[Stack]) -> Stack | None:
+        """
+        The baked stack of `stack` among `stacks`, current or not. A stack
+        of the user which happens to have the same name is not one.
+        """
+        for candidate in stacks:
+            if candidate.name == f"{stack.name}{StackBaker.suffix}" and (
+                StackBaker.is_baked(candidate)
+            ):
+                return candidate
+        return None
+
+    @staticmethod
+    def is_current(stack: Stack, stacks: list[Stack]) -> bool:
+        baked: Stack | None = StackBaker.find(stack, stacks)
+        image: str = StackBaker.image(stack)
+        return (
+            baked is not None
+            and baked.base == image
+            and image in Podman.image_tags(StackBaker.repository(stack))
+        )
+
+    @staticmethod
+    def bake(
+        stack: Stack, stacks: list[Stack], progress: Progress | None = None
+    ) -> tuple[bool, Stack | None, bool]:
+        """
+        Make sure the baked stack of `stack` is current, building its image
+        through a temporary subsystem if needed. Return whether it worked,
+        the baked stack and whether the baked stack was newly created.
+        """
+        baked: Stack | None = StackBaker.find(stack, stacks)
+        if StackBaker.is_current(stack, stacks):
+            return True, baked, False
+
+        name: str = f"{stack.name}{StackBaker.suffix}"
+        if baked is None and any(candidate.name == name for candidate in stacks):
+            logger.error(f"Not baking {stack.name}, {name} is a stack of the user")
+            return False, None, False
+
+        image: str = StackBaker.image(stack)
+        builder: Subsystem = Subsystem(
+            "", f"apx-gui-bake-{uuid.uuid4().hex[:8]}", stack, "", "", [], {}
+        )
+
+        if progress is not None:
+            progress.update(
+                fraction=0.0,
+                phase=_("Installing the packages of {}").format(stack.name),
+            )
+        # distrobox and podman report progress on stderr, whether the
+        # subsystem exists afterwards is what tells if it worked
+        _ok, output = builder._run_apx_command(
+            f"subsystems new --name '{builder.name}' --stack '{stack.name}'",
+            ignore_errors=True,
+            progress=progress,
+        )
+        try:
+            if not builder._create_callback()[0]:
+                logger.error(f"Could not create the build subsystem: {output}")
+                return False, baked, False
+
+            if progress is not None:
+                progress.update(fraction=0.7, phase=_("Saving the baked image"))
+            repository, tag = image.rsplit(":", 1)
+            if not Podman.commit(builder.internal_name, repository, tag):
+                return False, baked, False
+        finally:
+            builder.remove(force=True)
+
+        if progress is not None:
+            progress.update(fraction=0.9, phase=_("Registering the baked stack"))
+        created: bool = baked is None
+        if baked is None:
+            ok, baked = Stack(name, image, [], stack.pkg_manager, False).create()
+        else:
+            ok, _output = baked.update(image, "", stack.pkg_manager)
+            if ok:
+                baked.base = image
+                baked.packages = []
+                baked.pkg_manager = stack.pkg_manager
+
+        if ok:
+            StackBaker.__remove_images(stack, keep=image)
+        return ok, baked, created
+
+    @staticmethod
+    def __remove_images(stack: Stack, keep: str | None = None) -> None:
+        for image in Podman.image_tags(StackBaker.repository(stack)):
+            if image != keep:
+                Podman.remove_image(image)
+
+    @staticmethod
+    def collect(stack: Stack, stacks: list[Stack]) -> Stack | None:
+        """
+        Remove the baked images of a removed stack, and its baked stack
+        which is returned. Removing a baked stack removes its image.
+        """
+        if StackBaker.is_baked(stack):
+            Podman.remove_image(stack.base)
+            return None
+
+        StackBaker.__remove_images(stack)
+        baked: Stack | None = StackBaker.find(stack, stacks)
+        if baked is None or not StackBaker.is_baked(baked):
+            return None
+
+        ok, output = baked.remove(force=True)
+        if not ok:
+            logger.warning(f"Could not remove the baked stack {baked.name}: {output}")
+            return None
+        return baked
@@ -0,0 +1,187 @@
+# subsystem_cloner.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+
+import os
+import re
+import shlex
+import shutil
+import logging
+from gettext import gettext as _
+
+from apx_gui.core.apx import Apx
+from apx_gui.core.apx_entities import Stack, Subsystem
+from apx_gui.core.podman import Podman
+from apx_gui.core.run_async import Progress
+
+logger = logging.getLogger("Vanilla::SubsystemCloner")
+
+
+class SubsystemCloner:
+    """
+    This class is used to duplicate a subsystem by committing its
+    container to a local image and creating a new subsystem on a
+    `<name>-clone` stack based on that image, so nothing is pulled or
+    installed again. The stack and image are removed together with the
+    last subsystem using them.
+    """
+
+    repository_prefix: str = "localhost/apx-gui-clones"
+    suffix: str = "-clone"
+
+    @staticmethod
+    def repository(name: str) -> str:
+        name = re.sub(r"[^a-z0-9._-]+", "-", name.lower()).strip("-.")
+        return f"{SubsystemCloner.repository_prefix}/{name or 'subsystem'}"
+
+    @staticmethod
+    def is_clone(stack: Stack) -> bool:
+        return stack.base.startswith(f"{SubsystemCloner.repository_prefix}/")
+
+    @staticmethod
+    def create_from_image(
+        name: str,
+        image: str,
+        stack_name: str,
+        pkg_manager: str,
+        repository_prefix: str,
+        home: str = "",
+        progress: Progress | None = None,
+    ) -> tuple[bool, Subsystem | None, Stack | None, bool]:
+        """
+        Create the subsystem `name` on a stack with no packages based on
+        `image`. An existing `stack_name` stack is only reused when its base
+        is under `repository_prefix`, so a stack of the user is never
+        overwritten. Return whether it worked, the subsystem, the stack and
+        whether the stack was newly created; on failure a newly created
+        stack is removed again and None is returned for it.
+        """
+        if progress is not None:
+            progress.update(phase=_("Registering the {} stack").format(stack_name))
+        existing: Stack | None = next(
+            (stack for stack in Apx().stacks_list() if stack.name == stack_name), None
+        )
+        if existing is not None and not existing.base.startswith(
+            f"{repository_prefix}/"
+        ):
+            logger.error(f"Not replacing {stack_name}, it is a stack of the user")
+            return False, None, None, False
+
+        stack: Stack
+        if existing is not None:
+            stack = existing
+            ok, output = stack.update(image, "", pkg_manager)
+            if not ok:
+                logger.error(f"Could not update the {stack_name} stack: {output}")
+                return False, None, None, False
+            stack.base, stack.packages, stack.pkg_manager = image, [], pkg_manager
+        else:
+            ok, stack = Stack(stack_name, image, [], pkg_manager, False).create()
+            if not ok:
+                return False, None, None, False
+
+        if progress is not None:
+            progress.update(phase=_("Creating the {} subsystem").format(name))
+        subsystem: Subsystem = Subsystem("", name, stack, home, "", [], {})
+        command: str = (
+            f"subsystems new --name {shlex.quote(name)} "
+            f"--stack {shlex.quote(stack_name)}"
+        )
+        if home:
+            command += f" --home {shlex.quote(home)}"
+        # distrobox and podman report progress on stderr, whether the
+        # subsystem exists afterwards is what tells if it worked
+        _ok, output = subsystem._run_apx_command(
+            command, ignore_errors=True, progress=progress
+        )
+        if not subsystem._create_callback()[0]:
+            logger.error(f"Could not create {name} from {image}: {output}")
+            if existing is None:
+                stack.remove(force=True)
+            return False, None, None, False
+        return True, subsystem, stack, existing is None
+
+    @staticmethod
+    def clone(
+        source: Subsystem,
+        name: str,
+        copy_home: bool = False,
+        progress: Progress | None = None,
+    ) -> tuple[bool, Subsystem | None, Stack | None, bool]:
+        """
+        Duplicate `source` as `name`. A custom home is shared with the new
+        subsystem, or copied next to it when `copy_home` is set.
+        """
+        home: str = source.home or ""
+        copied: str | None = None
+        if home and copy_home:
+            if progress is not None:
+                progress.update(phase=_("Copying the home directory"))
+            copied = f"{home.rstrip('/')}-{name}"
+            try:
+                shutil.copytree(home, copied, symlinks=True)
+            except OSError as err:
+                logger.error(f"Could not copy {home}: {err}")
+                if os.path.isdir(copied) and not isinstance(err, FileExistsError):
+                    shutil.rmtree(copied, ignore_errors=True)
+                return False, None, None, False
+            home = copied
+
+        if progress is not None:
+            progress.update(phase=_("Saving the state of {}").format(source.name))
+        repository: str = SubsystemCloner.repository(name)
+        ok: bool = Podman.commit(source.internal_name, repository, "latest")
+        subsystem: Subsystem | None = None
+        stack: Stack | None = None
+        created: bool = False
+        if ok:
+            ok, subsystem, stack, created = SubsystemCloner.create_from_image(
+                name,
+                f"{repository}:latest",
+                f"{name}{SubsystemCloner.suffix}",
+                source.stack.pkg_manager,
+                SubsystemCloner.repository_prefix,
+                home,
+                progress,
+            )
+            if not ok:
+                Podman.remove_image(f"{repository}:latest")
+
+        if not ok and copied is not None:
+            shutil.rmtree(copied, ignore_errors=True)
+        return ok, subsystem, stack, created
+
+    @staticmethod
+    def collect(subsystem: Subsystem, subsystems: list[Subsystem]) -> Stack | None:
+        """
+        Remove the clone stack and image of a removed subsystem if no other
+        subsystem uses them, return the removed stack.
+        """
+        stack: Stack = subsystem.stack
+        if not SubsystemCloner.is_clone(stack) or any(
+            other.stack.name == stack.name for other in subsystems
+        ):
+            return None
+
+        ok, output = stack.remove(force=True)
+        if not ok:
+            logger.warning(f"Could not remove the clone stack {stack.name}: {output}")
+            return None
+        Podman.remove_image(stack.base)
+        return stack
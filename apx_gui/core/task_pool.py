@@ -0,0 +1,138 @@
+# task_pool.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from gettext import gettext as _
+from typing import Any
+
+from collections.abc import Callable
+
+from apx_gui.core.run_async import Progress
+
+logger = logging.getLogger("Vanilla::TaskPool")
+
+
+class TaskPool:
+    """
+    This class is used to run a batch of blocking tasks in parallel, with
+    at most `max_workers` of them running at the same time. Tasks are
+    interleaved by group, a free worker always picks the group with the
+    fewest running tasks, so the load is spread across groups without
+    leaving workers idle when only one group is left. It blocks until
+    every task is done, so it is
+    meant to be run through `RunAsync`, and reports the aggregate progress
+    of the batch to an optional `Progress`.
+    """
+
+    def __init__(self, max_workers: int = 4) -> None:
+        self.max_workers: int = max(max_workers, 1)
+
+    def run(
+        self,
+        tasks: list[tuple[str, Callable[[], Any]]],
+        progress: Progress | None = None,
+        groups: list[str] | None = None,
+    ) -> list[tuple[str, Any, Exception | None, float]]:
+        """
+        Run every `(name, func)` of `tasks` and return their
+        `(name, result, error, duration)` in the same order as `tasks`,
+        `duration` being in seconds. `groups`, if given, holds the group
+        of each task.
+        """
+        results: list[tuple[str, Any, Exception | None, float]] = [
+            (name, None, None, 0.0) for name, _func in tasks
+        ]
+        if not tasks:
+            return results
+
+        pending: OrderedDict[str | int, deque[int]] = OrderedDict()
+        for index in range(len(tasks)):
+            group: str | int = groups[index] if groups is not None else index
+            pending.setdefault(group, deque()).append(index)
+
+        busy: dict[str | int, int] = {}
+        lock: threading.Lock = threading.Lock()
+        done: int = 0
+
+        if progress is not None:
+            progress.update(
+                fraction=0, phase=_("{} of {} done").format(0, len(tasks))
+            )
+
+        def next_task() -> tuple[str | int, int] | None:
+            with lock:
+                if not pending:
+                    return None
+
+                # min() keeps the first of the least busy groups, so ties
+                # are served in turn
+                group: str | int = min(pending, key=lambda g: busy.get(g, 0))
+                queue: deque[int] = pending[group]
+                index: int = queue.popleft()
+                if queue:
+                    pending.move_to_end(group)
+                else:
+                    del pending[group]
+                busy[group] = busy.get(group, 0) + 1
+                return group, index
+
+        def worker() -> None:
+            nonlocal done
+
+            while (task := next_task()) is not None:
+                group, index = task
+                name, func = tasks[index]
+                started: float = time.monotonic()
+
+                try:
+                    results[index] = (name, func(), None, time.monotonic() - started)
+                except Exception as exception:
+                    logger.error(f"Task {name} failed: {exception}")
+                    results[index] = (
+                        name,
+                        None,
+                        exception,
+                        time.monotonic() - started,
+                    )
+
+                with lock:
+                    busy[group] -= 1
+                    done += 1
+                    current: int = done
+
+                if progress is not None:
+                    progress.update(
+                        fraction=current / len(tasks),
+                        phase=_("{} of {} done").format(current, len(tasks)),
+                        line=name,
+                    )
+
+        workers: list[threading.Thread] = [
+            threading.Thread(target=worker, name=f"apx-gui-task-{i}", daemon=True)
+            for i in range(min(self.max_workers, len(tasks)))
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        return results
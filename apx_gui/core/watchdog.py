@@ -0,0 +1,159 @@
+# watchdog.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import sys
+import time
+import threading
+import traceback
+import logging
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from gi.repository import GLib
+
+logger = logging.getLogger("Vanilla::Watchdog")
+
+
+class Watchdog(threading.Thread):
+    """
+    This class is used to detect stalls of the GLib main loop.
+    A timeout on the main loop records a tick every `interval` ms, the
+    watchdog thread reports when no tick happened for more than
+    `threshold` ms, logging the main thread stack and the commands that
+    were running at that moment.
+    """
+
+    __commands: dict[int, str] = {}
+    __commands_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, threshold: int = 200, interval: int | None = None) -> None:
+        super(Watchdog, self).__init__(name="apx-gui-watchdog", daemon=True)
+
+        self.threshold: int = threshold
+        self.interval: int = interval or max(threshold // 4, 10)
+
+        self.stalls: int = 0
+        self.total_stall_ms: float = 0.0
+        self.longest_stall_ms: float = 0.0
+        self.samples: deque[dict[str, Any]] = deque(maxlen=50)
+
+        self.__main_ident: int | None = threading.main_thread().ident
+        self.__last_tick: float = time.monotonic()
+        self.__stopped: threading.Event = threading.Event()
+
+        GLib.timeout_add(self.interval, self.__tick)
+        self.start()
+
+    @staticmethod
+    @contextmanager
+    def track(command: str) -> Iterator[None]:
+        """
+        Mark `command` as in flight on the calling thread for the duration
+        of the `with` block.
+        """
+        ident: int = threading.get_ident()
+        with Watchdog.__commands_lock:
+            Watchdog.__commands[ident] = command
+        try:
+            yield
+        finally:
+            with Watchdog.__commands_lock:
+                Watchdog.__commands.pop(ident, None)
+
+    @staticmethod
+    def commands_in_flight() -> dict[int, str]:
+        with Watchdog.__commands_lock:
+            return dict(Watchdog.__commands)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Counters collected since the watchdog started.
+        """
+        return {
+            "stalls": self.stalls,
+            "total_stall_ms": round(self.total_stall_ms),
+            "longest_stall_ms": round(self.longest_stall_ms),
+            "threshold_ms": self.threshold,
+        }
+
+    def stop(self) -> None:
+        self.__stopped.set()
+
+    def __tick(self) -> bool:
+        self.__last_tick = time.monotonic()
+        return not self.__stopped.is_set()
+
+    def run(self) -> None:
+        stalled_tick: float | None = None
+        stall_ms: float = 0.0
+
+        while not self.__stopped.wait(self.interval / 1000):
+            last_tick: float = self.__last_tick
+
+            if stalled_tick is not None and last_tick != stalled_tick:
+                # the main loop is ticking again, account the whole stall
+                stall_ms = (last_tick - stalled_tick) * 1000 - self.interval
+                self.__end_stall(stall_ms)
+                stalled_tick = None
+
+            elapsed: float = (time.monotonic() - last_tick) * 1000 - self.interval
+            if elapsed > self.threshold and stalled_tick is None:
+                stalled_tick = last_tick
+                self.__begin_stall(elapsed)
+
+    def __begin_stall(self, elapsed: float) -> None:
+        self.stalls += 1
+
+        stack: str = ""
+        frame = sys._current_frames().get(self.__main_ident)  # type: ignore
+        if frame is not None:
+            stack = "".join(traceback.format_stack(frame))
+
+        commands: list[str] = list(self.commands_in_flight().values())
+        main_command: str | None = self.commands_in_flight().get(
+            self.__main_ident  # type: ignore
+        )
+
+        self.samples.append(
+            {
+                "time": time.time(),
+                "started": time.time() - elapsed / 1000,
+                "duration_ms": elapsed,
+                "stack": stack,
+                "command": main_command,
+                "commands": commands,
+            }
+        )
+
+        logger.warning(
+            f"Main loop stalled for more than {round(elapsed)} ms.\n"
+            f"Command on the main thread: {main_command}\n"
+            f"Commands in flight: {commands}\n"
+            f"Main thread stack:\n{stack}"
+        )
+
+    def __end_stall(self, stall_ms: float) -> None:
+        self.total_stall_ms += stall_ms
+        self.longest_stall_ms = max(self.longest_stall_ms, stall_ms)
+        if self.samples:
+            self.samples[-1]["duration_ms"] = stall_ms
+
+        logger.warning(f"Main loop resumed after {round(stall_ms)} ms.")
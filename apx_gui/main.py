@@ -17,6 +17,7 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import os
 import sys
 import gi
 import logging
@@ -28,6 +29,7 @@ gi.require_version("Adw", "1")
 gi.require_version("Vte", "3.91")
 
 from gi.repository import Gio, Adw
+from apx_gui.core.watchdog import Watchdog
 from apx_gui.windows.main_window import ApxGUIWindow
 
 
@@ -44,6 +46,7 @@ class ApxGUIApplication(Adw.Application):
         )
 
         self.__window: ApxGUIWindow = None
+        self.watchdog: Watchdog | None = None
 
         self.create_action("quit", lambda *_: self.quit(), ["<primary>q"])
         self.create_action(
@@ -56,6 +59,13 @@ class ApxGUIApplication(Adw.Application):
         self.create_action(
             "import_file", self.on_import_file_action, ["<primary>i"]
         )
+        self.create_action("import_folder", self.on_import_folder_action)
+        self.create_action("export_all", self.on_export_all_action)
+        self.create_action("search", self.on_search_action, ["<primary>f"])
+        self.create_action("upgrade_all", self.on_upgrade_all_action)
+        self.create_action(
+            "search_packages", self.on_search_packages_action, ["<primary><shift>f"]
+        )
         self.create_action("about", self.on_about_action)
 
     def do_activate(self) -> None:
@@ -64,6 +74,12 @@ class ApxGUIApplication(Adw.Application):
         We raise the application's main window, creating it if
         necessary.
         """
+        if "APX_DEBUG" in os.environ and self.watchdog is None:
+            self.watchdog = Watchdog(int(os.environ.get("APX_WATCHDOG_MS", 200)))
+            self.create_action(
+                "debug_overlay", self.on_debug_overlay_action, ["<primary><shift>d"]
+            )
+
         win: ApxGUIWindow = self.props.active_window
         if not win:
             win = ApxGUIWindow(application=self)
@@ -113,6 +129,24 @@ class ApxGUIApplication(Adw.Application):
     def on_import_file_action(self, *args) -> None:
         self.__window.import_file()
 
+    def on_import_folder_action(self, *args) -> None:
+        self.__window.import_folder()
+
+    def on_export_all_action(self, *args) -> None:
+        self.__window.export_all()
+
+    def on_search_packages_action(self, *args) -> None:
+        self.__window.search_packages()
+
+    def on_upgrade_all_action(self, *args) -> None:
+        self.__window.upgrade_subsystems()
+
+    def on_search_action(self, *args) -> None:
+        self.__window.sidebar.focus_search()
+
+    def on_debug_overlay_action(self, *args) -> None:
+        self.__window.toggle_debug_overlay()
+
     def create_action(
         self, name: Text, callback: callable, shortcuts: list[str] = None
     ) -> None:
@@ -17,7 +17,7 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from gi.repository import Adw
+from gi.repository import Adw, Gdk, Gio, Gtk
 
 import re
 import os
@@ -27,6 +27,49 @@ from typing import Optional, Callable, Text
 
 
 class GtkUtils:
+    fallback_icon: str = "application-x-executable-symbolic"
+
+    __icons: dict[str, Gio.Icon] = {}
+    __icon_theme: Gtk.IconTheme | None = None
+
+    @staticmethod
+    def __on_icon_theme_changed(theme: Gtk.IconTheme) -> None:
+        GtkUtils.__icons.clear()
+
+    @staticmethod
+    def lookup_icon(name: str | None) -> Gio.Icon:
+        """
+        Resolve the `Icon` key of a desktop entry to a Gio.Icon, falling
+        back to a generic icon when the theme does not provide it. Results
+        are cached until the icon theme changes.
+        """
+        if not name:
+            name = GtkUtils.fallback_icon
+
+        icon: Gio.Icon | None = GtkUtils.__icons.get(name)
+        if icon is not None:
+            return icon
+
+        if GtkUtils.__icon_theme is None:
+            GtkUtils.__icon_theme = Gtk.IconTheme.get_for_display(
+                Gdk.Display.get_default()  # pyright: ignore
+            )
+            GtkUtils.__icon_theme.connect(
+                "changed", GtkUtils.__on_icon_theme_changed
+            )
+
+        if os.path.isabs(name):
+            if os.path.exists(name):
+                icon = Gio.FileIcon.new(Gio.File.new_for_path(name))
+        elif GtkUtils.__icon_theme.has_icon(name):
+            icon = Gio.ThemedIcon.new(name)
+
+        if icon is None:
+            icon = Gio.ThemedIcon.new(GtkUtils.fallback_icon)
+
+        GtkUtils.__icons[name] = icon
+        return icon
+
     @staticmethod
     def validate_entry(entry: Adw.EntryRow, extend: Optional[Callable] = None) -> bool:
         text: Text = entry.get_text()
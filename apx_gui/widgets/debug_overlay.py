@@ -0,0 +1,166 @@
+# debug_overlay.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import json
+from typing import Any
+
+from gi.repository import Gtk, Gio, GLib, Adw
+from gettext import gettext as _
+
+from apx_gui.core.frame_recorder import FrameRecorder
+from apx_gui.core.run_async import RunAsync
+from apx_gui.core.watchdog import Watchdog
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from apx_gui.windows.main_window import ApxGUIWindow
+
+
+@Gtk.Template(resource_path="/org/vanillaos/apx-gui/gtk/debug-overlay.ui")
+class DebugOverlay(Gtk.Box):
+    __gtype_name__: str = "DebugOverlay"
+
+    label_frames: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+    label_dropped: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+    label_stalls: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+    label_longest: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+    btn_export: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+
+    refresh_interval: int = 500
+
+    def __init__(
+        self, window: Adw.ApplicationWindow, watchdog: Watchdog | None, **kwargs
+    ) -> None:
+        super().__init__(**kwargs)
+        self.__window: ApxGUIWindow = window  # pyright: ignore
+        self.__watchdog: Watchdog | None = watchdog
+        self.__recorder: FrameRecorder | None = None
+        self.__refresh_source: int | None = None
+
+        self.btn_export.connect("clicked", self.__on_export_clicked)
+
+    @property
+    def recording(self) -> bool:
+        return self.__recorder is not None
+
+    def start(self) -> None:
+        """
+        Start recording the frames of the window and refreshing the
+        counters, recording stops when the overlay is hidden.
+        """
+        if self.__recorder is not None:
+            return
+
+        self.__recorder = FrameRecorder(self.__window.get_frame_clock())
+        self.__refresh_source = GLib.timeout_add(
+            self.refresh_interval, self.__refresh
+        )
+        self.__refresh()
+
+    def stop(self) -> None:
+        if self.__recorder is None:
+            return
+
+        self.__recorder.stop()
+        self.__recorder = None
+        if self.__refresh_source is not None:
+            GLib.source_remove(self.__refresh_source)
+            self.__refresh_source = None
+
+    def __refresh(self) -> bool:
+        if self.__recorder is None:
+            return False
+
+        stats: dict[str, Any] = self.__recorder.stats()
+        self.label_frames.set_label(
+            _("{} fps, avg {:.1f} ms, p95 {:.1f} ms, max {:.1f} ms").format(
+                stats["fps"], stats["avg_ms"], stats["p95_ms"], stats["max_ms"]
+            )
+        )
+        self.label_dropped.set_label(
+            _("{} dropped, {} of {} frames during apx commands").format(
+                stats["dropped"], stats["busy_frames"], stats["frames"]
+            )
+        )
+
+        if self.__watchdog is None:
+            self.label_stalls.set_label(
+                _("{} callbacks over {:.0f} ms, longest {:.0f} ms").format(
+                    stats["long_callbacks"],
+                    self.__recorder.long_callback_ms,
+                    stats["longest_callback_ms"],
+                )
+            )
+        else:
+            watchdog: dict[str, Any] = self.__watchdog.stats()
+            self.label_stalls.set_label(
+                _("{} stalls over {} ms, longest {} ms").format(
+                    watchdog["stalls"],
+                    watchdog["threshold_ms"],
+                    watchdog["longest_stall_ms"],
+                )
+            )
+
+        longest: list[dict[str, Any]] = self.__recorder.longest_frames(1)
+        if longest:
+            frame: dict[str, Any] = longest[0]
+            self.label_longest.set_label(
+                _("Longest frame {:.1f} ms {}").format(
+                    frame["duration_ms"], ", ".join(frame["commands"])
+                )
+            )
+
+        return True
+
+    def __on_export_clicked(self, button: Gtk.Button) -> None:
+        if self.__recorder is None:
+            return
+
+        trace: dict[str, Any] = self.__recorder.trace(
+            list(self.__watchdog.samples) if self.__watchdog is not None else [],
+            list(self.__window.editor.tab_build_times),
+        )
+
+        def on_callback(result: bool, *args) -> None:
+            if result:
+                self.__window.toast(_("Trace exported"))
+            else:
+                self.__window.toast(_("Trace export failed"))
+
+        def write_trace(path: str) -> bool:
+            with open(path, "w") as file:
+                json.dump(trace, file)
+            return True
+
+        def on_save(dialog: Gtk.FileDialog, task: Gio.AsyncResult) -> None:
+            try:
+                file: Gio.File = dialog.save_finish(task)
+            except GLib.GError:
+                return
+            RunAsync(write_trace, on_callback, path=file.get_path())
+
+        dialog: Gtk.FileDialog = Gtk.FileDialog()
+        dialog.set_title(_("Export Trace"))
+        dialog.set_initial_name(
+            "apx-gui-trace-{}.json".format(
+                GLib.DateTime.new_now_local().format("%F-%H%M%S")
+            )
+        )
+        dialog.save(parent=self.__window, cancellable=None, callback=on_save)
@@ -17,11 +17,16 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import time
+import logging
+import weakref
+from collections import deque, OrderedDict
 from uuid import UUID
 
 from gi.repository import Gtk, Adw, Gio
 
 from apx_gui.core.apx_entities import Subsystem, Stack, PkgManager
+from apx_gui.core.run_async import RunAsync
 from apx_gui.widgets.tab_subsystem import TabSubsystem
 from apx_gui.widgets.tab_stack import TabStack
 from apx_gui.widgets.tab_pkgmanager import TabPkgManager
@@ -31,21 +36,30 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from apx_gui.windows.main_window import ApxGUIWindow
 
+logger = logging.getLogger("Vanilla::Editor")
+
 
 @Gtk.Template(resource_path="/org/vanillaos/apx-gui/gtk/editor.ui")
 class Editor(Adw.Bin):
     __gtype_name__: str = "Editor"
-    __registry__: dict[UUID, Adw.TabPage] = {}
 
     tabs_editor: Adw.TabView = Gtk.Template.Child()  # pyright: ignore
     stack_editor: Adw.ViewStack = Gtk.Template.Child()  # pyright: ignore
     page_no_tabs: Adw.ViewStackPage = Gtk.Template.Child()  # pyright: ignore
     page_editor: Adw.ViewStackPage = Gtk.Template.Child()  # pyright: ignore
 
+    tab_build_budget_ms: float = 16.0
+
     def __init__(self, window: Adw.ApplicationWindow, **kwargs) -> None:
         super().__init__(**kwargs)
         self.__window: ApxGUIWindow = window  # pyright: ignore
+        self.__registry: weakref.WeakValueDictionary[
+            UUID, TabSubsystem | TabStack | TabPkgManager
+        ] = weakref.WeakValueDictionary()
+        self.tab_build_times: deque[tuple[str, float, float]] = deque(maxlen=100)
+        self.__recent: OrderedDict[UUID, None] = OrderedDict()
         self.__build_ui()
+        RunAsync(TabSubsystem.remove_saved_scrollbacks)
 
     def __build_ui(self) -> None:
         self.tabs_editor.connect("page-detached", self.__on_page_detached)
@@ -54,12 +68,41 @@ class Editor(Adw.Bin):
 
     def __on_page_changed(self, tabs: Adw.TabView, *args):
         if tabs.get_selected_page():
-            self.__window.title.set_title(
-                tabs.get_selected_page().get_child().name  # pyright: ignore
-            )
+            tab = tabs.get_selected_page().get_child()
+            self.__window.title.set_title(tab.name)  # pyright: ignore
+
+            if isinstance(tab, TabSubsystem):
+                tab.wake()
+                self.__recent[tab.aid] = None
+                self.__recent.move_to_end(tab.aid)
+                self.__hibernate_inactive()
+
+    def __hibernate_inactive(self) -> None:
+        """
+        Hibernate the least recently used subsystem tabs holding a
+        console, beyond the configured number of active tabs.
+        """
+        limit: int = self.__window.settings.get_int("max-active-tabs")
+        save_scrollback: bool = self.__window.settings.get_boolean(
+            "hibernate-save-scrollback"
+        )
+
+        active: list[TabSubsystem] = [
+            tab
+            for aid in self.__recent
+            if isinstance(tab := self.__registry.get(aid), TabSubsystem)
+            and tab.console is not None
+        ]
+        for tab in active[: max(len(active) - limit, 0)]:
+            logger.debug(f"Hibernating the {tab.name} tab.")
+            tab.hibernate(save_scrollback)
 
     def __on_page_detached(self, tabs: Adw.TabView, page: Adw.TabPage, *args) -> None:
-        self.__registry__.pop(page.get_child().aid)  # pyright: ignore
+        tab: TabSubsystem | TabStack | TabPkgManager = page.get_child()  # pyright: ignore
+        self.__registry.pop(tab.aid, None)
+        self.__recent.pop(tab.aid, None)
+        if isinstance(tab, TabSubsystem):
+            tab.teardown()
 
         if tabs.get_n_pages() == 0:
             self.stack_editor.set_visible_child_name("no_tabs")
@@ -68,22 +111,42 @@ class Editor(Adw.Bin):
     def __on_page_attached(self, tabs: Adw.TabView, page: Adw.TabPage, *args) -> None:
         self.page_no_tabs.set_visible(False)
         self.page_editor.set_visible(True)
-        self.__registry__[page.get_child().aid] = page  # pyright: ignore
+        self.__registry[page.get_child().aid] = page.get_child()  # pyright: ignore
 
         if tabs.get_n_pages() > 0:
             self.stack_editor.set_visible_child_name("editor")
 
     def open(self, aid: UUID):
         if self.is_open(aid):
-            self.tabs_editor.set_selected_page(self.__registry__[aid])
+            self.tabs_editor.set_selected_page(self.__page(aid))
 
     def is_open(self, aid: UUID) -> bool:
-        return aid in self.__registry__.keys()
+        return aid in self.__registry
+
+    def __page(self, aid: UUID) -> Adw.TabPage:
+        return self.tabs_editor.get_page(self.__registry[aid])
+
+    def __measure(self, name: str, started: float) -> None:
+        """
+        Record when building the `name` tab started and how long it took,
+        warning when it exceeds the budget.
+        """
+        elapsed: float = (time.perf_counter() - started) * 1000
+        self.tab_build_times.append((name, time.time() - elapsed / 1000, elapsed))
+        if elapsed > self.tab_build_budget_ms:
+            logger.warning(
+                f"Building the {name} tab took {elapsed:.1f} ms, "
+                f"budget is {self.tab_build_budget_ms:.0f} ms."
+            )
+        else:
+            logger.debug(f"Built the {name} tab in {elapsed:.1f} ms.")
 
     def new_subsystem_tab(self, subsystem: Subsystem) -> None:
+        started: float = time.perf_counter()
         page: Adw.TabPage = self.tabs_editor.append(
             TabSubsystem(self.__window, subsystem)
         )
+        self.__measure(subsystem.name, started)
         icon: Gio.Icon = Gio.ThemedIcon.new_with_default_fallbacks(
             "utilities-terminal-symbolic"
         )
@@ -94,7 +157,9 @@ class Editor(Adw.Bin):
         self.open(subsystem.aid)
 
     def new_stack_tab(self, stack: Stack) -> None:
+        started: float = time.perf_counter()
         page: Adw.TabPage = self.tabs_editor.append(TabStack(self.__window, stack))
+        self.__measure(stack.name, started)
         icon: Gio.Icon = Gio.ThemedIcon.new_with_default_fallbacks(
             "vanilla-puzzle-piece-symbolic"
         )
@@ -105,9 +170,11 @@ class Editor(Adw.Bin):
         self.open(stack.aid)
 
     def new_pkgmanager_tab(self, pkgmanager: PkgManager) -> None:
+        started: float = time.perf_counter()
         page: Adw.TabPage = self.tabs_editor.append(
             TabPkgManager(self.__window, pkgmanager)
         )
+        self.__measure(pkgmanager.name, started)
         icon: Gio.Icon = Gio.ThemedIcon.new_with_default_fallbacks(
             "insert-object-symbolic"
         )
@@ -121,13 +188,20 @@ class Editor(Adw.Bin):
         if not self.is_open(subsystem.aid):
             return
 
-        self.__registry__[subsystem.aid].get_child().update_page(  # pyright: ignore
-            subsystem
-        )
+        self.__registry[subsystem.aid].update_page(subsystem)  # pyright: ignore
 
         # self.close(subsystem.aid)
         # self.new_subsystem_tab(subsystem)
 
+    def update_drift(self) -> None:
+        """
+        Compare the open subsystem tabs with their stacks again, after the
+        package index changed.
+        """
+        for tab in list(self.__registry.values()):
+            if isinstance(tab, TabSubsystem):
+                tab.update_drift()
+
     def close(self, aid: UUID) -> None:
         if self.is_open(aid):
-            self.tabs_editor.close_page(self.__registry__[aid])
+            self.tabs_editor.close_page(self.__page(aid))
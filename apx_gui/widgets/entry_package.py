@@ -0,0 +1,86 @@
+# entry_package.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from gi.repository import Gtk, GObject  # pyright: ignore
+
+from gettext import gettext as _
+
+from apx_gui.core.apx_objects import PackageObject
+
+
+@Gtk.Template(resource_path="/org/vanillaos/apx-gui/gtk/entry-package.ui")
+class EntryPackage(Gtk.Box):
+    __gtype_name__: str = "EntryPackage"
+
+    label_name: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+    label_summary: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+    label_subsystems: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+    label_installed: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+
+        self.__bindings: list[GObject.Binding] = []
+
+    def bind(self, item: PackageObject) -> None:
+        flags: GObject.BindingFlags = GObject.BindingFlags.SYNC_CREATE
+        self.__bindings = [
+            item.bind_property("name", self.label_name, "label", flags),
+            item.bind_property("summary", self.label_summary, "label", flags),
+            item.bind_property(
+                "summary",
+                self.label_summary,
+                "visible",
+                flags,
+                lambda _binding, summary: bool(summary),
+            ),
+            item.bind_property(
+                "subsystems",
+                self.label_subsystems,
+                "label",
+                flags,
+                lambda _binding, subsystems: _("Available in {}").format(subsystems),
+            ),
+            item.bind_property(
+                "subsystems",
+                self.label_subsystems,
+                "visible",
+                flags,
+                lambda _binding, subsystems: bool(subsystems),
+            ),
+            item.bind_property(
+                "installed",
+                self.label_installed,
+                "label",
+                flags,
+                lambda _binding, installed: _("Installed in {}").format(installed),
+            ),
+            item.bind_property(
+                "installed",
+                self.label_installed,
+                "visible",
+                flags,
+                lambda _binding, installed: bool(installed),
+            ),
+        ]
+
+    def unbind(self) -> None:
+        for binding in self.__bindings:
+            binding.unbind()
+        self.__bindings = []
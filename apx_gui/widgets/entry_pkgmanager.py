@@ -17,19 +17,30 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from gi.repository import Gtk, Adw
+from gi.repository import Gtk
 from uuid import UUID
 
 from apx_gui.core.apx_entities import PkgManager
+from apx_gui.core.apx_objects import PkgManagerObject
 
 
 @Gtk.Template(resource_path="/org/vanillaos/apx-gui/gtk/entry-pkgmanager.ui")
-class EntryPkgManager(Adw.ActionRow):
+class EntryPkgManager(Gtk.Box):
     __gtype_name__: str = "EntryPkgManager"
 
-    def __init__(self, pkgmanager: PkgManager, **kwargs) -> None:
+    label_title: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+
+    def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
-        self.set_title(pkgmanager.name)
 
-        self.pkgmanager: PkgManager = pkgmanager
-        self.aid: UUID = pkgmanager.aid
+        self.pkgmanager: PkgManager | None = None
+        self.aid: UUID | None = None
+
+    def bind(self, item: PkgManagerObject) -> None:
+        self.pkgmanager = item.pkgmanager
+        self.aid = item.aid
+        self.label_title.set_label(item.pkgmanager.name)
+
+    def unbind(self) -> None:
+        self.pkgmanager = None
+        self.aid = None
@@ -17,19 +17,30 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from gi.repository import Gtk, Adw
+from gi.repository import Gtk
 from uuid import UUID
 
 from apx_gui.core.apx_entities import Stack
+from apx_gui.core.apx_objects import StackObject
 
 
 @Gtk.Template(resource_path="/org/vanillaos/apx-gui/gtk/entry-stack.ui")
-class EntryStack(Adw.ActionRow):
+class EntryStack(Gtk.Box):
     __gtype_name__: str = "EntryStack"
 
-    def __init__(self, stack: Stack, **kwargs) -> None:
+    label_title: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+
+    def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
-        self.set_title(stack.name)
 
-        self.stack: Stack = stack
-        self.aid: UUID = stack.aid
+        self.stack: Stack | None = None
+        self.aid: UUID | None = None
+
+    def bind(self, item: StackObject) -> None:
+        self.stack = item.stack
+        self.aid = item.aid
+        self.label_title.set_label(item.stack.name)
+
+    def unbind(self) -> None:
+        self.stack = None
+        self.aid = None
@@ -17,30 +17,61 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from gi.repository import Gtk, Adw  # pyright: ignore
+from gi.repository import Gtk, GObject  # pyright: ignore
 from uuid import UUID
 
 from gettext import gettext as _
 
 from apx_gui.core.apx_entities import Subsystem
+from apx_gui.core.apx_objects import SubsystemObject
 
 
 @Gtk.Template(resource_path="/org/vanillaos/apx-gui/gtk/entry-subsystem.ui")
-class EntrySubsystem(Adw.ActionRow):
+class EntrySubsystem(Gtk.Box):
     __gtype_name__: str = "EntrySubsystem"
 
     status: Gtk.Image = Gtk.Template.Child()  # pyright: ignore
+    label_title: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+    label_subtitle: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
 
-    def __init__(self, subsystem: Subsystem, **kwargs) -> None:
+    def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
-        self.set_title(subsystem.name)
-        self.set_subtitle(_("Based on the {} stack.").format(subsystem.stack.name))
 
-        if subsystem.running:
-            icon_name = "media-playback-start-symbolic"
-        else:
-            icon_name = "media-playback-stop-symbolic"
-        self.status.set_from_icon_name(icon_name)
+        self.subsystem: Subsystem | None = None
+        self.aid: UUID | None = None
+        self.__bindings: list[GObject.Binding] = []
 
-        self.subsystem: Subsystem = subsystem
-        self.aid: UUID = subsystem.aid
+    def bind(self, item: SubsystemObject) -> None:
+        flags: GObject.BindingFlags = GObject.BindingFlags.SYNC_CREATE
+        self.__bindings = [
+            item.bind_property("name", self.label_title, "label", flags),
+            item.bind_property(
+                "stack-name",
+                self.label_subtitle,
+                "label",
+                flags,
+                lambda _binding, name: _("Based on the {} stack.").format(name),
+            ),
+            item.bind_property(
+                "running",
+                self.status,
+                "icon-name",
+                flags,
+                lambda _binding, running: (
+                    "media-playback-start-symbolic"
+                    if running
+                    else "media-playback-stop-symbolic"
+                ),
+            ),
+        ]
+
+        self.subsystem = item.subsystem
+        self.aid = item.aid
+
+    def unbind(self) -> None:
+        for binding in self.__bindings:
+            binding.unbind()
+        self.__bindings = []
+
+        self.subsystem = None
+        self.aid = None
@@ -17,13 +17,18 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from gi.repository import Gtk, Adw
+import time
+import weakref
+from gi.repository import Gtk, Adw, Gio, GLib
+from gettext import ngettext
 from uuid import UUID
 
 from apx_gui.widgets.entry_subsystem import EntrySubsystem
 from apx_gui.widgets.entry_stack import EntryStack
 from apx_gui.widgets.entry_pkgmanager import EntryPkgManager
 from apx_gui.core.apx_entities import Subsystem, Stack, PkgManager
+from apx_gui.core.apx_objects import SubsystemObject, StackObject, PkgManagerObject
+from apx_gui.core.search_index import SearchIndex
 
 from typing import TYPE_CHECKING
 
@@ -34,14 +39,25 @@ if TYPE_CHECKING:
 @Gtk.Template(resource_path="/org/vanillaos/apx-gui/gtk/sidebar.ui")
 class Sidebar(Adw.Bin):
     __gtype_name__: str = "Sidebar"
-    __registry__: dict[str, EntrySubsystem | EntryStack | EntryPkgManager] = {}
 
-    list_subsystems: Gtk.ListBox = Gtk.Template.Child()  # pyright: ignore
-    list_stacks: Gtk.ListBox = Gtk.Template.Child()  # pyright: ignore
-    list_pkgmanagers: Gtk.ListBox = Gtk.Template.Child()  # pyright: ignore
+    list_subsystems: Gtk.ListView = Gtk.Template.Child()  # pyright: ignore
+    list_stacks: Gtk.ListView = Gtk.Template.Child()  # pyright: ignore
+    list_pkgmanagers: Gtk.ListView = Gtk.Template.Child()  # pyright: ignore
     stack_sidebar: Adw.ViewStack = Gtk.Template.Child()  # pyright: ignore
     btn_new: Adw.SplitButton = Gtk.Template.Child()  # pyright: ignore
     sidebar_switcher: Adw.ViewSwitcher = Gtk.Template.Child() # pyright: ignore
+    entry_search: Gtk.SearchEntry = Gtk.Template.Child()  # pyright: ignore
+    btn_view: Gtk.MenuButton = Gtk.Template.Child()  # pyright: ignore
+    btn_select: Gtk.ToggleButton = Gtk.Template.Child()  # pyright: ignore
+    label_selected: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+    btn_bulk_start: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    btn_bulk_stop: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    btn_bulk_search: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    btn_bulk_upgrade: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    btn_bulk_clean: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    btn_bulk_autoremove: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+
+    last_used_resolution: int = 60
 
     def __init__(
         self,
@@ -56,109 +72,417 @@ class Sidebar(Adw.Bin):
         self.__subsystems: list[Subsystem] = subsystems
         self.__stacks: list[Stack] = stacks
         self.__pkgmanagers: list[PkgManager] = pkgmanagers
+        self.__registry: weakref.WeakValueDictionary[
+            str, SubsystemObject | StackObject | PkgManagerObject
+        ] = weakref.WeakValueDictionary()
+
+        self.__store_subsystems: Gio.ListStore = Gio.ListStore.new(SubsystemObject)
+        self.__store_stacks: Gio.ListStore = Gio.ListStore.new(StackObject)
+        self.__store_pkgmanagers: Gio.ListStore = Gio.ListStore.new(PkgManagerObject)
+
+        self.__index: SearchIndex = SearchIndex()
+        self.__matches: set[UUID] | None = None
+        self.__filter: Gtk.CustomFilter = Gtk.CustomFilter.new(self.__filter_func)
+
+        self.__settings: Gio.Settings = self.__window.settings
+        self.__sorter: Gtk.CustomSorter = Gtk.CustomSorter.new(self.__compare)
+        self.__section_sorter: Gtk.CustomSorter = Gtk.CustomSorter.new(
+            self.__compare_group
+        )
+        self.__sort_model: Gtk.SortListModel = Gtk.SortListModel(
+            model=Gtk.FilterListModel(
+                model=self.__store_subsystems, filter=self.__filter
+            ),
+            sorter=self.__sorter,
+        )
+        self.__header_factory: Gtk.SignalListItemFactory = self.__new_header_factory()
+        self.__single_subsystems: Gtk.SingleSelection | None = None
+        self.__multi_subsystems: Gtk.MultiSelection = Gtk.MultiSelection(
+            model=self.__sort_model
+        )
+
         self.__build_ui()
 
     def __build_ui(self) -> None:
-        self.list_subsystems.connect("row-selected", self.__on_subsystem_selected)
-        self.list_stacks.connect("row-selected", self.__on_stack_selected)
-        self.list_pkgmanagers.connect("row-selected", self.__on_pkgmanager_selected)
+        self.__single_subsystems = self.__setup_list(
+            self.list_subsystems, self.__sort_model, EntrySubsystem
+        )
+        self.__setup_list(
+            self.list_stacks,
+            Gtk.FilterListModel(model=self.__store_stacks, filter=self.__filter),
+            EntryStack,
+        )
+        self.__setup_list(
+            self.list_pkgmanagers,
+            Gtk.FilterListModel(model=self.__store_pkgmanagers, filter=self.__filter),
+            EntryPkgManager,
+        )
+
+        actions: Gio.SimpleActionGroup = Gio.SimpleActionGroup()
+        actions.add_action(self.__settings.create_action("sidebar-sort"))
+        actions.add_action(self.__settings.create_action("sidebar-group"))
+        self.insert_action_group("sidebar", actions)
+        self.__settings.connect("changed::sidebar-sort", self.__on_sort_changed)
+        self.__settings.connect("changed::sidebar-group", self.__on_group_changed)
+        self.__on_group_changed(self.__settings)
 
         self.btn_new.connect("clicked", self.__on_btn_menu_clicked)
+        self.btn_select.connect("toggled", self.__on_select_toggled)
+        self.stack_sidebar.connect(
+            "notify::visible-child-name", self.__on_visible_page_changed
+        )
+        self.__multi_subsystems.connect(
+            "selection-changed", self.__on_multi_selection_changed
+        )
+        for button, operation in [
+            (self.btn_bulk_start, "start"),
+            (self.btn_bulk_stop, "stop"),
+            (self.btn_bulk_clean, "clean"),
+            (self.btn_bulk_autoremove, "autoremove"),
+        ]:
+            button.connect("clicked", self.__on_bulk_clicked, operation)
+        self.btn_bulk_upgrade.connect("clicked", self.__on_bulk_upgrade_clicked)
+        self.btn_bulk_search.connect("clicked", self.__on_bulk_search_clicked)
+        self.entry_search.connect("search-changed", self.__on_search_changed)
+
+        # forget the subsystems removed or renamed outside of this window
+        last_used: dict[str, int] = self.__settings.get_value(
+            "subsystems-last-used"
+        ).unpack()
+        names: set[str] = {subsystem.name for subsystem in self.__subsystems}
+        if not names.issuperset(last_used):
+            last_used = {
+                name: used for name, used in last_used.items() if name in names
+            }
+            self.__settings.set_value(
+                "subsystems-last-used", GLib.Variant("a{sx}", last_used)
+            )
+
+        self.__store_subsystems.splice(
+            0,
+            0,
+            [
+                self.__register(self.__new_subsystem_object(s, last_used.get(s.name, 0)))
+                for s in self.__subsystems
+            ],
+        )
+        self.__store_stacks.splice(
+            0, 0, [self.__register(StackObject(s)) for s in self.__stacks]
+        )
+        self.__store_pkgmanagers.splice(
+            0, 0, [self.__register(PkgManagerObject(p)) for p in self.__pkgmanagers]
+        )
+
+    def __setup_list(
+        self,
+        list_view: Gtk.ListView,
+        model: Gio.ListModel,
+        entry_type: type[EntrySubsystem | EntryStack | EntryPkgManager],
+    ) -> Gtk.SingleSelection:
+        """
+        Attach a selection model over `model` to `list_view`, with a factory
+        that only creates and binds `entry_type` rows for visible items.
+        """
+
+        def on_setup(factory: Gtk.SignalListItemFactory, item: Gtk.ListItem) -> None:
+            item.set_child(entry_type())
+
+        def on_bind(factory: Gtk.SignalListItemFactory, item: Gtk.ListItem) -> None:
+            item.get_child().bind(item.get_item())  # pyright: ignore
+
+        def on_unbind(factory: Gtk.SignalListItemFactory, item: Gtk.ListItem) -> None:
+            item.get_child().unbind()  # pyright: ignore
+
+        factory: Gtk.SignalListItemFactory = Gtk.SignalListItemFactory()
+        factory.connect("setup", on_setup)
+        factory.connect("bind", on_bind)
+        factory.connect("unbind", on_unbind)
+
+        selection: Gtk.SingleSelection = Gtk.SingleSelection(
+            model=model, autoselect=False, can_unselect=True
+        )
+        selection.set_selected(Gtk.INVALID_LIST_POSITION)
+        selection.connect("notify::selected-item", self.__on_item_selected)
+
+        list_view.set_model(selection)
+        list_view.set_factory(factory)
+        list_view.connect("activate", self.__on_item_activated)
+        return selection
+
+    def __register(
+        self, item: SubsystemObject | StackObject | PkgManagerObject
+    ) -> SubsystemObject | StackObject | PkgManagerObject:
+        self.__registry[str(item.aid)] = item
+        self.__index.add(self.__entity_of(item))
+        return item
+
+    @staticmethod
+    def __entity_of(
+        item: SubsystemObject | StackObject | PkgManagerObject,
+    ) -> Subsystem | Stack | PkgManager:
+        if isinstance(item, SubsystemObject):
+            return item.subsystem
+        if isinstance(item, StackObject):
+            return item.stack
+        return item.pkgmanager
+
+    def __filter_func(
+        self, item: SubsystemObject | StackObject | PkgManagerObject, *args
+    ) -> bool:
+        return self.__matches is None or item.aid in self.__matches
+
+    def __new_subsystem_object(
+        self, subsystem: Subsystem, last_used: int = 0
+    ) -> SubsystemObject:
+        item: SubsystemObject = SubsystemObject(subsystem)
+        item.last_used = last_used
+        item.connect("notify::running", self.__on_sort_key_changed, "status")
+        item.connect("notify::last-used", self.__on_sort_key_changed, "last-used")
+        return item
+
+    def __group_of(self, item: SubsystemObject) -> str:
+        if self.__settings.get_string("sidebar-group") == "pkgmanager":
+            return item.subsystem.stack.pkg_manager
+        return item.stack_name
+
+    def __compare_group(self, a: SubsystemObject, b: SubsystemObject, *args) -> int:
+        group_a: str = self.__group_of(a).casefold()
+        group_b: str = self.__group_of(b).casefold()
+        return (group_a > group_b) - (group_a < group_b)
+
+    def __sort_key(self, item: SubsystemObject) -> tuple:
+        mode: str = self.__settings.get_string("sidebar-sort")
+        name: str = item.name.casefold()
+        if mode == "status":
+            return (not item.running, name)
+        if mode == "stack":
+            return (item.stack_name.casefold(), name)
+        if mode == "last-used":
+            return (-item.last_used, name)
+        return (name,)
+
+    def __compare(self, a: SubsystemObject, b: SubsystemObject, *args) -> int:
+        key_a: tuple = self.__sort_key(a)
+        key_b: tuple = self.__sort_key(b)
+        return (key_a > key_b) - (key_a < key_b)
+
+    def __on_sort_key_changed(
+        self, item: SubsystemObject, pspec: object, mode: str
+    ) -> None:
+        """
+        Reposition a single item when the property the list is sorted by
+        changes, the sort model re-inserts only the changed item.
+        """
+        if self.__settings.get_string("sidebar-sort") != mode:
+            return
 
-        for subsystem in self.__subsystems:
-            entry = EntrySubsystem(subsystem)
-            self.list_subsystems.append(entry)
-            self.__registry__[str(subsystem.aid)] = entry
+        found, position = self.__store_subsystems.find(item)
+        if found:
+            self.__store_subsystems.items_changed(position, 1, 1)
+
+    def __on_sort_changed(self, settings: Gio.Settings, *args) -> None:
+        self.__sorter.changed(Gtk.SorterChange.DIFFERENT)
 
-        for stack in self.__stacks:
-            entry = EntryStack(stack)
-            self.list_stacks.append(entry)
-            self.__registry__[str(stack.aid)] = entry
+    def __on_group_changed(self, settings: Gio.Settings, *args) -> None:
+        if settings.get_string("sidebar-group") == "none":
+            self.__sort_model.set_section_sorter(None)
+            self.list_subsystems.set_header_factory(None)
+            return
+
+        self.__sort_model.set_section_sorter(self.__section_sorter)
+        self.__section_sorter.changed(Gtk.SorterChange.DIFFERENT)
+        self.list_subsystems.set_header_factory(self.__header_factory)
+
+    def __new_header_factory(self) -> Gtk.SignalListItemFactory:
+        def on_setup(factory: Gtk.SignalListItemFactory, header: Gtk.ListHeader) -> None:
+            label: Gtk.Label = Gtk.Label(xalign=0, margin_start=6, margin_top=6)
+            label.add_css_class("heading")
+            header.set_child(label)
+
+        def on_bind(factory: Gtk.SignalListItemFactory, header: Gtk.ListHeader) -> None:
+            header.get_child().set_label(self.__group_of(header.get_item()))  # pyright: ignore
+
+        factory: Gtk.SignalListItemFactory = Gtk.SignalListItemFactory()
+        factory.connect("setup", on_setup)
+        factory.connect("bind", on_bind)
+        return factory
+
+    def __touch(self, item: SubsystemObject) -> None:
+        """
+        Mark `item` as used now. The time is saved at most once every
+        `last_used_resolution` seconds per subsystem, the sort order
+        only needs the value in memory.
+        """
+        previous: int = item.last_used
+        item.last_used = int(time.time())
+        if item.last_used - previous < self.last_used_resolution:
+            return
 
-        for pkgmanager in self.__pkgmanagers:
-            entry = EntryPkgManager(pkgmanager)
-            self.list_pkgmanagers.append(entry)
-            self.__registry__[str(pkgmanager.aid)] = entry
+        last_used: dict[str, int] = self.__settings.get_value(
+            "subsystems-last-used"
+        ).unpack()
+        last_used[item.name] = item.last_used
+        self.__settings.set_value(
+            "subsystems-last-used", GLib.Variant("a{sx}", last_used)
+        )
+
+    def __on_search_changed(self, entry: Gtk.SearchEntry) -> None:
+        self.__matches = self.__index.search(entry.get_text())
+        self.__filter.changed(Gtk.FilterChange.DIFFERENT)
+
+    def focus_search(self) -> None:
+        self.entry_search.grab_focus()
 
     def __on_btn_menu_clicked(self, *args):
-        current_list = self.stack_sidebar.get_visible_child()
-        if current_list == self.list_subsystems:
+        current_list = self.stack_sidebar.get_visible_child_name()
+        if current_list == "subsystems":
             self.__window.new_subsystem()
-        elif current_list == self.list_stacks:
+        elif current_list == "stacks":
             self.__window.new_stack()
-        elif current_list == self.list_pkgmanagers:
+        elif current_list == "pkgmanagers":
             self.__window.new_pkgmanager()
 
-    def __on_subsystem_selected(
-        self, listbox: Gtk.ListBox, row: EntrySubsystem
-    ) -> None:
-        if row is None:
-            return
-
-        if self.__window.editor.is_open(row.subsystem.aid):
-            self.__window.editor.open(row.subsystem.aid)
-            return
+    def __on_item_selected(self, selection: Gtk.SingleSelection, *args) -> None:
+        self.__open(selection.get_selected_item())
 
-        self.__window.editor.new_subsystem_tab(row.subsystem)
-
-    def __on_stack_selected(self, listbox: Gtk.ListBox, row: EntryStack) -> None:
-        if row is None:
+    def __on_item_activated(self, list_view: Gtk.ListView, position: int) -> None:
+        if list_view.get_model() is self.__multi_subsystems:
             return
-
-        if self.__window.editor.is_open(row.stack.aid):
-            self.__window.editor.open(row.stack.aid)
+        self.__open(list_view.get_model().get_item(position))  # pyright: ignore
+
+    def __on_select_toggled(self, button: Gtk.ToggleButton) -> None:
+        """
+        Switch the subsystems list between opening the clicked subsystem
+        and selecting many of them for a bulk action.
+        """
+        selecting: bool = button.get_active()
+        self.__multi_subsystems.unselect_all()
+        self.list_subsystems.set_model(
+            self.__multi_subsystems if selecting else self.__single_subsystems
+        )
+        self.list_subsystems.set_enable_rubberband(selecting)
+        self.get_child().set_reveal_bottom_bars(selecting)  # pyright: ignore
+        self.__on_multi_selection_changed(self.__multi_subsystems)
+
+    def __on_visible_page_changed(self, stack: Adw.ViewStack, *args) -> None:
+        is_subsystems: bool = stack.get_visible_child_name() == "subsystems"
+        self.btn_select.set_visible(is_subsystems)
+        if not is_subsystems:
+            self.btn_select.set_active(False)
+
+    def __selected_subsystems(self) -> list[Subsystem]:
+        selected: Gtk.Bitset = self.__multi_subsystems.get_selection()
+        model: Gtk.MultiSelection = self.__multi_subsystems
+        return [
+            model.get_item(selected.get_nth(i)).subsystem  # pyright: ignore
+            for i in range(selected.get_size())
+        ]
+
+    def __on_multi_selection_changed(
+        self, selection: Gtk.MultiSelection, *args
+    ) -> None:
+        count: int = selection.get_selection().get_size()
+        self.label_selected.set_label(
+            ngettext("{} subsystem selected", "{} subsystems selected", count).format(count)
+        )
+        for button in [
+            self.btn_bulk_start,
+            self.btn_bulk_stop,
+            self.btn_bulk_search,
+            self.btn_bulk_upgrade,
+            self.btn_bulk_clean,
+            self.btn_bulk_autoremove,
+        ]:
+            button.set_sensitive(count > 0)
+
+    def __on_bulk_clicked(self, button: Gtk.Button, operation: str) -> None:
+        subsystems: list[Subsystem] = self.__selected_subsystems()
+        if subsystems:
+            self.__window.run_bulk(operation, subsystems)
+
+    def __on_bulk_upgrade_clicked(self, button: Gtk.Button) -> None:
+        subsystems: list[Subsystem] = self.__selected_subsystems()
+        if subsystems:
+            self.__window.upgrade_subsystems(subsystems)
+
+    def __on_bulk_search_clicked(self, button: Gtk.Button) -> None:
+        subsystems: list[Subsystem] = self.__selected_subsystems()
+        if subsystems:
+            self.__window.search_packages(subsystems)
+
+    def __open(
+        self, item: SubsystemObject | StackObject | PkgManagerObject | None
+    ) -> None:
+        if item is None:
             return
 
-        self.__window.editor.new_stack_tab(row.stack)
+        if isinstance(item, SubsystemObject):
+            self.__touch(item)
 
-    def __on_pkgmanager_selected(
-        self, listbox: Gtk.ListBox, row: EntryPkgManager
-    ) -> None:
-        if row is None:
+        if self.__window.editor.is_open(item.aid):
+            self.__window.editor.open(item.aid)
             return
 
-        if self.__window.editor.is_open(row.pkgmanager.aid):
-            self.__window.editor.open(row.pkgmanager.aid)
-            return
+        if isinstance(item, SubsystemObject):
+            self.__window.editor.new_subsystem_tab(item.subsystem)
+        elif isinstance(item, StackObject):
+            self.__window.editor.new_stack_tab(item.stack)
+        elif isinstance(item, PkgManagerObject):
+            self.__window.editor.new_pkgmanager_tab(item.pkgmanager)
 
-        self.__window.editor.new_pkgmanager_tab(row.pkgmanager)
+    def __remove(self, store: Gio.ListStore, aid: UUID) -> None:
+        item = self.__registry.pop(str(aid))
+        self.__index.remove(aid)
+        found, position = store.find(item)
+        if found:
+            store.remove(position)
 
     def remove_subsystem(self, aid: UUID) -> None:
-        self.list_subsystems.remove(self.__registry__[str(aid)])
-        self.__registry__.pop(str(aid))
+        item = self.__registry.get(str(aid))
+        if isinstance(item, SubsystemObject):
+            last_used: dict[str, int] = self.__settings.get_value(
+                "subsystems-last-used"
+            ).unpack()
+            if last_used.pop(item.name, None) is not None:
+                self.__settings.set_value(
+                    "subsystems-last-used", GLib.Variant("a{sx}", last_used)
+                )
+
+        self.__remove(self.__store_subsystems, aid)
 
     def remove_stack(self, aid: UUID) -> None:
-        self.list_stacks.remove(self.__registry__[str(aid)])
-        self.__registry__.pop(str(aid))
+        self.__remove(self.__store_stacks, aid)
 
     def remove_pkgmanager(self, aid: UUID) -> None:
-        self.list_pkgmanagers.remove(self.__registry__[str(aid)])
-        self.__registry__.pop(str(aid))
+        self.__remove(self.__store_pkgmanagers, aid)
 
     def new_subsystem(self, subsystem: Subsystem) -> None:
-        entry = EntrySubsystem(subsystem)
-        self.list_subsystems.append(entry)
-        self.__registry__[str(subsystem.aid)] = entry
+        self.__store_subsystems.append(
+            self.__register(self.__new_subsystem_object(subsystem))
+        )
 
     def new_stack(self, stack: Stack) -> None:
-        entry = EntryStack(stack)
-        self.list_stacks.append(entry)
-        self.__registry__[str(stack.aid)] = entry
+        self.__store_stacks.append(self.__register(StackObject(stack)))
 
     def new_pkgmanager(self, pkgmanager: PkgManager) -> None:
-        entry = EntryPkgManager(pkgmanager)
-        self.list_pkgmanagers.append(entry)
-        self.__registry__[str(pkgmanager.aid)] = entry
+        self.__store_pkgmanagers.append(
+            self.__register(PkgManagerObject(pkgmanager))
+        )
 
     def update_subsystem(self, subsystem: Subsystem) -> None:
-        new_entry = EntrySubsystem(subsystem)
+        item = self.__registry.get(str(subsystem.aid))
+        if isinstance(item, SubsystemObject):
+            item.refresh()
+            self.__index.update(subsystem)
 
-        idx = 0
-        while (row := self.list_subsystems.get_row_at_index(idx)) is not None:
-            if row.aid == subsystem.aid:  # pyright: ignore
-                self.remove_subsystem(subsystem.aid)
-                self.list_subsystems.insert(new_entry, idx)
-                break
-            idx += 1
+    def update_stack(self, stack: Stack) -> None:
+        if str(stack.aid) not in self.__registry:
+            return
 
-        self.__registry__[str(subsystem.aid)] = new_entry
+        self.__index.update(stack)
+        # subsystems are indexed by the name and base of their stack, and
+        # apx reads the stack of a subsystem by name
+        for subsystem in self.__subsystems:
+            if subsystem.stack.name == stack.name:
+                subsystem.stack = stack
+                self.update_subsystem(subsystem)
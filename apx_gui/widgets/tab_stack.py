@@ -17,12 +17,12 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from gi.repository import Gtk, Adw
+from gi.repository import Gtk, Adw, Gio, GLib
 from uuid import UUID
 
 from gettext import gettext as _
 
-from apx_gui.core.apx_entities import Stack
+from apx_gui.core.apx_entities import Stack, Subsystem
 from apx_gui.core.run_async import RunAsync
 from apx_gui.utils.gtk import GtkUtils
 
@@ -38,7 +38,12 @@ class TabStack(Gtk.Box):
 
     row_base: Adw.EntryRow = Gtk.Template.Child()  # pyright: ignore
     row_pkgmanager: Adw.EntryRow = Gtk.Template.Child()  # pyright: ignore
-    row_packages: Adw.ExpanderRow = Gtk.Template.Child()  # pyright: ignore
+    group_packages: Adw.PreferencesGroup = Gtk.Template.Child()  # pyright: ignore
+    row_add_package: Adw.EntryRow = Gtk.Template.Child()  # pyright: ignore
+    entry_packages: Gtk.SearchEntry = Gtk.Template.Child()  # pyright: ignore
+    list_packages: Gtk.ListView = Gtk.Template.Child()  # pyright: ignore
+    group_details: Adw.PreferencesGroup = Gtk.Template.Child()  # pyright: ignore
+    label_details: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
     row_builtin: Adw.ActionRow = Gtk.Template.Child()  # pyright: ignore
     btn_delete: Adw.ActionRow = Gtk.Template.Child()  # pyright: ignore
     infobar: Gtk.InfoBar = Gtk.Template.Child()  # pyright: ignore
@@ -49,17 +54,34 @@ class TabStack(Gtk.Box):
         self.__window: ApxGUIWindow = window  # pyright: ignore
         self.__aid: UUID = stack.aid
         self.__stack: Stack = stack
+
+        packages: list[str] = self.__stack.package_names
+        self.__packages: set[str] = set(packages)
+        self.__applied_packages: set[str] = set(packages)
+        self.__update_source: int | None = None
+        self.__details_generation: int = 0
+
+        self.__store_packages: Gio.ListStore = Gio.ListStore.new(Gtk.StringObject)
+        self.__store_packages.splice(
+            0, 0, [Gtk.StringObject.new(package) for package in packages]
+        )
+        self.__filter_packages: Gtk.StringFilter = Gtk.StringFilter.new(
+            Gtk.PropertyExpression.new(Gtk.StringObject, None, "string")
+        )
+        self.__filter_packages.set_ignore_case(True)
+        self.__filter_packages.set_match_mode(Gtk.StringFilterMatchMode.SUBSTRING)
+
         self.__build_ui()
 
     def __build_ui(self) -> None:
         self.row_base.set_text(self.__stack.base)
         self.row_pkgmanager.set_text(self.__stack.pkg_manager)
-        self.row_packages.set_title(_("{} Packages").format(len(self.__stack.packages)))
         self.row_builtin.set_subtitle(_("Yes") if self.__stack.built_in else _("No"))
 
         if self.__stack.built_in:
             self.infobar.set_revealed(True)
             self.group_actions.set_visible(False)
+            self.row_add_package.set_visible(False)
             for row in [
                 self.row_base,
                 self.row_pkgmanager,
@@ -71,13 +93,190 @@ class TabStack(Gtk.Box):
         self.row_pkgmanager.connect("changed", self.__on_entry_changed)
         self.row_base.connect("apply", self.__on_base_apply)
         self.row_pkgmanager.connect("apply", self.__on_pkgmanager_apply)
+        self.row_add_package.connect("apply", self.__on_add_package_apply)
+        self.entry_packages.connect("search-changed", self.__on_packages_search)
+
+        factory: Gtk.SignalListItemFactory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.__on_package_setup)
+        factory.connect("bind", self.__on_package_bind)
+        self.list_packages.set_factory(factory)
+        selection: Gtk.SingleSelection = Gtk.SingleSelection.new(
+            Gtk.FilterListModel.new(self.__store_packages, self.__filter_packages)
+        )
+        selection.set_autoselect(False)
+        selection.set_can_unselect(True)
+        selection.set_selected(Gtk.INVALID_LIST_POSITION)
+        selection.connect("notify::selected-item", self.__on_package_selected)
+        self.list_packages.set_model(selection)
+        self.__update_packages_title()
+
+    def __update_packages_title(self) -> None:
+        self.group_packages.set_title(
+            _("{} Packages").format(self.__store_packages.get_n_items())
+        )
+
+    def __on_package_setup(
+        self, factory: Gtk.SignalListItemFactory, item: Gtk.ListItem
+    ) -> None:
+        label: Gtk.Label = Gtk.Label(xalign=0, hexpand=True)
+        btn_remove: Gtk.Button = Gtk.Button.new_from_icon_name("edit-delete-symbolic")
+        btn_remove.add_css_class("flat")
+        btn_remove.set_visible(not self.__stack.built_in)
+        btn_remove.connect("clicked", self.__on_remove_package_clicked, item)
+
+        box: Gtk.Box = Gtk.Box(spacing=6)
+        box.append(label)
+        box.append(btn_remove)
+        item.set_child(box)
+
+    def __on_package_bind(
+        self, factory: Gtk.SignalListItemFactory, item: Gtk.ListItem
+    ) -> None:
+        label: Gtk.Label = item.get_child().get_first_child()  # pyright: ignore
+        label.set_label(item.get_item().get_string())  # pyright: ignore
+
+    def __on_package_selected(self, selection: Gtk.SingleSelection, *args) -> None:
+        """
+        Show the details of the selected package, looked up through the
+        package info cache so browsing the list does not exec into a
+        subsystem for packages already seen.
+        """
+        self.__details_generation += 1
+        generation: int = self.__details_generation
+
+        item: Gtk.StringObject | None = selection.get_selected_item()  # pyright: ignore
+        if item is None:
+            self.group_details.set_visible(False)
+            return
+
+        package: str = item.get_string()
+        self.group_details.set_visible(True)
+        self.group_details.set_description(package)
+
+        subsystem: Subsystem | None = self.__window.subsystem_for_stack(self.__stack)
+        if subsystem is None:
+            self.label_details.set_label(
+                _("Create a subsystem based on this stack to see package details.")
+            )
+            return
+
+        def on_callback(result: tuple[bool, str] | None, *args) -> None:
+            if generation != self.__details_generation:
+                return
+
+            ok, output = result or (False, "")
+            self.label_details.set_label(
+                output.strip()
+                if ok
+                else _("No details found for {}").format(package)
+            )
+
+        cached: str | None = self.__window.package_info.get(
+            subsystem.stack.pkg_manager, subsystem.stack.base, package
+        )
+        if cached is not None:
+            on_callback((True, cached))
+            return
+
+        self.label_details.set_label(_("Loading…"))
+        RunAsync(
+            self.__window.package_info.lookup,
+            on_callback,
+            subsystem=subsystem,
+            package=package,
+        )
 
-        for pkg in self.__stack.packages:
-            arow: Adw.ActionRow = Adw.ActionRow()
-            arow.set_title(pkg)
-            self.row_packages.add_row(arow)
-            if self.__stack.built_in:
-                arow.set_sensitive(False)
+    def __on_packages_search(self, entry: Gtk.SearchEntry) -> None:
+        self.__filter_packages.set_search(entry.get_text())
+
+    def __on_add_package_apply(self, row: Adw.EntryRow) -> None:
+        added: list[str] = []
+        for package in row.get_text().split():
+            if package in self.__packages:
+                continue
+            self.__packages.add(package)
+            added.append(package)
+
+        if added:
+            n_items: int = self.__store_packages.get_n_items()
+            self.__store_packages.splice(
+                n_items, 0, [Gtk.StringObject.new(package) for package in added]
+            )
+            self.__update_packages_title()
+            self.__schedule_packages_update()
+
+        row.set_text("")
+
+    def __on_remove_package_clicked(
+        self, button: Gtk.Button, item: Gtk.ListItem
+    ) -> None:
+        package: Gtk.StringObject = item.get_item()  # pyright: ignore
+        found, position = self.__store_packages.find(package)
+        if not found:
+            return
+
+        self.__store_packages.remove(position)
+        self.__packages.discard(package.get_string())
+        self.__update_packages_title()
+        self.__schedule_packages_update()
+
+    def __schedule_packages_update(self) -> None:
+        """
+        Wait for edits to settle, then push the package set to apx once.
+        """
+        if self.__update_source is not None:
+            GLib.source_remove(self.__update_source)
+        self.__update_source = GLib.timeout_add(1000, self.__on_packages_update)
+
+    def __on_packages_update(self) -> bool:
+        self.__update_source = None
+
+        added: set[str] = self.__packages - self.__applied_packages
+        removed: set[str] = self.__applied_packages - self.__packages
+        if not added and not removed:
+            return False
+
+        packages: list[str] = [
+            item.get_string()  # pyright: ignore
+            for item in self.__store_packages
+        ]
+
+        def on_callback(result: bool, *args) -> None:
+            if result:
+                self.__applied_packages = set(packages)
+                self.__stack.packages = packages
+                self.__window.toast(
+                    _("{} stack updated: {} added, {} removed").format(
+                        self.__stack.name, len(added), len(removed)
+                    )
+                )
+            else:
+                self.__revert_packages()
+                self.__window.toast(
+                    _("Error updating {} stack").format(self.__stack.name)
+                )
+
+        RunAsync(self.__update, on_callback, packages=packages)
+        return False
+
+    def __revert_packages(self) -> None:
+        """
+        Show the packages apx knows about again, dropping the edits which
+        could not be applied.
+        """
+        if self.__update_source is not None:
+            GLib.source_remove(self.__update_source)
+            self.__update_source = None
+
+        packages: list[str] = self.__stack.package_names
+        self.__packages = set(packages)
+        self.__applied_packages = set(packages)
+        self.__store_packages.splice(
+            0,
+            self.__store_packages.get_n_items(),
+            [Gtk.StringObject.new(package) for package in packages],
+        )
+        self.__update_packages_title()
 
     @property
     def aid(self) -> UUID:
@@ -123,6 +322,7 @@ class TabStack(Gtk.Box):
             status: bool = result
             if status:
                 self.__stack.base = row.get_text()
+                self.__window.sidebar.update_stack(self.__stack)
                 self.__window.toast(_("{} stack updated").format(self.__stack.name))
             else:
                 self.__window.toast(
@@ -136,6 +336,7 @@ class TabStack(Gtk.Box):
             status: bool = result
             if status:
                 self.__stack.pkg_manager = row.get_text()
+                self.__window.sidebar.update_stack(self.__stack)
                 self.__window.toast(_("{} stack updated").format(self.__stack.name))
             else:
                 self.__window.toast(
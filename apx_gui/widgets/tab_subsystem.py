@@ -17,15 +17,26 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from gi.repository import Gtk, Gdk, GLib, Adw, Vte  # pyright: ignore
+from gi.repository import Gtk, Gdk, Gio, GLib, Adw, Pango, Vte  # pyright: ignore
 from uuid import UUID
+from collections import OrderedDict
+from collections.abc import Callable
+import os
+import gzip
+import shlex
+import signal
+import time
 
-from gettext import gettext as _
+from gettext import gettext as _, ngettext
 
-from apx_gui.core.apx_entities import Subsystem
-from apx_gui.core.run_async import RunAsync
+from apx_gui.core.apx_entities import Subsystem, Stack
+from apx_gui.core.run_async import RunAsync, Progress
+from apx_gui.core.snapshots import Snapshots
+from apx_gui.core.subsystem_cloner import SubsystemCloner
+from apx_gui.core.watchdog import Watchdog
+from apx_gui.utils.gtk import GtkUtils
 
-from typing import TYPE_CHECKING
+from typing import Any, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from apx_gui.windows.main_window import ApxGUIWindow
@@ -39,20 +50,38 @@ class TabSubsystem(Gtk.Box):
     row_stack: Adw.ActionRow = Gtk.Template.Child()  # pyright: ignore
     row_pkgmanager: Adw.ActionRow = Gtk.Template.Child()  # pyright: ignore
     row_programs: Adw.ExpanderRow = Gtk.Template.Child()  # pyright: ignore
+    group_packages: Adw.PreferencesGroup = Gtk.Template.Child()  # pyright: ignore
+    row_drift: Adw.ActionRow = Gtk.Template.Child()  # pyright: ignore
+    btn_drift_check: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    btn_reconcile: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    row_package: Adw.EntryRow = Gtk.Template.Child()  # pyright: ignore
+    btn_install: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    btn_uninstall: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    list_programs: Gtk.ListView = Gtk.Template.Child()  # pyright: ignore
     row_start_stop: Adw.ActionRow = Gtk.Template.Child()  # pyright: ignore
     row_reset: Adw.ActionRow = Gtk.Template.Child()  # pyright: ignore
     row_delete: Adw.ActionRow = Gtk.Template.Child()  # pyright: ignore
     btn_start_stop: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
     btn_autoremove: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
     btn_clean: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    btn_duplicate: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    group_snapshots: Adw.PreferencesGroup = Gtk.Template.Child()  # pyright: ignore
+    btn_snapshot_take: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
+    btn_snapshot_prune: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
     btn_toggle_console: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
     btn_restart_console: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
     btn_reset: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
     btn_delete: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
     box_console: Gtk.Box = Gtk.Template.Child()  # pyright: ignore
+    revealer_progress: Gtk.Revealer = Gtk.Template.Child()  # pyright: ignore
+    label_progress: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+    progress_operation: Gtk.ProgressBar = Gtk.Template.Child()  # pyright: ignore
 
     console_initialized: bool = False
-    gesture_controller: Gtk.GestureClick = Gtk.GestureClick(button=Gdk.BUTTON_SECONDARY)
+    scrollback_dir: str = os.path.join(
+        GLib.get_user_cache_dir(), "apx-gui", "scrollback"
+    )
+    queue_delay: int = 1500
 
     def __init__(
         self, window: Adw.ApplicationWindow, subsystem: Subsystem, **kwargs
@@ -61,27 +90,293 @@ class TabSubsystem(Gtk.Box):
         self.__window: ApxGUIWindow = window  # pyright: ignore
         self.__aid: UUID = subsystem.aid
         self.__subsystem: Subsystem = subsystem
+        self.__child_pid: int | None = None
+        self.__programs: Gtk.StringList | None = None
+        self.__hibernated: bool = False
+        self.__scrollback_saved: bool = False
+        self.__scrollback_write: RunAsync | None = None
+        self.__queue: OrderedDict[str, str] = OrderedDict()
+        self.__queue_rows: dict[str, Adw.ActionRow] = {}
+        self.__queue_dismiss: dict[str, Gtk.Button] = {}
+        self.__queue_source: int | None = None
+        self.__queue_running: bool = False
+        self.__snapshots: list[dict[str, Any]] = []
+        self.__snapshot_rows: list[Adw.ActionRow] = []
+        self.console: Vte.Terminal | None = None
+        self.gesture_controller: Gtk.GestureClick = Gtk.GestureClick(
+            button=Gdk.BUTTON_SECONDARY
+        )
 
         self.btn_start_stop.connect("clicked", self.__on_start_stop_clicked)
         self.btn_autoremove.connect("clicked", self.__on_autoremove_clicked)
         self.btn_clean.connect("clicked", self.__on_clean_clicked)
+        self.btn_duplicate.connect("clicked", self.__on_duplicate_clicked)
+        self.btn_snapshot_take.connect("clicked", self.__on_snapshot_take_clicked)
+        self.btn_snapshot_prune.connect("clicked", self.__on_snapshot_prune_clicked)
 
         self.btn_toggle_console.connect("clicked", self.__on_console_clicked)
         self.btn_restart_console.connect("clicked", self.__on_reset_console_clicked)
         self.btn_reset.connect("clicked", self.__on_reset_clicked)
         self.btn_delete.connect("clicked", self.__on_delete_clicked)
+        self.row_programs.connect("notify::expanded", self.__on_programs_expanded)
+        self.btn_install.connect("clicked", self.__on_queue_clicked, "install")
+        self.btn_uninstall.connect("clicked", self.__on_queue_clicked, "remove")
+        self.row_package.connect("entry-activated", self.__on_queue_clicked, "install")
+        self.btn_drift_check.connect("clicked", self.__on_drift_check_clicked)
+        self.btn_reconcile.connect("clicked", self.__on_reconcile_clicked)
 
-        for name, program in self.__subsystem.exported_programs.items():
-            row: Adw.ActionRow = Adw.ActionRow(
-                title=name, subtitle=program.get("GenericName", "")
+        self.__rebuild_ui()
+        self.__load_snapshots()
+
+    def __on_programs_expanded(self, row: Adw.ExpanderRow, *args) -> None:
+        if not row.get_expanded() or self.__programs is not None:
+            return
+
+        factory: Gtk.SignalListItemFactory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.__on_program_setup)
+        factory.connect("bind", self.__on_program_bind)
+
+        self.__programs = Gtk.StringList.new(
+            list(self.__subsystem.exported_programs.keys())
+        )
+        self.list_programs.set_factory(factory)
+        self.list_programs.set_model(Gtk.NoSelection.new(self.__programs))
+
+    def __on_program_setup(
+        self, factory: Gtk.SignalListItemFactory, item: Gtk.ListItem
+    ) -> None:
+        labels: Gtk.Box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        labels.append(Gtk.Label(xalign=0, ellipsize=Pango.EllipsizeMode.END))
+        subtitle: Gtk.Label = Gtk.Label(xalign=0, ellipsize=Pango.EllipsizeMode.END)
+        subtitle.add_css_class("dim-label")
+        subtitle.add_css_class("caption")
+        labels.append(subtitle)
+
+        box: Gtk.Box = Gtk.Box(spacing=12, margin_top=6, margin_bottom=6)
+        box.append(Gtk.Image(pixel_size=32))
+        box.append(labels)
+        item.set_child(box)
+
+    def __on_program_bind(
+        self, factory: Gtk.SignalListItemFactory, item: Gtk.ListItem
+    ) -> None:
+        name: str = item.get_item().get_string()  # pyright: ignore
+        program: dict = self.__subsystem.exported_programs.get(name, {})
+
+        box: Gtk.Box = item.get_child()  # pyright: ignore
+        image: Gtk.Image = box.get_first_child()  # pyright: ignore
+        title: Gtk.Label = image.get_next_sibling().get_first_child()  # pyright: ignore
+        subtitle: Gtk.Label = title.get_next_sibling()  # pyright: ignore
+
+        image.set_from_gicon(GtkUtils.lookup_icon(program.get("Icon")))
+        title.set_label(name)
+        subtitle.set_label(program.get("GenericName", ""))
+        subtitle.set_visible(bool(subtitle.get_label()))
+
+    def __on_queue_clicked(self, widget: Gtk.Widget, action: str) -> None:
+        packages: list[str] = self.row_package.get_text().split()
+        if packages:
+            self.enqueue(action, packages)
+        self.row_package.set_text("")
+
+    def enqueue(self, action: str, packages: list[str]) -> None:
+        """
+        Queue `packages` to be installed or removed, `action` being
+        "install" or "remove". The queue is flushed once no request came
+        for `queue_delay` ms, asking the opposite action for a package
+        still waiting cancels it.
+        """
+        for package in packages:
+            if self.__queue.get(package, action) != action:
+                del self.__queue[package]
+                self.__remove_queue_row(package)
+                continue
+
+            self.__queue[package] = action
+            self.__set_queue_row(
+                package,
+                _("Waiting to be installed")
+                if action == "install"
+                else _("Waiting to be removed"),
             )
-            row.set_icon_name(program.get("Icon", "application-x-executable-symbolic"))
-            self.row_programs.add_row(row)
 
-        self.console: Vte.Terminal = self.__create_console()
-        self.box_console.prepend(self.console)
+        if self.__queue_source is not None:
+            GLib.source_remove(self.__queue_source)
+        self.__queue_source = GLib.timeout_add(self.queue_delay, self.__flush_queue)
 
-        self.__rebuild_ui()
+    def __set_queue_row(
+        self, package: str, subtitle: str, failed: bool = False
+    ) -> None:
+        row: Adw.ActionRow | None = self.__queue_rows.get(package)
+        if row is None:
+            row = self.__queue_rows[package] = Adw.ActionRow(title=package)
+            self.group_packages.add(row)
+
+        row.set_subtitle(subtitle)
+        if failed:
+            row.add_css_class("error")
+        else:
+            row.remove_css_class("error")
+
+        btn_dismiss: Gtk.Button | None = self.__queue_dismiss.get(package)
+        if btn_dismiss is None and failed:
+            btn_dismiss = self.__queue_dismiss[package] = (
+                Gtk.Button.new_from_icon_name("window-close-symbolic")
+            )
+            btn_dismiss.add_css_class("flat")
+            btn_dismiss.set_valign(Gtk.Align.CENTER)
+            btn_dismiss.connect("clicked", self.__on_dismiss_clicked, package)
+            row.add_suffix(btn_dismiss)
+        if btn_dismiss is not None:
+            btn_dismiss.set_visible(failed)
+
+    def __remove_queue_row(self, package: str) -> None:
+        self.__queue_dismiss.pop(package, None)
+        row: Adw.ActionRow | None = self.__queue_rows.pop(package, None)
+        if row is not None:
+            self.group_packages.remove(row)
+
+    def __flush_queue(self) -> bool:
+        self.__queue_source = None
+        if self.__queue_running or not self.__queue:
+            return False
+
+        batch: dict[str, str] = dict(self.__queue)
+        self.__queue.clear()
+        installs: list[str] = [p for p, action in batch.items() if action == "install"]
+        removes: list[str] = [p for p, action in batch.items() if action == "remove"]
+        for package in installs:
+            self.__set_queue_row(package, _("Installing…"))
+        for package in removes:
+            self.__set_queue_row(package, _("Removing…"))
+
+        def on_callback(results: dict[str, tuple[bool, str]] | None, *args) -> None:
+            self.__end_progress(toast)
+            self.__queue_running = False
+            self.__on_queue_done(batch, results or {})
+            if self.__queue:
+                self.__flush_queue()
+
+        self.__queue_running = True
+        toast: Adw.Toast = self.__window.toast(
+            _("Updating packages of {}...").format(self.__subsystem.name), timeout=0
+        )
+        RunAsync(
+            self.__run_queue,
+            on_callback,
+            installs=installs,
+            removes=removes,
+            progress=self.__new_progress(toast),
+        )
+        return False
+
+    def __run_queue(
+        self, installs: list[str], removes: list[str], progress: Progress
+    ) -> dict[str, tuple[bool, str]]:
+        """
+        Remove then install the batch with one apx call each. When a call
+        fails, its packages are retried one by one to tell which failed.
+        """
+        results: dict[str, tuple[bool, str]] = {}
+
+        for packages, operation in [
+            (removes, self.__subsystem.remove_packages),
+            (installs, self.__subsystem.install_packages),
+        ]:
+            if not packages:
+                continue
+
+            ok, output = operation(packages, progress)
+            if ok or len(packages) == 1:
+                results.update({package: (ok, output) for package in packages})
+                continue
+
+            for package in packages:
+                results[package] = operation([package], progress)
+
+        return results
+
+    def __on_queue_done(
+        self, batch: dict[str, str], results: dict[str, tuple[bool, str]]
+    ) -> None:
+        failed: list[str] = []
+        for package, action in batch.items():
+            ok, output = results.get(package, (False, _("Not run")))
+            if ok:
+                self.__remove_queue_row(package)
+                continue
+
+            failed.append(package)
+            lines: list[str] = output.strip().splitlines()
+            self.__set_queue_row(
+                package,
+                _("Failed: {}").format(lines[-1] if lines else _("unknown error")),
+                failed=True,
+            )
+
+        self.__window.refresh_subsystem_packages(
+            self.__subsystem, callback=self.update_drift
+        )
+
+        if failed:
+            self.__window.toast(
+                _("Could not install or remove {}").format(", ".join(failed))
+            )
+        else:
+            self.__window.toast(
+                _("Packages of {} updated").format(self.__subsystem.name)
+            )
+
+    def update_drift(self, *args) -> None:
+        """
+        Compare the packages declared by the stack with the installed ones
+        in the package index, without asking the subsystem.
+        """
+        missing: set[str] | None = self.__window.package_index.drift(
+            self.__subsystem
+        )
+        self.btn_reconcile.set_visible(bool(missing))
+        self.btn_reconcile.set_sensitive(not self.__queue_running)
+
+        if missing is None:
+            self.row_drift.set_subtitle(
+                _("Start the subsystem to compare it with its stack")
+            )
+        elif not missing:
+            self.row_drift.set_subtitle(
+                _("All packages of the {} stack are installed").format(
+                    self.__subsystem.stack.name
+                )
+            )
+        else:
+            self.row_drift.set_subtitle(
+                ngettext(
+                    "{} package of the stack is missing: {}",
+                    "{} packages of the stack are missing: {}",
+                    len(missing),
+                ).format(len(missing), ", ".join(sorted(missing)))
+            )
+
+    def __on_drift_check_clicked(self, button: Gtk.Button) -> None:
+        self.__window.refresh_subsystem_packages(
+            self.__subsystem, callback=self.update_drift
+        )
+
+    def __on_reconcile_clicked(self, button: Gtk.Button) -> None:
+        """
+        Install only the missing packages, in one batch through the queue,
+        instead of resetting the subsystem.
+        """
+        missing: set[str] | None = self.__window.package_index.drift(
+            self.__subsystem
+        )
+        if missing:
+            self.btn_reconcile.set_sensitive(False)
+            self.enqueue("install", sorted(missing))
+
+    def __on_dismiss_clicked(self, button: Gtk.Button, package: str) -> None:
+        if package not in self.__queue:
+            self.__remove_queue_row(package)
 
     def __rebuild_ui(self) -> None:
         self.row_status.set_subtitle(self.__subsystem.status)
@@ -90,6 +385,14 @@ class TabSubsystem(Gtk.Box):
         self.row_programs.set_title(
             _("({}) Exported Programs").format(len(self.__subsystem.exported_programs))
         )
+        if self.__programs is not None:
+            self.__programs.splice(
+                0,
+                self.__programs.get_n_items(),
+                list(self.__subsystem.exported_programs.keys()),
+            )
+
+        self.update_drift()
 
         if self.subsystem.running:
             self.row_start_stop.set_title(_("Stop subsystem"))
@@ -111,6 +414,114 @@ class TabSubsystem(Gtk.Box):
 
         return console
 
+    def __ensure_console(self) -> Vte.Terminal:
+        """
+        Create the console the first time it is needed.
+        """
+        if self.console is None:
+            self.console = self.__create_console()
+            self.box_console.prepend(self.console)
+        return self.console
+
+    @staticmethod
+    def remove_saved_scrollbacks() -> None:
+        """
+        Remove the scrollbacks left on disk by a previous session, they
+        are keyed by tab and cannot be restored anymore.
+        """
+        if not os.path.isdir(TabSubsystem.scrollback_dir):
+            return
+
+        for filename in os.listdir(TabSubsystem.scrollback_dir):
+            try:
+                os.remove(os.path.join(TabSubsystem.scrollback_dir, filename))
+            except OSError:
+                pass
+
+    @property
+    def __scrollback_path(self) -> str:
+        return os.path.join(self.scrollback_dir, f"{self.__aid}.gz")
+
+    def __save_scrollback(self) -> None:
+        stream: Gio.MemoryOutputStream = Gio.MemoryOutputStream.new_resizable()
+        self.console.write_contents_sync(  # pyright: ignore
+            stream, Vte.WriteFlags.DEFAULT, None
+        )
+        stream.close()
+        contents: bytes = stream.steal_as_bytes().get_data()
+        path: str = self.__scrollback_path
+
+        def write() -> None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(path, "wb", compresslevel=1) as file:
+                file.write(contents)
+
+        self.__scrollback_write = RunAsync(write)
+        self.__scrollback_saved = True
+
+    def __restore_scrollback(self, then: Callable[[], None]) -> None:
+        """
+        Create the console and feed it the saved scrollback, read in the
+        background, then call `then`.
+        """
+        self.__scrollback_saved = False
+        console: Vte.Terminal = self.__ensure_console()
+        path: str = self.__scrollback_path
+        writing: RunAsync | None = self.__scrollback_write
+
+        def read() -> bytes:
+            if writing is not None:
+                writing.join()
+            if not os.path.exists(path):
+                return b""
+
+            with gzip.open(path, "rb") as file:
+                contents: bytes = file.read()
+            os.remove(path)
+            return contents
+
+        def on_callback(contents: bytes | None, *args) -> None:
+            if self.console is not console:
+                return
+
+            if contents:
+                console.feed(contents.rstrip(b"\n").replace(b"\n", b"\r\n"))
+                console.feed(b"\r\n")
+            then()
+
+        RunAsync(read, on_callback)
+
+    def hibernate(self, save_scrollback: bool = True) -> None:
+        """
+        Release the console, its scrollback and child process. The
+        scrollback is optionally saved compressed on disk and restored
+        when the console is created again.
+        """
+        if self.console is None:
+            return
+
+        if save_scrollback and self.console_initialized:
+            self.__save_scrollback()
+
+        self.__hibernated = self.console_initialized
+        self.__kill_child()
+        self.console.remove_controller(self.gesture_controller)
+        self.box_console.remove(self.console)
+        self.console = None
+        self.console_initialized = False
+
+    def wake(self) -> None:
+        """
+        Bring back a hibernated console if it was visible.
+        """
+        if not self.__hibernated:
+            return
+
+        self.__hibernated = False
+        if self.box_console.get_visible():
+            self.run_command(self.__subsystem.enter_command)
+            self.console_initialized = True
+
     @property
     def aid(self) -> UUID:
         return self.__aid
@@ -123,16 +534,47 @@ class TabSubsystem(Gtk.Box):
     def name(self) -> str:
         return self.__subsystem.name
 
+    def __new_progress(self, toast: Adw.Toast) -> Progress:
+        """
+        Create a progress reporter showing the operation in this tab and
+        in the given toast.
+        """
+
+        def on_progress(fraction: float | None, phase: str, lines: list[str]) -> None:
+            self.revealer_progress.set_reveal_child(True)
+
+            if fraction is None:
+                self.progress_operation.pulse()
+                toast.set_title(phase)
+            else:
+                self.progress_operation.set_fraction(fraction)
+                toast.set_title("{} ({}%)".format(phase, int(fraction * 100)))
+
+            self.label_progress.set_label(lines[-1] if lines else phase)
+
+        return Progress(on_progress)
+
+    def __end_progress(self, toast: Adw.Toast) -> None:
+        toast.dismiss()
+        self.revealer_progress.set_reveal_child(False)
+        self.progress_operation.set_fraction(0)
+        self.label_progress.set_label("")
+
     def run_command(self, command: list[str]) -> None:
-        self.console.spawn_sync(
-            Vte.PtyFlags.DEFAULT,
-            None,
-            command,
-            [],
-            GLib.SpawnFlags.DO_NOT_REAP_CHILD,
-            None,
-            None,
-        )
+        if self.console is None and self.__scrollback_saved:
+            self.__restore_scrollback(lambda: self.run_command(command))
+            return
+
+        with Watchdog.track(shlex.join(command)):
+            _ok, self.__child_pid = self.__ensure_console().spawn_sync(
+                Vte.PtyFlags.DEFAULT,
+                None,
+                command,
+                [],
+                GLib.SpawnFlags.DO_NOT_REAP_CHILD,
+                None,
+                None,
+            )
 
     def __on_console_clicked(self, button: Gtk.Button) -> None:
         if self.box_console.get_visible():
@@ -147,21 +589,325 @@ class TabSubsystem(Gtk.Box):
             self.console_initialized = True
 
     def __on_reset_console_clicked(self, button: Gtk.Button) -> None:
-        self.console.reset(True, True)
+        self.__kill_child()
+        self.__ensure_console().reset(True, True)
         self.run_command(self.__subsystem.enter_command)
 
+    def __on_duplicate_clicked(self, button: Gtk.Button) -> None:
+        toast: Adw.Toast | None = None
+
+        def on_callback(
+            result: tuple[bool, Subsystem | None, Stack | None, bool] | None, *args
+        ) -> None:
+            self.__end_progress(toast)  # pyright: ignore
+            ok, subsystem, stack, created = result or (False, None, None, False)
+            if not ok or subsystem is None:
+                self.__window.toast(
+                    _("Error duplicating {} subsystem").format(self.subsystem.name)
+                )
+                return
+
+            if stack is not None and created:
+                self.__window.append_stack(stack)
+            self.__window.append_subsystem(subsystem)
+            self.__window.toast(_("{} subsystem created").format(subsystem.name))
+
+        def on_name_changed(row: Adw.EntryRow) -> None:
+            name: str = row.get_text()
+            valid: bool = bool(name) and " " not in name
+            valid = valid and not self.__window.has_subsystem(name)
+            if valid:
+                row.remove_css_class("error")
+            else:
+                row.add_css_class("error")
+            dialog.set_response_enabled("ok", valid)
+
+        def on_response(dialog: Adw.MessageDialog, response: str) -> None:
+            nonlocal toast
+            if response == "ok":
+                toast = self.__window.toast(
+                    _("Duplicating {} subsystem...").format(self.subsystem.name),
+                    timeout=0,
+                )
+                RunAsync(
+                    SubsystemCloner.clone,
+                    on_callback,
+                    source=self.__subsystem,
+                    name=row_name.get_text(),
+                    copy_home=row_copy_home.get_active(),
+                    progress=self.__new_progress(toast),
+                )
+            dialog.destroy()
+
+        row_name: Adw.EntryRow = Adw.EntryRow(title=_("Name"))
+        row_name.set_text(f"{self.subsystem.name}-copy")
+        row_copy_home: Adw.SwitchRow = Adw.SwitchRow(
+            title=_("Copy Home"),
+            subtitle=(
+                _("Copy {} instead of sharing it").format(self.__subsystem.home)
+                if self.__subsystem.home
+                else _("The subsystem uses your home, it will be shared")
+            ),
+            sensitive=bool(self.__subsystem.home),
+        )
+        group: Adw.PreferencesGroup = Adw.PreferencesGroup()
+        group.add(row_name)
+        group.add(row_copy_home)
+
+        dialog: Adw.MessageDialog = Adw.MessageDialog.new(
+            self.__window,
+            _("Duplicate the {} subsystem").format(self.subsystem.name),
+            _(
+                "The new subsystem starts from the current state of this one, "
+                "without pulling or installing anything."
+            ),
+        )
+        dialog.set_extra_child(group)
+        dialog.add_response("cancel", _("Cancel"))
+        dialog.add_response("ok", _("Duplicate"))
+        dialog.set_response_appearance("ok", Adw.ResponseAppearance.SUGGESTED)
+        row_name.connect("changed", on_name_changed)
+        on_name_changed(row_name)
+        dialog.connect("response", on_response)
+        dialog.present()
+
+    def __load_snapshots(self, *args) -> None:
+        def on_callback(snapshots: list[dict[str, Any]] | None, *args) -> None:
+            self.__show_snapshots(snapshots or [])
+
+        RunAsync(Snapshots.entries, on_callback, subsystem=self.__subsystem)
+
+    def __show_snapshots(self, snapshots: list[dict[str, Any]]) -> None:
+        self.__snapshots = snapshots
+        for row in self.__snapshot_rows:
+            self.group_snapshots.remove(row)
+        self.__snapshot_rows = []
+
+        if not snapshots:
+            self.group_snapshots.set_description(
+                _("Save the state of the subsystem to roll back to it in seconds")
+            )
+        else:
+            self.group_snapshots.set_description(
+                ngettext(
+                    "{} snapshot, {} in total",
+                    "{} snapshots, {} in total",
+                    len(snapshots),
+                ).format(
+                    len(snapshots),
+                    GLib.format_size(sum(snapshot["size"] for snapshot in snapshots)),
+                )
+            )
+        pinned: set[str] = self.__pinned_snapshots()
+        self.btn_snapshot_prune.set_sensitive(
+            len([s for s in snapshots if s["name"] not in pinned])
+            > self.__window.settings.get_int("snapshots-keep")
+        )
+
+        for snapshot in snapshots:
+            is_pinned: bool = snapshot["name"] in pinned
+            row: Adw.ActionRow = Adw.ActionRow(
+                title=time.strftime("%c", time.localtime(snapshot["created"])),
+                subtitle=(
+                    _("{}, pinned").format(GLib.format_size(snapshot["size"]))
+                    if is_pinned
+                    else GLib.format_size(snapshot["size"])
+                ),
+            )
+            btn_pin: Gtk.ToggleButton = Gtk.ToggleButton(
+                icon_name="view-pin-symbolic", active=is_pinned
+            )
+            btn_pin.set_tooltip_text(_("Keep this snapshot when pruning"))
+            btn_pin.connect("toggled", self.__on_snapshot_pin_toggled, snapshot)
+            btn_restore: Gtk.Button = Gtk.Button.new_from_icon_name(
+                "edit-undo-symbolic"
+            )
+            btn_restore.set_tooltip_text(_("Restore"))
+            btn_restore.connect("clicked", self.__on_snapshot_restore_clicked, snapshot)
+            btn_remove: Gtk.Button = Gtk.Button.new_from_icon_name(
+                "user-trash-symbolic"
+            )
+            btn_remove.set_tooltip_text(_("Remove"))
+            btn_remove.connect("clicked", self.__on_snapshot_remove_clicked, snapshot)
+            for button in [btn_pin, btn_restore, btn_remove]:
+                button.add_css_class("flat")
+                button.set_valign(Gtk.Align.CENTER)
+                row.add_suffix(button)
+
+            self.group_snapshots.add(row)
+            self.__snapshot_rows.append(row)
+
+    def __pinned_snapshots(self) -> set[str]:
+        return set(self.__window.settings.get_strv("snapshots-pinned"))
+
+    def __set_snapshot_pinned(self, image: str, pinned: bool) -> None:
+        images: set[str] = self.__pinned_snapshots()
+        if pinned:
+            images.add(image)
+        else:
+            images.discard(image)
+        self.__window.settings.set_strv("snapshots-pinned", sorted(images))
+
+    def __on_snapshot_pin_toggled(
+        self, button: Gtk.ToggleButton, snapshot: dict[str, Any]
+    ) -> None:
+        self.__set_snapshot_pinned(snapshot["name"], button.get_active())
+        self.__show_snapshots(self.__snapshots)
+
+    def __on_snapshot_take_clicked(self, button: Gtk.Button) -> None:
+        keep: int = self.__window.settings.get_int("snapshots-keep")
+        pinned: set[str] = self.__pinned_snapshots()
+        # the first snapshot, usually taken right after creating the
+        # subsystem, is the one to reset to and is never pruned
+        first: bool = not self.__snapshots
+
+        def take(progress: Progress) -> str | None:
+            image: str | None = Snapshots.take(self.__subsystem, progress)
+            if image is not None:
+                Snapshots.prune(self.__subsystem, keep, pinned | {image})
+            return image
+
+        def on_callback(image: str | None, *args) -> None:
+            self.__end_progress(toast)
+            button.set_sensitive(True)
+            if image is None:
+                self.__window.toast(
+                    _("Error taking a snapshot of {}").format(self.subsystem.name)
+                )
+                return
+
+            if first:
+                self.__set_snapshot_pinned(image, True)
+            self.__window.toast(_("Snapshot of {} saved").format(self.subsystem.name))
+            self.__load_snapshots()
+
+        button.set_sensitive(False)
+        toast: Adw.Toast = self.__window.toast(
+            _("Saving a snapshot of {}...").format(self.subsystem.name), timeout=0
+        )
+        RunAsync(take, on_callback, progress=self.__new_progress(toast))
+
+    def __on_snapshot_prune_clicked(self, button: Gtk.Button) -> None:
+        def on_callback(removed: list[str] | None, *args) -> None:
+            self.__window.toast(
+                ngettext(
+                    "{} snapshot removed", "{} snapshots removed", len(removed or [])
+                ).format(len(removed or []))
+            )
+            self.__load_snapshots()
+
+        RunAsync(
+            Snapshots.prune,
+            on_callback,
+            subsystem=self.__subsystem,
+            keep=self.__window.settings.get_int("snapshots-keep"),
+            pinned=self.__pinned_snapshots(),
+        )
+
+    def __on_snapshot_remove_clicked(
+        self, button: Gtk.Button, snapshot: dict[str, Any]
+    ) -> None:
+        def on_callback(ok: bool | None, *args) -> None:
+            if not ok:
+                self.__window.toast(
+                    _("The snapshot is in use and cannot be removed")
+                )
+            self.__load_snapshots()
+
+        button.set_sensitive(False)
+        RunAsync(Snapshots.remove, on_callback, image=snapshot["name"])
+
+    def __restore_snapshot(self, snapshot: dict[str, Any]) -> None:
+        def on_callback(result: tuple[str, Stack | None, bool] | None, *args) -> None:
+            self.__end_progress(toast)
+            status, stack, created = result or ("unchanged", None, False)
+            if stack is not None and created:
+                self.__window.append_stack(stack)
+
+            messages: dict[str, str] = {
+                "restored": _("{} subsystem restored"),
+                "unchanged": _(
+                    "Could not restore {}, the subsystem was left unchanged"
+                ),
+                "rolled-back": _(
+                    "Could not restore {}, it was recreated from its state before "
+                    "the restore"
+                ),
+                "removed": _(
+                    "Could not restore {}, it was removed and its previous state "
+                    "kept as a snapshot"
+                ),
+            }
+            self.__window.toast(messages[status].format(self.subsystem.name), 5)
+            if status == "unchanged":
+                return
+            if status == "removed":
+                self.__window.remove_subsystem(
+                    self.__aid, self.__subsystem, collect=False
+                )
+                return
+
+            self.__window.sidebar.update_subsystem(self.__subsystem)
+            self.__window.package_index.invalidate(self.__subsystem.name)
+            self.update_page(self.__subsystem)
+            self.__load_snapshots()
+
+        toast: Adw.Toast = self.__window.toast(
+            _("Restoring {} subsystem...").format(self.subsystem.name), timeout=0
+        )
+        RunAsync(
+            Snapshots.restore,
+            on_callback,
+            subsystem=self.__subsystem,
+            image=snapshot["name"],
+            progress=self.__new_progress(toast),
+        )
+
+    def __on_snapshot_restore_clicked(
+        self, button: Gtk.Button, snapshot: dict[str, Any]
+    ) -> None:
+        def on_response(dialog: Adw.MessageDialog, response: str) -> None:
+            if response == "ok":
+                self.__restore_snapshot(snapshot)
+            dialog.destroy()
+
+        dialog: Adw.MessageDialog = Adw.MessageDialog.new(
+            self.__window,
+            _("Restore the {} subsystem?").format(self.subsystem.name),
+            _(
+                "The subsystem will be recreated from the snapshot of {}. The changes made since then will be lost."
+            ).format(time.strftime("%c", time.localtime(snapshot["created"]))),
+        )
+        dialog.add_response("cancel", _("Cancel"))
+        dialog.add_response("ok", _("Restore"))
+        dialog.set_response_appearance("ok", Adw.ResponseAppearance.DESTRUCTIVE)
+        dialog.connect("response", on_response)
+        dialog.present()
+
     def __on_reset_clicked(self, button: Gtk.Button) -> None:
+        toast: Adw.Toast | None = None
+
         def on_callback(result: tuple[bool, str], *args) -> None:
+            self.__end_progress(toast)  # pyright: ignore
             status: bool = result[0]
             if status:
                 self.__window.toast(_("{} subsystem reset").format(self.subsystem.name))
 
         def on_response(dialog: Adw.MessageDialog, response: str) -> None:
-            if response == "ok":
-                self.__window.toast(
-                    _("Resetting {} subsystem...").format(self.subsystem.name)
+            nonlocal toast
+            if response == "snapshot":
+                self.__restore_snapshot(self.__snapshots[-1])
+            elif response == "ok":
+                toast = self.__window.toast(
+                    _("Resetting {} subsystem...").format(self.subsystem.name),
+                    timeout=0,
+                )
+                RunAsync(
+                    self.__subsystem.reset,
+                    on_callback,
+                    force=True,
+                    progress=self.__new_progress(toast),
                 )
-                RunAsync(self.__subsystem.reset, on_callback, force=True)
             dialog.destroy()
 
         dialog: Adw.MessageDialog = Adw.MessageDialog.new(
@@ -174,13 +920,18 @@ class TabSubsystem(Gtk.Box):
             ),
         )
         dialog.add_response("cancel", _("Cancel"))
+        if self.__snapshots:
+            dialog.add_response("snapshot", _("Restore Oldest Snapshot"))
         dialog.add_response("ok", _("Reset"))
         dialog.set_response_appearance("ok", Adw.ResponseAppearance.DESTRUCTIVE)
         dialog.connect("response", on_response)
         dialog.present()
 
     def __on_delete_clicked(self, button: Gtk.Button) -> None:
+        toast: Adw.Toast | None = None
+
         def on_callback(result: tuple[bool, str], *args) -> None:
+            self.__end_progress(toast)  # pyright: ignore
             status: bool = result[0]
             if status:
                 self.__window.toast(
@@ -189,11 +940,18 @@ class TabSubsystem(Gtk.Box):
                 self.__window.remove_subsystem(self.__aid, self.subsystem)
 
         def on_response(dialog: Adw.MessageDialog, response: str) -> None:
+            nonlocal toast
             if response == "ok":
-                self.__window.toast(
-                    _("Deleting {} subsystem...").format(self.subsystem.name)
+                toast = self.__window.toast(
+                    _("Deleting {} subsystem...").format(self.subsystem.name),
+                    timeout=0,
+                )
+                RunAsync(
+                    self.__subsystem.remove,
+                    on_callback,
+                    force=True,
+                    progress=self.__new_progress(toast),
                 )
-                RunAsync(self.__subsystem.remove, on_callback, force=True)
             dialog.destroy()
 
         dialog: Adw.MessageDialog = Adw.MessageDialog.new(
@@ -243,6 +1001,7 @@ class TabSubsystem(Gtk.Box):
 
     def __on_autoremove_clicked(self, button: Gtk.Button) -> None:
         def on_callback(result: tuple[bool, str], *args) -> None:
+            self.__end_progress(toast)
             ok, message = result
             if ok:
                 self.__window.toast(_("Autoremove successful."))
@@ -259,11 +1018,14 @@ class TabSubsystem(Gtk.Box):
         def on_response(dialog: Adw.MessageDialog, response: str) -> None:
             dialog.destroy()
 
-        RunAsync(self.subsystem.autoremove, on_callback)
-        self.__window.toast(_("Running autoremove..."))
+        toast: Adw.Toast = self.__window.toast(_("Running autoremove..."), timeout=0)
+        RunAsync(
+            self.subsystem.autoremove, on_callback, progress=self.__new_progress(toast)
+        )
 
     def __on_clean_clicked(self, button: Gtk.Button) -> None:
         def on_callback(result: tuple[bool, str], *args) -> None:
+            self.__end_progress(toast)
             ok, message = result
             if ok:
                 self.__window.toast(_("Package cache clean successful."))
@@ -280,8 +1042,10 @@ class TabSubsystem(Gtk.Box):
         def on_response(dialog: Adw.MessageDialog, response: str) -> None:
             dialog.destroy()
 
-        RunAsync(self.subsystem.clean, on_callback)
-        self.__window.toast(_("Running clean operation..."))
+        toast: Adw.Toast = self.__window.toast(_("Running clean operation..."), timeout=0)
+        RunAsync(
+            self.subsystem.clean, on_callback, progress=self.__new_progress(toast)
+        )
 
     def update_page(self, subsystem: Subsystem) -> None:
         self.__subsystem = subsystem
@@ -290,6 +1054,54 @@ class TabSubsystem(Gtk.Box):
             self.box_console.hide()
             self.btn_restart_console.hide()
             self.console_initialized = False
-            self.console.reset(True, True)
+            if self.console is not None:
+                self.__kill_child()
+                self.console.reset(True, True)
 
         self.__rebuild_ui()
+
+    def __kill_child(self) -> None:
+        if self.__child_pid is None:
+            return
+
+        try:
+            os.kill(self.__child_pid, signal.SIGHUP)
+        except ProcessLookupError:
+            pass
+        self.__child_pid = None
+
+    def teardown(self) -> None:
+        """
+        Release the console and its child process and drop the packages
+        still waiting in the queue, called by the editor when the tab is
+        closed. A batch already running is left to finish.
+        """
+        if self.__queue_source is not None:
+            GLib.source_remove(self.__queue_source)
+            self.__queue_source = None
+        if self.__queue:
+            self.__window.toast(
+                _("Pending package changes of {} cancelled").format(
+                    self.__subsystem.name
+                )
+            )
+            self.__queue.clear()
+
+        self.__kill_child()
+        if self.console is not None:
+            self.console.reset(True, True)
+            self.console.remove_controller(self.gesture_controller)
+        self.console_initialized = False
+
+        if self.__scrollback_saved:
+            self.__scrollback_saved = False
+            path: str = self.__scrollback_path
+            writing: RunAsync | None = self.__scrollback_write
+
+            def remove() -> None:
+                if writing is not None:
+                    writing.join()
+                if os.path.exists(path):
+                    os.remove(path)
+
+            RunAsync(remove)
@@ -23,7 +23,7 @@ from gettext import gettext as _
 
 from apx_gui.core.apx_entities import PkgManager, Stack
 from apx_gui.utils.gtk import GtkUtils
-from apx_gui.core.run_async import RunAsync
+from apx_gui.core.run_async import RunAsync, Progress
 
 from typing import TYPE_CHECKING
 
@@ -34,7 +34,6 @@ if TYPE_CHECKING:
 @Gtk.Template(resource_path="/org/vanillaos/apx-gui/gtk/create-stack.ui")
 class CreateStackWindow(Adw.Window):
     __gtype_name__ = "CreateStackWindow"
-    __registry__: list[str] = []
 
     __valid_name: bool = False
     __valid_base: bool = False
@@ -50,6 +49,8 @@ class CreateStackWindow(Adw.Window):
     str_pkgmanager: Gtk.StringList = Gtk.Template.Child()  # pyright: ignore
     group_packages: Adw.PreferencesGroup = Gtk.Template.Child()  # pyright: ignore
     stack_main: Adw.ViewStack = Gtk.Template.Child()  # pyright: ignore
+    status_creating: Adw.StatusPage = Gtk.Template.Child()  # pyright: ignore
+    progress_creating: Gtk.ProgressBar = Gtk.Template.Child()  # pyright: ignore
 
     def __init__(
         self,
@@ -62,6 +63,7 @@ class CreateStackWindow(Adw.Window):
         self.__window: ApxGUIWindow = window  # pyright: ignore
         self.__stacks: list[Stack] = stacks
         self.__pkgmanagers: list[PkgManager] = pkgmanagers
+        self.__packages: list[str] = []
 
         self.__build_ui()
 
@@ -98,7 +100,14 @@ class CreateStackWindow(Adw.Window):
 
             self.stack_main.set_visible_child_name("error")
 
-        def create_stack() -> tuple[bool, Stack]:
+        def on_progress(fraction: float | None, phase: str, lines: list[str]) -> None:
+            if fraction is None:
+                self.progress_creating.pulse()
+            else:
+                self.progress_creating.set_fraction(fraction)
+            self.status_creating.set_description(lines[-1] if lines else phase)
+
+        def create_stack(progress: Progress) -> tuple[bool, Stack]:
             stack: Stack = Stack(
                 self.row_name.get_text(),
                 self.row_base.get_text(),
@@ -106,11 +115,11 @@ class CreateStackWindow(Adw.Window):
                 self.__pkgmanagers[self.row_pkgmanager.get_selected()].name,
                 False,
             )
-            return stack.create()
+            return stack.create(progress)
 
         button.set_visible(False)
         self.stack_main.set_visible_child_name("creating")
-        RunAsync(create_stack, on_callback)
+        RunAsync(create_stack, on_callback, progress=Progress(on_progress))
 
     def __on_name_changed(self, entry: Adw.EntryRow) -> None:
         name: str = entry.get_text()
@@ -143,7 +152,7 @@ class CreateStackWindow(Adw.Window):
 
         self.group_packages.add(row)
 
-        self.__registry__.append(self.row_package.get_text())
+        self.__packages.append(self.row_package.get_text())
         self.row_package.set_text("")
         self.btn_add_package.set_sensitive(False)
 
@@ -151,7 +160,7 @@ class CreateStackWindow(Adw.Window):
         self, button: Gtk.Button, row: Adw.ActionRow
     ) -> None:
         self.group_packages.remove(row)
-        self.__registry__.remove(row.get_title())
+        self.__packages.remove(row.get_title())
 
     def __get_packages(self) -> str:
-        return " ".join(self.__registry__)
+        return " ".join(self.__packages)
@@ -17,12 +17,13 @@
 #
 # SPDX-License-Identifier: GPL-3.0-only
 
-from gi.repository import Gtk, Adw, Vte, Gdk  # pyright: ignore
+from gi.repository import Gtk, Adw, Vte, Gdk, GLib  # pyright: ignore
 from gettext import gettext as _
 
 from apx_gui.core.apx_entities import Subsystem, Stack
 from apx_gui.utils.gtk import GtkUtils
-from apx_gui.core.run_async import RunAsync
+from apx_gui.core.run_async import RunAsync, Progress
+from apx_gui.core.stack_baker import StackBaker
 
 from typing import TYPE_CHECKING
 
@@ -40,11 +41,16 @@ class CreateSubsystemWindow(Adw.Window):
     row_name: Adw.EntryRow = Gtk.Template.Child()  # pyright: ignore
     row_stack: Adw.ComboRow = Gtk.Template.Child()  # pyright: ignore
     row_home: Adw.EntryRow = Gtk.Template.Child()  # pyright: ignore
+    row_baked: Adw.SwitchRow = Gtk.Template.Child()  # pyright: ignore
+    row_image: Adw.ActionRow = Gtk.Template.Child()  # pyright: ignore
+    img_image: Gtk.Image = Gtk.Template.Child()  # pyright: ignore
+    btn_image_download: Gtk.Button = Gtk.Template.Child()  # pyright: ignore
     str_stack: Gtk.StringList = Gtk.Template.Child()  # pyright: ignore
     stack_main: Adw.ViewStack = Gtk.Template.Child()  # pyright: ignore
     console_button: Gtk.Box = Gtk.Template.Child()  # pyright: ignore
     console_box: Gtk.Box = Gtk.Template.Child()  # pyright: ignore
     console_output: Gtk.Box = Gtk.Template.Child()  # pyright: ignore
+    status_creating: Adw.StatusPage = Gtk.Template.Child()  # pyright: ignore
 
     def __init__(
         self,
@@ -61,6 +67,8 @@ class CreateSubsystemWindow(Adw.Window):
         self.__style_manager = self.__window.style_manager
 
         self.console_box_visible = False
+        self.__image_source: int | None = None
+        self.__closed: bool = False
 
         self.__build_ui()
         self.__on_setup_terminal_colors()
@@ -71,10 +79,14 @@ class CreateSubsystemWindow(Adw.Window):
         for stack in self.__stacks:
             self.str_stack.append(stack.name)
         self.row_stack.set_selected(0)
+        self.row_stack.connect("notify::selected", self.__on_stack_selected)
+        self.__on_stack_selected(self.row_stack)
+        self.connect("close-request", self.__on_close_request)
 
         self.btn_cancel.connect("clicked", self.__on_cancel_clicked)
         self.btn_close.connect("clicked", self.__on_cancel_clicked)
         self.btn_create.connect("clicked", self.__on_create_clicked)
+        self.btn_image_download.connect("clicked", self.__on_image_download_clicked)
         self.console_button.connect("clicked", self.__on_console_button)
         self.row_name.connect("changed", self.__on_name_changed)
         self.row_home.connect("changed", self.__on_home_changed)
@@ -144,15 +156,133 @@ class CreateSubsystemWindow(Adw.Window):
         self.maximize()
         self.unmaximize()
 
+    def __on_stack_selected(self, row: Adw.ComboRow, *args) -> None:
+        if not self.__stacks:
+            return
+
+        stack: Stack = self.__stacks[row.get_selected()]
+        bakeable: bool = bool(stack.package_names) and not StackBaker.is_baked(stack)
+        self.row_baked.set_sensitive(bakeable)
+        if not bakeable:
+            self.row_baked.set_active(False)
+
+        self.row_image.set_subtitle(stack.base)
+        self.__watch_image(stack.base)
+
+    def __on_image_download_clicked(self, button: Gtk.Button) -> None:
+        image: str = self.__stacks[self.row_stack.get_selected()].base
+        self.__window.prefetcher.queue([image], urgent=True)
+        self.__watch_image(image)
+
+    def __watch_image(self, image: str) -> None:
+        """
+        Show the state of `image`, replacing the poll of the previously
+        selected one.
+        """
+        if self.__image_source is not None:
+            GLib.source_remove(self.__image_source)
+            self.__image_source = None
+        self.__poll_image(image)
+
+    def __on_image_timeout(self, image: str) -> bool:
+        self.__image_source = None
+        self.__poll_image(image)
+        return False
+
+    def __poll_image(self, image: str) -> None:
+        """
+        Show whether the base image is already local, polling while the
+        prefetcher is pulling it. Selecting a stack only reads the state,
+        the image is pulled ahead only when asked with the download button.
+        """
+
+        def on_callback(result: tuple[str, str] | None, *args) -> None:
+            state, detail = result or ("missing", "")
+            if (
+                self.__closed
+                or self.__stacks[self.row_stack.get_selected()].base != image
+            ):
+                return
+
+            icons: dict[str, str] = {
+                "local": "emblem-ok-symbolic",
+                "pulling": "folder-download-symbolic",
+                "queued": "folder-download-symbolic",
+            }
+            labels: dict[str, str] = {
+                "local": _("Ready, nothing to download"),
+                "pulling": _("Downloading in the background"),
+                "queued": _("Waiting to download in the background"),
+            }
+            self.img_image.set_from_icon_name(
+                icons.get(state, "dialog-warning-symbolic")
+            )
+            self.btn_image_download.set_visible(
+                state not in ("local", "pulling", "queued")
+            )
+            summary: str = labels.get(state, _("Will be downloaded when creating"))
+            self.row_image.set_subtitle(
+                f"{image}\n{summary}" + (f": {detail}" if detail else "")
+            )
+
+            if state in ("pulling", "queued") and self.__image_source is None:
+                self.__image_source = GLib.timeout_add(
+                    1000, self.__on_image_timeout, image
+                )
+
+        RunAsync(self.__window.prefetcher.state, on_callback, image=image)
+
+    def __on_close_request(self, *args) -> bool:
+        self.__closed = True
+        if self.__image_source is not None:
+            GLib.source_remove(self.__image_source)
+            self.__image_source = None
+        return False
+
     def __on_create_clicked(self, button: Gtk.Button) -> None:
         button.set_visible(False)
         self.stack_main.set_visible_child_name("creating")
         self.set_default_size(540, 250)
 
+        stack: Stack = self.__stacks[self.row_stack.get_selected()]
+        if self.row_baked.get_active():
+            self.__bake(stack)
+            return
+
+        self.__create(stack)
+
+    def __bake(self, stack: Stack) -> None:
+        def on_progress(fraction: float | None, phase: str, lines: list[str]) -> None:
+            self.status_creating.set_description(phase)
+
+        def on_callback(
+            result: tuple[bool, Stack | None, bool] | None, error, *args
+        ) -> None:
+            ok, baked, created = result or (False, None, False)
+            if not ok or baked is None:
+                self.stack_main.set_visible_child_name("error")
+                return
+
+            if created:
+                self.__window.append_stack(baked)
+            self.status_creating.set_description(
+                _("Please wait while the subsystem is being created")
+            )
+            self.__create(baked)
+
+        RunAsync(
+            StackBaker.bake,
+            on_callback,
+            stack=stack,
+            stacks=list(self.__stacks),
+            progress=Progress(on_progress),
+        )
+
+    def __create(self, stack: Stack) -> None:
         subsystem: Subsystem = Subsystem(
             "",
             self.row_name.get_text(),
-            self.__stacks[self.row_stack.get_selected()],
+            stack,
             self.row_home.get_text(),
             "",
             [],
@@ -17,21 +17,32 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-import yaml
-from typing import Any
+from typing import Any, Callable
 from uuid import UUID
 from gi.repository import Gtk, Adw, GLib, Gio  # pyright: ignore
-from gettext import gettext as _
+from gettext import gettext as _, ngettext
 
 from apx_gui.core.apx import Apx
 from apx_gui.core.apx_entities import Subsystem, Stack, PkgManager
+from apx_gui.core.importer import Importer, ImportResult
+from apx_gui.core.exporter import Exporter
 from apx_gui.core.monitor import Monitor
-from apx_gui.core.run_async import RunAsync
+from apx_gui.core.package_index import PackageIndex
+from apx_gui.core.package_info import PackageInfoCache
+from apx_gui.core.prefetcher import ImagePrefetcher
+from apx_gui.core.run_async import RunAsync, Progress
+from apx_gui.core.stack_baker import StackBaker
+from apx_gui.core.snapshots import Snapshots
+from apx_gui.core.subsystem_cloner import SubsystemCloner
+from apx_gui.core.task_pool import TaskPool
+from apx_gui.widgets.debug_overlay import DebugOverlay
 from apx_gui.widgets.editor import Editor
 from apx_gui.widgets.sidebar import Sidebar
 from apx_gui.windows.create_subsystem import CreateSubsystemWindow
 from apx_gui.windows.create_stack import CreateStackWindow
 from apx_gui.windows.create_pkgmanager import CreatePkgManagerWindow
+from apx_gui.windows.upgrade_subsystems import UpgradeSubsystemsWindow
+from apx_gui.windows.search_packages import SearchPackagesWindow
 
 
 @Gtk.Template(resource_path="/org/vanillaos/apx-gui/gtk/window-main.ui")
@@ -39,6 +50,7 @@ class ApxGUIWindow(Adw.ApplicationWindow):
     __gtype_name__: str = "ApxGUIWindow"
 
     toasts: Adw.ToastOverlay = Gtk.Template.Child()  # pyright: ignore
+    overlay_main: Gtk.Overlay = Gtk.Template.Child()  # pyright: ignore
     paned_main: Adw.OverlaySplitView = Gtk.Template.Child()  # pyright: ignore
     content: Adw.Bin = Gtk.Template.Child()  # pyright: ignore
     tab_bar: Adw.TabBar = Gtk.Template.Child()  # pyright: ignore
@@ -48,11 +60,31 @@ class ApxGUIWindow(Adw.ApplicationWindow):
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
 
+        self.settings: Gio.Settings = Gio.Settings.new("org.vanillaos.ApxGUI")
+        self.debug_overlay: DebugOverlay | None = None
         self.__apx: Apx = Apx()
         self.__subsystems: list[Subsystem] = self.__apx.subsystems_list()
         self.__stacks: list[Stack] = self.__apx.stacks_list()
         self.__pkgmanagers: list[PkgManager] = self.__apx.pkgmanagers_list()
 
+        self.package_index: PackageIndex = PackageIndex()
+        self.refresh_package_index(
+            load=True, callback=lambda *args: self.editor.update_drift()
+        )
+        self.package_info: PackageInfoCache = PackageInfoCache()
+        RunAsync(self.package_info.load)
+
+        self.prefetcher: ImagePrefetcher = ImagePrefetcher(
+            self.settings.get_int("prefetch-budget") * 1024 * 1024
+        )
+        self.prefetcher.queue(
+            ImagePrefetcher.recent_bases(
+                self.__stacks,
+                self.__subsystems,
+                self.settings.get_value("subsystems-last-used").unpack(),
+            )
+        )
+
         GLib.timeout_add_seconds(2, self.__read_changes)
 
         self.__build_ui()
@@ -66,27 +98,206 @@ class ApxGUIWindow(Adw.ApplicationWindow):
             self, self.__subsystems, self.__stacks, self.__pkgmanagers
         )
         self.paned_main.set_sidebar(self.sidebar)
+        self.connect("close-request", self.__on_close_request)
+
+    def __on_close_request(self, window: Adw.ApplicationWindow) -> bool:
+        self.package_info.flush()
+        return False
 
     def __read_changes(self) -> bool:
         def callback(events: list[dict[str, Any]], exception: Exception):
             try:
+                containers: dict[str, Subsystem] = {
+                    "apx-" + subsystem.name: subsystem
+                    for subsystem in self.__subsystems
+                }
                 for event in events:
-                    for subsystem in self.__subsystems:
-                        if event["Actor"]["Attributes"]["name"] == "apx-" + subsystem.name:
-                            if event["status"] == "start":
-                                subsystem.status = "Up"
-                            elif event["status"] == "died":
-                                subsystem.status = "Exited"
-
-                            self.sidebar.update_subsystem(subsystem)
-                            self.editor.update_subsystem_tab(subsystem)
-                            break
+                    subsystem = containers.get(event["Actor"]["Attributes"]["name"])
+                    if subsystem is None:
+                        continue
+
+                    if event["status"] == "start":
+                        subsystem.status = "Up"
+                    elif event["status"] == "died":
+                        subsystem.status = "Exited"
+
+                    self.sidebar.update_subsystem(subsystem)
+                    self.editor.update_subsystem_tab(subsystem)
             except TypeError:
                 print("No new events queue.  Skipping UI refresh...")
 
         RunAsync(Monitor.read, callback)
         return True
 
+    def run_bulk(
+        self, operation: str, subsystems: list[Subsystem], confirmed: bool = False
+    ) -> None:
+        """
+        Run `operation` (start, stop, clean or autoremove) on every
+        subsystem in parallel, reporting a single progress and result.
+        Stopping asks for confirmation first, unless `confirmed`, as it
+        ends whatever runs in the subsystems.
+        """
+        if operation == "stop" and not confirmed:
+
+            def on_response(dialog: Adw.MessageDialog, response: str) -> None:
+                if response == "ok":
+                    self.run_bulk(operation, subsystems, confirmed=True)
+                dialog.destroy()
+
+            dialog: Adw.MessageDialog = Adw.MessageDialog.new(
+                self,
+                ngettext(
+                    "Stop {} subsystem?", "Stop {} subsystems?", len(subsystems)
+                ).format(len(subsystems)),
+                _("Programs running in {} will be terminated.").format(
+                    ", ".join(subsystem.name for subsystem in subsystems)
+                ),
+            )
+            dialog.add_response("cancel", _("Cancel"))
+            dialog.add_response("ok", _("Stop"))
+            dialog.set_response_appearance("ok", Adw.ResponseAppearance.DESTRUCTIVE)
+            dialog.connect("response", on_response)
+            dialog.present()
+            return
+
+        labels: dict[str, str] = {
+            "start": _("Starting {} subsystems..."),
+            "stop": _("Stopping {} subsystems..."),
+            "clean": _("Cleaning the package cache of {} subsystems..."),
+            "autoremove": _("Running autoremove on {} subsystems..."),
+        }
+        title: str = labels[operation].format(len(subsystems))
+        toast: Adw.Toast = self.toast(title, timeout=0)
+
+        def on_progress(fraction: float | None, phase: str, lines: list[str]) -> None:
+            toast.set_title("{} ({})".format(title, phase))
+
+        def on_callback(
+            results: list[tuple[str, Any, Exception | None, float]] | None, *args
+        ) -> None:
+            toast.dismiss()
+            results = results or []
+            if not results:
+                self.toast(_("The operation could not be run"))
+                return
+
+            failures: list[str] = []
+            for name, result, error, _duration in results:
+                if error is not None:
+                    failures.append(f"{name}: {error}")
+                elif not result[0]:
+                    failures.append(f"{name}: {result[1].strip()}")
+
+            succeeded: int = len(results) - len(failures)
+            if not failures:
+                self.toast(
+                    ngettext(
+                        "{} subsystem done", "{} subsystems done", succeeded
+                    ).format(succeeded)
+                )
+                return
+
+            dialog: Adw.MessageDialog = Adw.MessageDialog.new(
+                self,
+                _("{} of {} subsystems failed").format(len(failures), len(results)),
+                "\n\n".join(failures),
+            )
+            dialog.add_response("ok", _("Ok"))
+            dialog.connect("response", lambda dialog, *args: dialog.destroy())
+            dialog.present()
+
+        pool: TaskPool = TaskPool(self.settings.get_int("max-parallel-tasks"))
+        RunAsync(
+            pool.run,
+            on_callback,
+            tasks=[
+                (subsystem.name, getattr(subsystem, operation))
+                for subsystem in subsystems
+            ],
+            progress=Progress(on_progress),
+        )
+
+    def toggle_debug_overlay(self) -> None:
+        if self.debug_overlay is None:
+            self.debug_overlay = DebugOverlay(
+                self, self.get_application().watchdog  # pyright: ignore
+            )
+            self.debug_overlay.set_visible(False)
+            self.overlay_main.add_overlay(self.debug_overlay)
+
+        if self.debug_overlay.recording:
+            self.debug_overlay.stop()
+            self.debug_overlay.set_visible(False)
+        else:
+            self.debug_overlay.set_visible(True)
+            self.debug_overlay.start()
+
+    def refresh_package_index(
+        self, load: bool = False, callback: Callable | None = None
+    ) -> None:
+        """
+        Update the installed packages index in the background, only the
+        subsystems whose package database changed are listed again.
+        """
+
+        def refresh() -> list[str]:
+            if load:
+                self.package_index.load()
+            return self.package_index.refresh_all(
+                list(self.__subsystems),
+                list(self.__pkgmanagers),
+                self.settings.get_int("max-parallel-tasks"),
+            )
+
+        RunAsync(refresh, callback)
+
+    def refresh_subsystem_packages(
+        self, subsystem: Subsystem, callback: Callable | None = None
+    ) -> None:
+        """
+        List the packages of `subsystem` again in the background, even if
+        it is stopped or its package database looks unchanged.
+        """
+        pkgmanager: PkgManager | None = next(
+            (
+                pkgmanager
+                for pkgmanager in self.__pkgmanagers
+                if pkgmanager.name == subsystem.stack.pkg_manager
+            ),
+            None,
+        )
+        if pkgmanager is None:
+            if callback is not None:
+                callback(False, None)
+            return
+
+        RunAsync(
+            self.package_index.refresh,
+            callback,
+            subsystem=subsystem,
+            pkgmanager=pkgmanager,
+            force=True,
+        )
+
+    def subsystem_for_stack(self, stack: Stack) -> Subsystem | None:
+        """
+        A subsystem to run package manager commands for `stack` in, running
+        ones first, falling back to any subsystem with the same base and
+        package manager.
+        """
+        candidates: list[Subsystem] = [
+            subsystem
+            for subsystem in self.__subsystems
+            if subsystem.stack.name == stack.name
+            or (
+                subsystem.stack.base == stack.base
+                and subsystem.stack.pkg_manager == stack.pkg_manager
+            )
+        ]
+        candidates.sort(key=lambda s: (not s.running, s.stack.name != stack.name))
+        return candidates[0] if candidates else None
+
     def toast(self, message: str, timeout: int = 2) -> Adw.Toast:
         toast: Adw.Toast = Adw.Toast.new(message)
         toast.props.timeout = timeout
@@ -100,21 +311,65 @@ class ApxGUIWindow(Adw.ApplicationWindow):
     def append_stack(self, stack: Stack) -> None:
         self.__stacks.append(stack)
         self.sidebar.new_stack(stack)
+        self.prefetcher.queue([stack.base], urgent=True)
 
     def append_pkgmanager(self, pkgmanager: PkgManager) -> None:
         self.__pkgmanagers.append(pkgmanager)
         self.sidebar.new_pkgmanager(pkgmanager)
 
-    def remove_subsystem(self, aid: UUID, subsystem: Subsystem) -> None:
+    def remove_subsystem(
+        self, aid: UUID, subsystem: Subsystem, collect: bool = True
+    ) -> None:
+        """
+        Forget a removed subsystem. Unless `collect` is unset, its clone
+        stack and its snapshots are removed too.
+        """
         self.editor.close(aid)
         self.sidebar.remove_subsystem(aid)
         self.__subsystems.remove(subsystem)
+        if not collect:
+            return
+
+        repository: str = f"{Snapshots.repository(subsystem)}:"
+        self.settings.set_strv(
+            "snapshots-pinned",
+            [
+                image
+                for image in self.settings.get_strv("snapshots-pinned")
+                if not image.startswith(repository)
+            ],
+        )
+
+        def collect_stacks(subsystems: list[Subsystem]) -> list[str]:
+            stacks: list[Stack | None] = [
+                SubsystemCloner.collect(subsystem, subsystems),
+                Snapshots.collect(subsystem),
+            ]
+            return [stack.name for stack in stacks if stack is not None]
+
+        def on_callback(names: list[str] | None, *args) -> None:
+            for known in list(self.__stacks):
+                if known.name in (names or []):
+                    self.remove_stack(known.aid, known)
+
+        RunAsync(collect_stacks, on_callback, subsystems=list(self.__subsystems))
+
+    def has_subsystem(self, name: str) -> bool:
+        return any(subsystem.name == name for subsystem in self.__subsystems)
 
     def remove_stack(self, aid: UUID, stack: Stack) -> None:
         self.editor.close(aid)
         self.sidebar.remove_stack(aid)
         self.__stacks.remove(stack)
 
+        def on_callback(baked: Stack | None, *args) -> None:
+            if baked is not None and baked in self.__stacks:
+                self.remove_stack(baked.aid, baked)
+
+        RunAsync(
+            StackBaker.collect, on_callback, stack=stack, stacks=list(self.__stacks)
+        )
+
     def remove_pkgmanager(self, aid: UUID, pkgmanager: PkgManager) -> None:
         self.editor.close(aid)
         self.sidebar.remove_pkgmanager(aid)
@@ -138,74 +393,158 @@ class ApxGUIWindow(Adw.ApplicationWindow):
         )
         window.show()
 
+    def upgrade_subsystems(self, subsystems: list[Subsystem] | None = None) -> None:
+        if subsystems is None:
+            subsystems = list(self.__subsystems)
+        if not subsystems:
+            self.toast(_("No subsystems to upgrade"))
+            return
+
+        window: UpgradeSubsystemsWindow = UpgradeSubsystemsWindow(self, subsystems)
+        window.show()
+
+    def search_packages(self, subsystems: list[Subsystem] | None = None) -> None:
+        if subsystems is None:
+            subsystems = list(self.__subsystems)
+        if not subsystems:
+            self.toast(_("No subsystems to search in"))
+            return
+
+        window: SearchPackagesWindow = SearchPackagesWindow(
+            self, subsystems, self.__pkgmanagers
+        )
+        window.show()
+        self.refresh_package_index()
+
     def import_file(self) -> None:
         file_picker = Gtk.FileDialog()
         file_filters = Gio.ListStore.new(Gtk.FileFilter)
 
         yaml_filter = Gtk.FileFilter()
-        yaml_filter.add_pattern("*.yml")
-        yaml_filter.add_pattern("*.yaml")
+        for extension in Importer.extensions:
+            yaml_filter.add_pattern(f"*{extension}")
 
         yaml_filter.set_name(_("YAML Files"))
         file_filters.append(yaml_filter)
 
-        file_picker.set_title("Import a YAML File")
+        file_picker.set_title(_("Import YAML Files"))
         file_picker.set_filters(file_filters)
-        file_picker.open(parent=self, cancellable=None, callback=self.open_file_callback)
+        file_picker.open_multiple(
+            parent=self, cancellable=None, callback=self.open_files_callback
+        )
 
-    def open_file_callback(self, filedialog, task):
+    def import_folder(self) -> None:
+        folder_picker = Gtk.FileDialog()
+        folder_picker.set_title(_("Import a Folder of YAML Files"))
+        folder_picker.select_folder(
+            parent=self, cancellable=None, callback=self.open_folder_callback
+        )
+
+    def export_all(self) -> None:
+        file_picker = Gtk.FileDialog()
+        file_picker.set_title(_("Export Stacks and Package Managers"))
+        file_picker.set_initial_name("apx-export.yml")
+        file_picker.save(
+            parent=self, cancellable=None, callback=self.save_file_callback
+        )
+
+    def save_file_callback(self, filedialog, task):
         try:
-            file = filedialog.open_finish(task)
-            with open(file.get_path()) as imported_file:
-                contents = yaml.load(imported_file, Loader=yaml.SafeLoader)
-
-                try:
-                    entity: PkgManager = PkgManager(
-                        contents["name"],
-                        contents["needsudo"],
-                        contents["cmdautoremove"],
-                        contents["cmdclean"],
-                        contents["cmdinstall"],
-                        contents["cmdlist"],
-                        contents["cmdpurge"],
-                        contents["cmdremove"],
-                        contents["cmdsearch"],
-                        contents["cmdshow"],
-                        contents["cmdupdate"],
-                        contents["cmdupgrade"],
-                        False,
-                    )
-                    result = entity.create()
-                    if result[0]:
-                        self.append_pkgmanager(result[1])
-                        self.toast(_("Package manager {} created successfully").format(entity.name))
-                        return
-                except KeyError:
-                    print("Package manager not detected in import.")
-                except Exception as e:
-                    print(e)
-
-                try:
-                    for pkgmanager in self.__pkgmanagers:
-                        if pkgmanager.name == contents["pkgmanager"]:
-                            entity: Stack = Stack(
-                                contents["name"],
-                                contents["base"],
-                                contents["packages"],
-                                contents["pkgmanager"],
-                                False,
-                            )
-                            result = entity.create()
-                            if result[0]:
-                                self.append_stack(result[1])
-                                self.toast(_("Stack {} created successfully").format(stack.name))
-                                return
-                except KeyError:
-                    print("Stack not detected in import.")
-                except Exception as e:
-                    print(e)
+            file: Gio.File = filedialog.save_finish(task)
+        except GLib.GError:
+            return
 
+        toast: Adw.Toast = self.toast(_("Exporting..."), timeout=0)
+
+        def on_progress(fraction: float | None, phase: str, lines: list[str]) -> None:
+            toast.set_title(phase)
+
+        def on_callback(result: int | None, error, *args) -> None:
+            toast.dismiss()
+            if result is None:
+                self.toast(_("Export failed."))
+                return
+
+            self.toast(
+                ngettext(
+                    "{} definition exported", "{} definitions exported", result
+                ).format(result)
+            )
+
+        RunAsync(
+            Exporter.write,
+            on_callback,
+            path=file.get_path(),
+            entities=[*self.__pkgmanagers, *self.__stacks],
+            progress=Progress(on_progress),
+        )
+
+    def open_files_callback(self, filedialog, task):
+        try:
+            files: Gio.ListModel = filedialog.open_multiple_finish(task)
+        except GLib.GError:
+            return
+
+        self.__import([file.get_path() for file in files])  # pyright: ignore
+
+    def open_folder_callback(self, filedialog, task):
+        try:
+            folder: Gio.File = filedialog.select_folder_finish(task)
         except GLib.GError:
             return
-        
-        self.toast(_("File import failed."))
+
+        self.__import([folder.get_path()])  # pyright: ignore
+
+    def __import(self, paths: list[str]) -> None:
+        toast: Adw.Toast = self.toast(_("Importing..."), timeout=0)
+
+        def on_progress(fraction: float | None, phase: str, lines: list[str]) -> None:
+            toast.set_title(_("Importing... ({})").format(phase))
+
+        def on_callback(results: list[ImportResult] | None, error, *args) -> None:
+            toast.dismiss()
+            if results is None:
+                self.toast(_("File import failed."))
+                return
+            if not results:
+                self.toast(_("No YAML files found."))
+                return
+
+            report: list[str] = []
+            for result in results:
+                if not result.ok:
+                    report.append(
+                        f"✗ {result.source} {result.name}: {result.message}"
+                    )
+                    continue
+
+                report.append(f"✓ {result.source} {result.name}")
+                if isinstance(result.entity, PkgManager):
+                    self.append_pkgmanager(result.entity)
+                elif isinstance(result.entity, Stack):
+                    self.append_stack(result.entity)
+
+            imported: int = sum(1 for result in results if result.ok)
+            if imported == len(results):
+                self.toast(
+                    ngettext(
+                        "{} definition imported", "{} definitions imported", imported
+                    ).format(imported)
+                )
+                return
+
+            dialog: Adw.MessageDialog = Adw.MessageDialog.new(
+                self,
+                _("{} of {} definitions imported").format(imported, len(results)),
+                "\n".join(report),
+            )
+            dialog.add_response("ok", _("Ok"))
+            dialog.connect("response", lambda dialog, *args: dialog.destroy())
+            dialog.present()
+
+        importer: Importer = Importer(
+            {pkgmanager.name for pkgmanager in self.__pkgmanagers},
+            {stack.name for stack in self.__stacks},
+            self.settings.get_int("max-parallel-tasks"),
+        )
+        RunAsync(importer.run, on_callback, paths=paths, progress=Progress(on_progress))
@@ -0,0 +1,193 @@
+# search_packages.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from gi.repository import Gtk, Gio, GLib, Adw
+
+from gettext import gettext as _
+
+from apx_gui.core.apx_entities import Subsystem, PkgManager
+from apx_gui.core.apx_objects import PackageObject
+from apx_gui.core.run_async import RunAsync
+from apx_gui.core.task_pool import TaskPool
+from apx_gui.widgets.entry_package import EntryPackage
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from apx_gui.windows.main_window import ApxGUIWindow
+
+
+@Gtk.Template(resource_path="/org/vanillaos/apx-gui/gtk/search-packages.ui")
+class SearchPackagesWindow(Adw.Window):
+    __gtype_name__ = "SearchPackagesWindow"
+
+    entry_query: Gtk.SearchEntry = Gtk.Template.Child()  # pyright: ignore
+    list_packages: Gtk.ListView = Gtk.Template.Child()  # pyright: ignore
+    label_status: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+
+    def __init__(
+        self,
+        window: Adw.ApplicationWindow,
+        subsystems: list[Subsystem],
+        pkgmanagers: list[PkgManager],
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.__window: ApxGUIWindow = window  # pyright: ignore
+        self.__subsystems: list[Subsystem] = subsystems
+        self.__pkgmanagers: dict[str, PkgManager] = {
+            pkgmanager.name: pkgmanager for pkgmanager in pkgmanagers
+        }
+
+        self.__store: Gio.ListStore = Gio.ListStore.new(PackageObject)
+        self.__packages: dict[str, PackageObject] = {}
+        self.__generation: int = 0
+        self.__answered: int = 0
+        self.__failed: list[str] = []
+
+        self.__build_ui()
+
+    def __build_ui(self) -> None:
+        self.set_transient_for(self.__window)
+
+        def on_setup(factory: Gtk.SignalListItemFactory, item: Gtk.ListItem) -> None:
+            item.set_child(EntryPackage())
+
+        def on_bind(factory: Gtk.SignalListItemFactory, item: Gtk.ListItem) -> None:
+            item.get_child().bind(item.get_item())  # pyright: ignore
+
+        def on_unbind(factory: Gtk.SignalListItemFactory, item: Gtk.ListItem) -> None:
+            item.get_child().unbind()  # pyright: ignore
+
+        factory: Gtk.SignalListItemFactory = Gtk.SignalListItemFactory()
+        factory.connect("setup", on_setup)
+        factory.connect("bind", on_bind)
+        factory.connect("unbind", on_unbind)
+
+        sorter: Gtk.StringSorter = Gtk.StringSorter.new(
+            Gtk.PropertyExpression.new(PackageObject, None, "name")
+        )
+        self.list_packages.set_factory(factory)
+        self.list_packages.set_model(
+            Gtk.NoSelection.new(Gtk.SortListModel.new(self.__store, sorter))
+        )
+
+        self.entry_query.connect("activate", self.__on_query_activate)
+        self.label_status.set_label(
+            _("Press Enter to search in {} subsystems").format(len(self.__subsystems))
+        )
+
+    def __on_query_activate(self, entry: Gtk.SearchEntry) -> None:
+        query: str = entry.get_text().strip()
+        if query:
+            self.__search(query)
+
+    def __search(self, query: str) -> None:
+        """
+        Run the search in every subsystem in parallel. Each subsystem
+        sends its results to the main loop as soon as it is done, results
+        of a previous search still running are dropped.
+        """
+        self.__generation += 1
+        generation: int = self.__generation
+        timeout: int = self.__window.settings.get_int("search-timeout")
+
+        self.__store.remove_all()
+        self.__packages.clear()
+        self.__answered = 0
+        self.__failed = []
+
+        # installed packages are known right away from the package index
+        names: set[str] = {subsystem.name for subsystem in self.__subsystems}
+        for name, owners in self.__window.package_index.match(query).items():
+            if owners & names:
+                item: PackageObject = PackageObject(name, "")
+                item.set_installed(owners & names)
+                self.__packages[name] = item
+        self.__store.splice(0, 0, list(self.__packages.values()))
+        self.__update_status()
+
+        def search(subsystem: Subsystem) -> None:
+            # always answer, so a failing subsystem is reported instead of
+            # leaving the search pending
+            ok: bool = False
+            results: list[tuple[str, str]] = []
+            try:
+                pkgmanager: PkgManager | None = self.__pkgmanagers.get(
+                    subsystem.stack.pkg_manager
+                )
+                if pkgmanager is None:
+                    return
+
+                ok, output = subsystem.search(query, timeout)
+                if ok:
+                    results = pkgmanager.parse_search_output(output)
+            finally:
+                GLib.idle_add(
+                    self.__on_results, generation, subsystem.name, ok, results
+                )
+
+        pool: TaskPool = TaskPool(self.__window.settings.get_int("max-parallel-tasks"))
+        RunAsync(
+            pool.run,
+            None,
+            tasks=[
+                (subsystem.name, lambda s=subsystem: search(s))
+                for subsystem in self.__subsystems
+            ],
+        )
+
+    def __on_results(
+        self,
+        generation: int,
+        subsystem: str,
+        ok: bool,
+        results: list[tuple[str, str]],
+    ) -> bool:
+        if generation != self.__generation:
+            return False
+
+        self.__answered += 1
+        if not ok:
+            self.__failed.append(subsystem)
+
+        new: list[PackageObject] = []
+        for name, summary in results:
+            item: PackageObject | None = self.__packages.get(name)
+            if item is not None:
+                item.add_subsystem(subsystem, summary)
+                continue
+
+            item = self.__packages[name] = PackageObject(name, summary, subsystem)
+            item.set_installed(self.__window.package_index.find(name))
+            new.append(item)
+
+        self.__store.splice(self.__store.get_n_items(), 0, new)
+        self.__update_status()
+        return False
+
+    def __update_status(self) -> None:
+        status: str = _("{} packages, {} of {} subsystems answered").format(
+            len(self.__packages), self.__answered, len(self.__subsystems)
+        )
+        if self.__failed:
+            status += " " + _("(failed or timed out: {})").format(
+                ", ".join(self.__failed)
+            )
+        self.label_status.set_label(status)
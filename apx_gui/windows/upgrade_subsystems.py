@@ -0,0 +1,179 @@
+# upgrade_subsystems.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from gi.repository import Gtk, Adw
+
+import time
+from gettext import gettext as _, ngettext
+from typing import Any
+
+from apx_gui.core.apx_entities import Subsystem
+from apx_gui.core.run_async import RunAsync, Progress
+from apx_gui.core.task_pool import TaskPool
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from apx_gui.windows.main_window import ApxGUIWindow
+
+
+@Gtk.Template(resource_path="/org/vanillaos/apx-gui/gtk/upgrade-subsystems.ui")
+class UpgradeSubsystemsWindow(Adw.Window):
+    __gtype_name__ = "UpgradeSubsystemsWindow"
+
+    label_summary: Gtk.Label = Gtk.Template.Child()  # pyright: ignore
+    progress_upgrade: Gtk.ProgressBar = Gtk.Template.Child()  # pyright: ignore
+    group_subsystems: Adw.PreferencesGroup = Gtk.Template.Child()  # pyright: ignore
+
+    max_log_lines: int = 2000
+
+    def __init__(
+        self,
+        window: Adw.ApplicationWindow,
+        subsystems: list[Subsystem],
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.__window: ApxGUIWindow = window  # pyright: ignore
+        self.__subsystems: list[Subsystem] = subsystems
+        self.__rows: dict[str, Adw.ExpanderRow] = {}
+        self.__icons: dict[str, Gtk.Image] = {}
+        self.__logs: dict[str, Gtk.TextBuffer] = {}
+        self.__progresses: dict[str, Progress] = {}
+        self.__started: float = 0.0
+
+        self.__build_ui()
+        self.__start()
+
+    def __build_ui(self) -> None:
+        self.set_transient_for(self.__window)
+        self.label_summary.set_label(
+            _("Upgrading {} subsystems...").format(len(self.__subsystems))
+        )
+
+        for subsystem in self.__subsystems:
+            icon: Gtk.Image = Gtk.Image.new_from_icon_name("content-loading-symbolic")
+            row: Adw.ExpanderRow = Adw.ExpanderRow(
+                title=subsystem.name, subtitle=_("Queued")
+            )
+            row.add_prefix(icon)
+
+            view: Gtk.TextView = Gtk.TextView(
+                editable=False, cursor_visible=False, monospace=True
+            )
+            view.set_wrap_mode(Gtk.WrapMode.WORD_CHAR)
+            scrolled: Gtk.ScrolledWindow = Gtk.ScrolledWindow(
+                child=view, min_content_height=200
+            )
+            row.add_row(scrolled)
+            self.group_subsystems.add(row)
+
+            self.__rows[subsystem.name] = row
+            self.__icons[subsystem.name] = icon
+            self.__logs[subsystem.name] = view.get_buffer()
+            self.__progresses[subsystem.name] = self.__new_log_progress(
+                subsystem.name
+            )
+
+    def __new_log_progress(self, name: str) -> Progress:
+        def on_progress(fraction: float | None, phase: str, lines: list[str]) -> None:
+            self.__on_log(name, phase, lines)
+
+        return Progress(on_progress)
+
+    def __on_log(self, name: str, phase: str, lines: list[str]) -> None:
+        self.__rows[name].set_subtitle(phase)
+
+        buffer: Gtk.TextBuffer = self.__logs[name]
+        if lines:
+            buffer.insert(buffer.get_end_iter(), "\n".join(lines) + "\n")
+
+        extra: int = buffer.get_line_count() - self.max_log_lines
+        if extra > 0:
+            buffer.delete(
+                buffer.get_start_iter(), buffer.get_iter_at_line(extra)[1]
+            )
+
+    def __upgrade(self, subsystem: Subsystem) -> tuple[bool, str]:
+        progress: Progress = self.__progresses[subsystem.name]
+        ok, output = subsystem.update_packages(progress)
+        if not ok:
+            return ok, output
+        self.__window.package_info.invalidate(
+            subsystem.stack.pkg_manager, subsystem.stack.base
+        )
+        return subsystem.upgrade_packages(progress)
+
+    def __start(self) -> None:
+        def on_progress(fraction: float | None, phase: str, lines: list[str]) -> None:
+            if fraction is not None:
+                self.progress_upgrade.set_fraction(fraction)
+            self.progress_upgrade.set_text(phase)
+
+        self.__started = time.monotonic()
+        self.progress_upgrade.set_show_text(True)
+        pool: TaskPool = TaskPool(self.__window.settings.get_int("max-parallel-tasks"))
+        RunAsync(
+            pool.run,
+            self.__on_done,
+            tasks=[
+                (subsystem.name, lambda s=subsystem: self.__upgrade(s))
+                for subsystem in self.__subsystems
+            ],
+            groups=[subsystem.stack.pkg_manager for subsystem in self.__subsystems],
+            progress=Progress(on_progress),
+        )
+
+    def __on_done(
+        self, results: list[tuple[str, Any, Exception | None, float]], *args
+    ) -> None:
+        failed: int = 0
+
+        for name, result, error, duration in results:
+            self.__progresses[name].close()
+            row: Adw.ExpanderRow = self.__rows[name]
+
+            if error is None and result[0]:
+                row.set_subtitle(_("Upgraded in {:.0f} s").format(duration))
+                self.__icons[name].set_from_icon_name("emblem-ok-symbolic")
+                continue
+
+            failed += 1
+            message: str = str(error) if error is not None else result[1].strip()
+            row.set_subtitle(
+                _("Failed after {:.0f} s: {}").format(
+                    duration, message.splitlines()[-1] if message else ""
+                )
+            )
+            row.add_css_class("error")
+            self.__icons[name].set_from_icon_name("dialog-error-symbolic")
+
+        upgraded: int = len(results) - failed
+        summary: str = ngettext(
+            "{} subsystem upgraded", "{} subsystems upgraded", upgraded
+        ).format(upgraded)
+        if failed:
+            summary += ", " + ngettext(
+                "{} failed", "{} failed", failed
+            ).format(failed)
+        summary = _("{} in {:.0f} s").format(
+            summary, time.monotonic() - self.__started
+        )
+        self.label_summary.set_label(summary)
+        self.__window.toast(summary)
@@ -0,0 +1,196 @@
+# test_memory.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+
+import gc
+import shutil
+import subprocess
+import threading
+import weakref
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+gi = pytest.importorskip("gi")
+
+try:
+    gi.require_version("Gtk", "4.0")
+    gi.require_version("Adw", "1")
+    gi.require_version("Vte", "3.91")
+except ValueError as exception:
+    pytest.skip(str(exception), allow_module_level=True)
+
+from gi.repository import Adw, Gio, GLib, Gtk, Vte  # noqa: E402
+
+if not Gtk.init_check():
+    pytest.skip("no display available", allow_module_level=True)
+
+SOURCES: Path = Path(__file__).resolve().parent.parent / "apx_gui"
+CYCLES: int = 1000
+WARMUP: int = 10
+
+
+@pytest.fixture(scope="module", autouse=True)
+def resources(tmp_path_factory: pytest.TempPathFactory) -> None:
+    compiler: str | None = shutil.which("glib-compile-resources")
+    if compiler is None:
+        pytest.skip("glib-compile-resources not available")
+
+    target: Path = tmp_path_factory.mktemp("resources") / "apx_gui.gresource"
+    subprocess.run(
+        [
+            compiler,
+            f"--sourcedir={SOURCES}",
+            f"--target={target}",
+            str(SOURCES / "apx-gui.gresource.xml"),
+        ],
+        check=True,
+    )
+    Gio.Resource.load(str(target))._register()
+    Adw.init()
+
+
+class Settings:
+    def get_int(self, key: str) -> int:
+        return {"max-active-tabs": 8, "snapshots-keep": 5}.get(key, 0)
+
+    def get_boolean(self, key: str) -> bool:
+        return False
+
+    def get_strv(self, key: str) -> list[str]:
+        return []
+
+
+class PackageIndex:
+    def drift(self, subsystem) -> set[str] | None:
+        return None
+
+
+class Window(Adw.ApplicationWindow):
+    """
+    The parts of the main window used by the tabs and dialogs under test.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.settings: Settings = Settings()
+        self.title: Adw.WindowTitle = Adw.WindowTitle()
+        self.package_index: PackageIndex = PackageIndex()
+
+    def toast(self, message: str, timeout: int = 2) -> Adw.Toast:
+        return Adw.Toast.new(message)
+
+    def subsystem_for_stack(self, stack):
+        return None
+
+
+def flush() -> None:
+    # background tasks hold their tab until their callback has run
+    context: GLib.MainContext = GLib.MainContext.default()
+    while threading.active_count() > 1 or context.pending():
+        context.iteration(False)
+    gc.collect()
+
+
+def live_objects(types: tuple[type, ...]) -> Counter[str]:
+    return Counter(
+        type(obj).__name__ for obj in gc.get_objects() if isinstance(obj, types)
+    )
+
+
+def test_tabs_and_dialogs_do_not_leak(monkeypatch: pytest.MonkeyPatch) -> None:
+    from apx_gui.core.apx_entities import PkgManager, Stack, Subsystem
+    from apx_gui.core.snapshots import Snapshots
+    from apx_gui.widgets.editor import Editor
+    from apx_gui.widgets.tab_pkgmanager import TabPkgManager
+    from apx_gui.widgets.tab_stack import TabStack
+    from apx_gui.widgets.tab_subsystem import TabSubsystem
+    from apx_gui.windows.create_stack import CreateStackWindow
+
+    # subsystem tabs would list their snapshots through podman
+    monkeypatch.setattr(Snapshots, "entries", staticmethod(lambda subsystem: []))
+
+    tracked: tuple[type, ...] = (
+        Stack,
+        PkgManager,
+        Subsystem,
+        TabStack,
+        TabPkgManager,
+        TabSubsystem,
+        Vte.Terminal,
+        Gtk.GestureClick,
+        CreateStackWindow,
+    )
+    window: Window = Window()
+    editor: Editor = Editor(window)
+    window.set_content(editor)
+    created: weakref.WeakSet = weakref.WeakSet()
+    aids: list = []
+
+    def cycle(index: int) -> None:
+        pkgmanager: PkgManager = PkgManager(
+            f"pm-{index}", False, "", "", "", "", "", "", "", "", "", "", False
+        )
+        stack: Stack = Stack(
+            f"stack-{index}",
+            "docker.io/library/alpine",
+            ["vim"],
+            pkgmanager.name,
+            False,
+        )
+
+        # the console is only spawned when shown, which this never does
+        subsystem: Subsystem = Subsystem(
+            f"apx-subsystem-{index}",
+            f"subsystem-{index}",
+            stack,
+            "",
+            "Exited",
+            ["true"],
+            {},
+        )
+
+        editor.new_stack_tab(stack)
+        editor.new_pkgmanager_tab(pkgmanager)
+        editor.new_subsystem_tab(subsystem)
+        dialog: CreateStackWindow = CreateStackWindow(window, [stack], [pkgmanager])
+        dialog.present()
+        created.update((stack, pkgmanager, subsystem, dialog))
+        aids.extend((stack.aid, pkgmanager.aid, subsystem.aid))
+
+        dialog.close()
+        editor.close(stack.aid)
+        editor.close(pkgmanager.aid)
+        editor.close(subsystem.aid)
+        flush()
+
+    for index in range(WARMUP):
+        cycle(index)
+    flush()
+    baseline: Counter[str] = live_objects(tracked)
+
+    for index in range(WARMUP, WARMUP + CYCLES):
+        cycle(index)
+    flush()
+
+    assert live_objects(tracked) - baseline == Counter()
+    assert len(created) <= sum(baseline.values())
+    assert not any(editor.is_open(aid) for aid in aids)
+    assert editor.tabs_editor.get_n_pages() == 0
@@ -0,0 +1,142 @@
+# test_pkgmanager.py
+#
+# Copyright 2024 Mirko Brombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+
+import pytest
+
+pytest.importorskip("gi")
+
+from apx_gui.core.apx_entities import PkgManager  # noqa: E402
+
+APT_LIST = """\
+Listing... Done
+libc6/stable,now 2.36-9+deb12u4 amd64 [installed,upgradable to: 2.36-9+deb12u7]
+zsh-common/stable,now 5.9-4 all [installed,automatic]
+zsh/stable 5.9-4 amd64
+zstd/stable,now 1.5.4+dfsg2-5 amd64 [installed]
+zutty/stable 0.14.0.20230218+dfsg1-1 amd64
+"""
+
+DNF_LIST = """\
+Last metadata expiration check: 0:01:12 ago on Sat 19 Oct 2024 10:00:00 AM UTC.
+Installed Packages
+bash.x86_64                          5.2.26-3.fc40               @anaconda
+glibc.x86_64                         2.39-22.fc40                @updates
+python3-setuptools-wheel.noarch
+                                     69.0.3-5.fc40               @anaconda
+vim-minimal.x86_64                   2:9.1.393-1.fc40            @updates
+Available Packages
+clang.i686                           18.1.8-1.fc40               updates
+clang.x86_64                         18.1.8-1.fc40               updates
+"""
+
+DNF5_LIST = """\
+Updating and loading repositories:
+Repositories loaded.
+Installed packages
+bash.x86_64                          5.2.26-3.fc40               anaconda
+glibc.x86_64                         2.39-22.fc40                updates
+"""
+
+PACMAN_LIST = """\
+acl 2.3.2-1
+archlinux-keyring 20240709-1
+bash 5.2.032-1
+"""
+
+APK_LIST = """\
+alpine-baselayout-3.6.5-r0 x86_64 {alpine-baselayout} (GPL-2.0-only) [installed]
+busybox-1.36.1-r29 x86_64 {busybox} (GPL-2.0-only) [installed]
+musl-1.2.5-r0 x86_64 {musl} (MIT) [installed]
+"""
+
+ZYPPER_SEARCH = """\
+Loading repository data...
+Reading installed packages...
+
+S  | Name  | Summary                    | Type
+---+-------+----------------------------+--------
+i+ | bash  | The GNU Bourne-Again Shell | package
+i  | glibc | Standard Shared Libraries  | package
+"""
+
+ZYPPER_PACKAGES = """\
+Loading repository data...
+Reading installed packages...
+S  | Repository      | Name  | Version    | Arch
+---+-----------------+-------+------------+-------
+i+ | Main Repository | bash  | 5.2.26-1.1 | x86_64
+v  | Main Repository | clang | 18.1.8-1.1 | x86_64
+i  | Main Repository | glibc | 2.39-3.1   | x86_64
+"""
+
+
+@pytest.fixture
+def pkgmanager() -> PkgManager:
+    return PkgManager(
+        "test", False, "", "", "", "", "", "", "", "", "", "", False
+    )
+
+
+@pytest.mark.parametrize(
+    "output, expected",
+    [
+        (
+            APT_LIST,
+            {
+                "libc6": "2.36-9+deb12u4",
+                "zsh-common": "5.9-4",
+                "zstd": "1.5.4+dfsg2-5",
+            },
+        ),
+        (
+            DNF_LIST,
+            {
+                "bash": "5.2.26-3.fc40",
+                "glibc": "2.39-22.fc40",
+                "python3-setuptools-wheel": "69.0.3-5.fc40",
+                "vim-minimal": "2:9.1.393-1.fc40",
+            },
+        ),
+        (DNF5_LIST, {"bash": "5.2.26-3.fc40", "glibc": "2.39-22.fc40"}),
+        (
+            PACMAN_LIST,
+            {
+                "acl": "2.3.2-1",
+                "archlinux-keyring": "20240709-1",
+                "bash": "5.2.032-1",
+            },
+        ),
+        (
+            APK_LIST,
+            {
+                "alpine-baselayout": "3.6.5-r0",
+                "busybox": "1.36.1-r29",
+                "musl": "1.2.5-r0",
+            },
+        ),
+        (ZYPPER_SEARCH, {"bash": "", "glibc": ""}),
+        (ZYPPER_PACKAGES, {"bash": "5.2.26-1.1", "glibc": "2.39-3.1"}),
+    ],
+    ids=["apt", "dnf", "dnf5", "pacman", "apk", "zypper-search", "zypper-pa"],
+)
+def test_parse_list_output(
+    pkgmanager: PkgManager, output: str, expected: dict[str, str]
+) -> None:
+    assert pkgmanager.parse_list_output(output) == expected